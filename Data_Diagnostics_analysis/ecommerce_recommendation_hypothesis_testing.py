@@ -4,12 +4,25 @@
 # In[198]:
 
 
+import os
+import sys
+from pathlib import Path
+
 import pandas as pd
 
-df = pd.read_csv("/Users/sivaguganjayachandran/Documents/python programming/Kaggle/e-commerce_recom_system/sampled_df.csv")
+# Make the shared `recsys` package importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from recsys.schema import read_events_csv
+
+# Sampled event log; point ECOM_SAMPLED_CSV at another file, e.g. one written by
+# `python -m recsys.synthetic --rows 1000000 --output sampled_df.csv`
+SAMPLED_CSV = os.environ.get(
+    "ECOM_SAMPLED_CSV",
+    "/Users/sivaguganjayachandran/Documents/python programming/Kaggle/e-commerce_recom_system/sampled_df.csv",
+)
 
-# Convert event_time to datetime format
-df['event_time'] = pd.to_datetime(df['event_time'].str.replace(' UTC', ''), format='%Y-%m-%d %H:%M:%S')
+# Categorical strings, compact ids/prices and event_time parsed once with an explicit format
+df = read_events_csv(SAMPLED_CSV, verbose=True)
 
 # Create date column
 df['date'] = df['event_time'].dt.date
@@ -211,6 +224,10 @@ fig.show()
 
 
 import pandas as pd
+from recsys.funnel import funnel_table
+
+# Funnel totals and ratios per premiumness category
+funnel_metrics = funnel_table(df, 'premiumness').reindex(['Low', 'Medium', 'High'])
 
 # Create a DataFrame with premiumness categories and funnel metrics
 funnel_df = pd.DataFrame({
@@ -284,19 +301,11 @@ a[a> 30000]
 # In[158]:
 
 
-# Step 1: Group by product_id, user_session, and event_type
-brand_df = df.groupby(['brand','user_session', 'event_type']).size().unstack(fill_value=0)
-
-# Step 2: Calculate the funnel metrics
-# Calculating funnel metrics for each session/product
-brand_df['cart'] = brand_df['cart'] 
-brand_df['purchase'] = brand_df['purchase'] 
-brand_df['remove_from_cart'] = brand_df['remove_from_cart'] 
-brand_df['view_to_cart'] = brand_df['cart'] / brand_df['view']
-brand_df['cart_to_purchase'] = brand_df['purchase'] / brand_df['cart']
-brand_df['cart_to_remove'] = brand_df['remove_from_cart'] / brand_df['cart']
+from recsys.funnel import funnel_table
 
-brand_df = brand_df.reset_index()
+# Funnel counts and ratios per (brand, session), counted over factorized keys;
+# ratios with a zero denominator are NaN
+brand_df = funnel_table(df, ['brand', 'session']).reset_index()
 
 
 brand_df.head(5)
@@ -305,25 +314,26 @@ brand_df.head(5)
 # In[166]:
 
 
-import scipy.stats as stats
-
-# Step 1: Extract the data for 'runail' and the rest of the brands
-runail_data = brand_df[brand_df['brand'] == 'runail']['purchase']
-population_data = brand_df[brand_df['brand'] != 'runail']['purchase']
-
-# Step 2: Calculate the mean purchase for both 'runail' (sample) and the population
-mean_runail = runail_data.mean()
-mean_population = population_data.mean()
+from recsys.hypothesis import test_groups
 
-# Step 3: Perform a one-sample t-test to compare the 'runail' mean to the population mean
-t_stat, p_value = stats.ttest_1samp(runail_data, mean_population)
+# Test every brand against the rest of the population in one pass over the events:
+# one-sample t-test of the brand's session purchase counts against the mean of all other
+# brands' sessions, with Benjamini-Hochberg corrected p-values across brands
+brand_tests = test_groups(df, group='brand', unit='user_session', test='one_sample', correction='bh')
+print(f"Brands tested: {brand_tests['p_value'].notna().sum()}, "
+      f"significant after BH correction: {brand_tests['reject'].sum()}\n")
+print(brand_tests.head(10)[['n', 'mean', 'rest_mean', 't_stat', 'p_value', 'p_adjusted']])
 
-# Step 4: Confidence interval (95% confidence)
-confidence_interval = stats.t.interval(0.95, len(runail_data)-1, loc=mean_runail, scale=stats.sem(runail_data))
+# Step 1: Extract the results for 'runail'
+runail = brand_tests.loc['runail']
+mean_runail = runail['mean']
+mean_population = runail['rest_mean']
+t_stat, p_value = runail['t_stat'], runail['p_value']
+confidence_interval = (runail['ci_low'], runail['ci_high'])
 
-# Step 5: Print the detailed report
-print("Analysis of Purchase Values for 'runail' vs Population:\n")
-print(f"Sample Size:\n- 'runail': {len(runail_data)}\n- Population: {len(population_data)}\n")
+# Step 2: Print the detailed report
+print("\nAnalysis of Purchase Values for 'runail' vs Population:\n")
+print(f"Sample Size:\n- 'runail': {runail['n']}\n- Population: {runail['rest_n']}\n")
 
 print(f"Metric Value (Mean Purchase):")
 print(f"- 'runail': {mean_runail:.6f}")
@@ -331,12 +341,13 @@ print(f"- Population: {mean_population:.6f}\n")
 
 print("T-test Results:")
 print(f"- T-statistic: {t_stat:.6f}")
-print(f"- P-value: {p_value:.6f}\n")
+print(f"- P-value: {p_value:.6f}")
+print(f"- BH-adjusted P-value (across all brands): {runail['p_adjusted']:.6f}\n")
 
 print(f"95% Confidence Interval for 'runail':")
 print(f"- ({confidence_interval[0]:.6f}, {confidence_interval[1]:.6f})\n")
 
-# Step 6: Interpret the results
+# Step 3: Interpret the results
 if p_value < 0.05:
     print("Conclusion:")
     print("Reject the null hypothesis: There is a statistically significant difference in purchase values between 'runail' and the population.")
@@ -356,20 +367,10 @@ else:
 # In[160]:
 
 
-# Step 1: Group by product_id, user_session, and event_type
-product_df = df.groupby(['product_id', 'premiumness', 'user_session','event_type']).size().unstack(fill_value=0)
+from recsys.funnel import funnel_table
 
-# Step 2: Calculate the funnel metrics
-# Calculating funnel metrics for each session/product
-product_df['cart'] = product_df['cart'] 
-product_df['purchase'] = product_df['purchase'] 
-product_df['remove_from_cart'] = product_df['remove_from_cart'] 
-product_df['view_to_cart'] = product_df['cart'] / product_df['view']
-product_df['cart_to_purchase'] = product_df['purchase'] / product_df['cart']
-product_df['cart_to_remove'] = product_df['remove_from_cart'] / product_df['cart']
-
-# Step 3: Reset index to make the DataFrame more readable
-product_df = product_df.reset_index()
+# Funnel counts and ratios per (product, premiumness, session)
+product_df = funnel_table(df, ['product', 'premiumness', 'session']).reset_index()
 
 product_df.head()
 
@@ -379,7 +380,7 @@ product_df.head()
 
 import scipy.stats as stats
 import numpy as np
-from statsmodels.stats.power import TTestIndPower
+from recsys.hypothesis import t_test_power
 
 # Extract the purchase values for High and Low premiumness
 high_purchase = product_df[product_df['premiumness'] == 'High']['purchase'].dropna()
@@ -397,8 +398,7 @@ pooled_std = np.sqrt(((len(high_purchase)-1)*high_purchase.std()**2 + (len(low_p
 cohens_d = (mean_high - mean_low) / pooled_std
 
 # Calculate the statistical power of the test
-power_analysis = TTestIndPower()
-power = power_analysis.solve_power(effect_size=cohens_d, nobs1=len(high_purchase), ratio=len(low_purchase)/len(high_purchase), alpha=0.05)
+power = t_test_power(cohens_d, len(high_purchase), len(low_purchase), alpha=0.05)
 
 # 95% Confidence Intervals
 ci_high = stats.t.interval(0.95, len(high_purchase)-1, loc=mean_high, scale=stats.sem(high_purchase))
@@ -440,9 +440,9 @@ print(output)
 
 
 import pandas as pd
-from scipy.stats import beta
+from recsys.bayesian import pair_counts, score_pairs, top_k_per_group
 
-df1 = pd.read_csv("/Users/sivaguganjayachandran/Documents/python programming/Kaggle/e-commerce_recom_system/sampled_df.csv")
+df1 = read_events_csv(SAMPLED_CSV)
 
 # Preprocessing: Filter relevant event types
 df1 = df1[df1['event_type'].isin(['purchase', 'cart'])]
@@ -451,31 +451,18 @@ df1 = df1[df1['event_type'].isin(['purchase', 'cart'])]
 prior = df1[df1['event_type'] == 'purchase'].shape[0] / df1[df1['event_type'] == 'cart'].shape[0]
 print(f"Prior (P(purchase)): {prior}")
 
-# Compute Likelihood: Frequency of purchase given user-product pairs
-# Filter for purchase events
-purchase_counts = df1[df1['event_type'] == 'purchase'].groupby(['user_id', 'product_id']).size()
-cart_counts = df1[df1['event_type'] == 'cart'].groupby(['user_id', 'product_id']).size()
-
-# Combine counts into a single DataFrame
-likelihood = pd.concat([purchase_counts, cart_counts], axis=1, keys=['purchases', 'carts']).fillna(0)
-likelihood['likelihood'] = likelihood['purchases'] / likelihood['carts']
-
-# Compute Posterior using Bayesian updating
-def compute_posterior(row):
-    alpha = row['purchases'] + 1  # Add 1 for Bayesian smoothing
-    beta_param = row['carts'] - row['purchases'] + 1  # Add 1 for smoothing
-    posterior = beta(alpha, beta_param).mean()  # Mean of Beta distribution
-    return posterior
-
-likelihood['posterior'] = likelihood.apply(compute_posterior, axis=1)
+# Compute Likelihood and Posterior for every user-product pair at once:
+# Beta(1, 1) prior updated with purchases (successes) out of carts (trials),
+# posterior mean in closed form (see recsys/bayesian.py)
+pairs, _ = score_pairs(pair_counts(df1), prior="uniform")
+likelihood = pairs.set_index(['user_id', 'product_id'])
 
 # Merge posterior probabilities back into the main DataFrame
 df1 = df1.merge(likelihood[['posterior']], how='left', left_on=['user_id', 'product_id'], right_index=True)
 
-# Rank Recommendations for Each User
-recommendations = df1.groupby('user_id').apply(
-    lambda x: x.sort_values(by='posterior', ascending=False).head(5)
-).reset_index(drop=True)
+# Rank Recommendations for Each User: top 5 distinct products by posterior
+top = top_k_per_group(pairs['user_id'].to_numpy(), pairs['posterior'].to_numpy(), k=5)
+recommendations = pairs.iloc[top].reset_index(drop=True)
 
 # Display top recommendations
 print(recommendations[['user_id', 'product_id', 'posterior']])
@@ -489,6 +476,7 @@ recommendations[['user_id', 'product_id', 'posterior']].to_csv('recommendations.
 
 import pandas as pd
 import numpy as np
+from recsys.category_affinity import CategoryAffinity
 
 # Step 1: Get top 10 users with the most observations
 user_counts = df1['user_id'].value_counts().head(10)  # Count occurrences of user_ids and take top 10
@@ -498,49 +486,22 @@ top_users = user_counts.index  # Top 10 users
 product_counts = df1['product_id'].value_counts().head(2)  # Count occurrences of product_ids and take top 2
 top_products = product_counts.index  # Top 2 products
 
-# Step 3: Calculate prior probability (P(purchase)) for all products
-prior_prob = df1.groupby('product_id')['event_type'].apply(lambda x: (x == 'purchase').mean()).reset_index()
-prior_prob.columns = ['product_id', 'prior_prob']
-
-# Step 4: Calculate likelihood based on user history for each product
-def calculate_likelihood(user_id, product_id, df1):
-    # Get user history of purchases
-    user_history = df1[df1['user_id'] == user_id]
-    
-    # Find the category of the product
-    product_category = df1[df1['product_id'] == product_id]['category_id'].values[0]
-    
-    # Filter user's past purchases in the same category
-    user_purchases_in_category = user_history[user_history['category_id'] == product_category]
-    
-    # Likelihood based on number of similar products purchased by the user
-    likelihood = len(user_purchases_in_category) / len(user_history) if len(user_history) > 0 else 0
-    return likelihood
-
-# Step 5: Calculate posterior probability using Bayesian update
-def calculate_posterior(user_id, product_id, df1, prior_prob):
-    # Get the prior probability for the product
-    prior = prior_prob[prior_prob['product_id'] == product_id]['prior_prob'].values[0]
-    
-    # Get the likelihood of the user purchasing this product based on their history
-    likelihood = calculate_likelihood(user_id, product_id, df1)
-    
-    # Bayesian update: Posterior ∝ Prior * Likelihood
-    posterior = prior * likelihood  # Posterior before normalization
-    return posterior
-
-# Step 6: Calculate posterior probability for the top 10 users and top 2 products
-posterior_probabilities = {}
-
-for user in top_users:
-    for product in top_products:
-        posterior_prob = calculate_posterior(user, product, df1, prior_prob)
-        posterior_probabilities[(user, product)] = posterior_prob
-
-# Convert results to DataFrame for better readability
-posterior_df = pd.DataFrame(posterior_probabilities.items(), columns=['user_product', 'posterior_prob'])
-posterior_df[['user_id', 'product_id']] = pd.DataFrame(posterior_df['user_product'].to_list(), index=posterior_df.index)
-posterior_df = posterior_df.drop(columns=['user_product'])
+# Step 3: Precompute the product priors (P(purchase) per product), each product's
+# category and a sparse user x category event-count matrix (see recsys/category_affinity.py)
+affinity = CategoryAffinity(df1)
+
+# Step 4-5: Likelihood (user's share of events in the product's category) and
+# posterior (prior * likelihood) for the whole top users x top products grid at once
+user_codes = affinity.user_codes_for(top_users)
+product_codes = affinity.product_codes_for(top_products)
+posterior_grid = affinity.posterior(user_codes, product_codes)
+
+# Step 6: One row per (user, product) pair
+posterior_df = pd.DataFrame({
+    'posterior_prob': posterior_grid.ravel(),
+    'user_id': np.repeat(np.asarray(top_users), len(top_products)),
+    'product_id': np.tile(np.asarray(top_products), len(top_users)),
+})
 
 # Display the final DataFrame with posterior probabilities
 print(posterior_df)
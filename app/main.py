@@ -3,23 +3,53 @@ import streamlit as st
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 from scipy import stats
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.cluster import KMeans
-import gdown
-import zipfile
-import io
-import pickle
 from PIL import Image
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.neighbors import NearestNeighbors
-from scipy.sparse import coo_matrix
 from datetime import datetime
 import pytz
 import os
+import sys
 from pathlib import Path
 
+# Define the base directory dynamically
+BASE_DIR = Path(__file__).resolve().parent.parent  # Adjust relative to your `app` folder
+
+# Make the shared `recsys` package importable when running `streamlit run app/main.py`
+sys.path.insert(0, str(BASE_DIR))
+
+from recsys.artifacts import load_or_build_artifacts
+from recsys.data_store import dataset_version, default_source, load_dataset
+from recsys.eda_cube import load_or_build_cube
+from recsys.features import with_features
+from recsys.hypothesis import (
+    adjust_pvalues,
+    group_statistics,
+    mask_untestable,
+    one_sample_tests,
+    summarize_groups,
+    t_test_power,
+    two_sample_test,
+)
+from recsys.item_similarity import recommend_for_user
+from recsys.monte_carlo import MODELS, price_model, simulate_revenue, summarize
+from recsys.naive_bayes import PREMIUMNESS_LEVELS, NaiveBayesModel
+from recsys.plotting import (
+    DENSITY_BINS,
+    LINE_POINTS,
+    cached_figure,
+    density_grid,
+    draw_density,
+    draw_histogram,
+    histogram,
+    kde_from_counts,
+    lttb,
+)
+from recsys.price_distribution import price_summary
+from recsys.segmentation import load_or_build_segments
+
+# Worker processes for the Monte Carlo simulation; one vectorized chunk covers the page's default runs
+SIMULATION_JOBS = int(os.environ.get("ECOM_SIMULATION_JOBS", 1))
+
 # Page configuration
 st.set_page_config(
     page_title="E-commerce Recommendation Dashboard",
@@ -29,42 +59,91 @@ st.set_page_config(
 )
 
 # --- Step 1: Load Data and Preprocessing ---
-@st.cache_data(show_spinner=False, persist=False)
+@st.cache_resource(show_spinner=False)
 def load_data():
     """
-    Downloads and loads the data directly from Google Drive without saving to disk.
+    Loads the enhanced dataset through the local columnar cache. The source (Google Drive
+    by default, or the file in ECOM_DATA_PATH) is only fetched when no cached copy exists.
+    One frame is shared by every session: its columns are read-only views of the cache file,
+    and derived columns come from recsys.features instead of being added to it.
 
     Returns:
-    - DataFrame: Loaded and preprocessed data.
+    - DataFrame: Loaded and preprocessed data (read-only).
     """
-    # Google Drive File ID
-    file_id = "1YcnadUrqyq68Cag_7diw9JW9yUPDvkhr"
-    url = f'https://drive.google.com/uc?id={file_id}'
-
-    # Create an in-memory BytesIO object to hold the downloaded file
-    zip_bytes = io.BytesIO()
-
-    # Download the file into the BytesIO object
-    gdown.download(url, output=zip_bytes, quiet=False, fuzzy=True)
-    zip_bytes.seek(0)  # Reset pointer to the start of the file
-
-    # Check if the downloaded file is a valid zip archive
-    if zipfile.is_zipfile(zip_bytes):
-        with zipfile.ZipFile(zip_bytes, 'r') as z:
-            # Get the first file in the zip archive (assumes there's only one)
-            pickle_filename = z.namelist()[0]
-            with z.open(pickle_filename) as pickle_file:
-                # Load the pickle file directly from the zip archive
-                data = pickle.load(pickle_file)
-                return data
-    else:
-        st.error("The downloaded file is not a valid zip file.")
+    try:
+        return load_dataset(default_source(), read_only=True)
+    except (OSError, ValueError) as e:
+        st.error(f"Failed to load the dataset: {e}")
         return None
 
 data = load_data()
+# Version of the loaded dataset, part of every cache key below
+data_version = dataset_version(data) if data is not None else None
 
-# Define the base directory dynamically
-BASE_DIR = Path(__file__).resolve().parent.parent  # Adjust relative to your `app` folder
+
+# One entry: the models of the previous day (or settings) are released when a new set is loaded
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_frequentist_artifacts(_data, dataset_version, day, min_user_interactions=3, min_item_interactions=3, decay="hyperbolic"):
+    """
+    Recommender models for the Frequentist page, loaded once per process and shared across
+    sessions. They are read from the on-disk artifact store and only built on a miss.
+    """
+    params = {
+        "min_user_interactions": min_user_interactions,
+        "min_item_interactions": min_item_interactions,
+        "decay": decay,
+    }
+    return load_or_build_artifacts(_data, params, reference_date=day)
+
+
+@st.cache_resource(show_spinner=False)
+def load_naive_bayes_model(_data, dataset_version):
+    """
+    Likelihood tables for the Bayesian page, built once per dataset version and shared across sessions.
+    """
+    return NaiveBayesModel(with_features(_data, ["premiumness"]))
+
+
+@st.cache_resource(show_spinner=False)
+def load_hypothesis_statistics(_data, dataset_version):
+    """
+    Per-group count, sum and sum of squares of purchases per session for the Hypothesis Testing
+    page, computed once per dataset version. The tables have one row per brand / premiumness bucket.
+    """
+    buckets = with_features(_data, ["premiumness"])
+    return {
+        "brand": group_statistics(_data, "brand"),
+        "premiumness": group_statistics(buckets, "premiumness", unit=["product_id", "user_session"]).reindex(
+            PREMIUMNESS_LEVELS, fill_value=0
+        ),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def load_eda_cube(_data, dataset_version):
+    """
+    Event-count cube for the EDA page, read from next to the cached dataset (built there on
+    first use) once per dataset version.
+    """
+    return load_or_build_cube(with_features(_data, ["event_date"]))
+
+@st.cache_resource(show_spinner=False)
+def load_price_segments(_data, dataset_version):
+    """
+    Price-sensitivity segments of purchasing users for the Price Analysis page, loaded from
+    the segment cache (fitted there on first use) once per dataset version.
+    """
+    return load_or_build_segments(with_features(_data, ["premiumness"]))
+
+@st.cache_data(show_spinner=False)
+def run_revenue_simulation(_data, dataset_version, model_name, n_users, conversion_rate, n_simulations, seed):
+    """
+    Simulated revenues and their summary for the Price Analysis page, cached per dataset
+    version and simulation parameters.
+    """
+    model = price_model(model_name, _data["price"].to_numpy())
+    revenues = simulate_revenue(model, n_users, conversion_rate, n_simulations, seed, n_jobs=SIMULATION_JOBS)
+    return revenues, summarize(revenues)
 
 # Build paths dynamically
 price_image = BASE_DIR / "Images" / "Data_prep2.PNG"
@@ -73,13 +152,6 @@ pmf_image= BASE_DIR / "Images" / "Data_prep1.PNG"
 price1_sg_image = BASE_DIR / "Images" / "price1_sg.png"
 price2_sg_image = BASE_DIR / "Images" / "price2_sg.png"
 price3_sg_image = BASE_DIR / "Images" / "price3_sg.png"
-product1_sg_image = BASE_DIR / "Images" / "product1_sg.png"
-product2_sg_image = BASE_DIR / "Images" / "product2_sg.png"
-brand1_sg_image = BASE_DIR / "Images" / "brand1_sg.png"
-brand2_sg_image = BASE_DIR / "Images" / "brand2_sg.png"
-brand3_sg_image = BASE_DIR / "Images" / "brand3_sg.png"
-brand4_sg_image = BASE_DIR / "Images" / "brand4_sg.png"
-by_image1= BASE_DIR / "Images" / "Bayesian1_sg.png"
 
 
 # hpt_image1= BASE_DIR / "Images" / "Hypothesis_testing1.PNG"
@@ -308,20 +380,44 @@ elif selected_page == "EDA":
     st.markdown("<div class='main-header'>Exploratory Data Analysis (EDA)</div>", unsafe_allow_html=True)
     st.write("Loading data...")
 
-    # Load the data using the updated function
+    # The shared dataset loaded at startup; the charts only query its event cube
     try:
-        data = load_data()
         if data is not None:
             st.write("Data loaded successfully!")
+            cube = load_eda_cube(data, data_version)
+
+            # Filters: every chart below except user activity is a slice of the event cube
+            brand_counts = cube.rollup("brand").sort_values(ascending=False)
+            col1, col2 = st.columns(2)
+            with col1:
+                selected_event_types = st.multiselect(
+                    "Event types", list(cube.rollup("event_type").index), default=list(cube.rollup("event_type").index)
+                )
+            with col2:
+                selected_brand = st.selectbox("Brand", ["All brands"] + list(brand_counts.index))
+            view = cube.slice(
+                event_type=selected_event_types, brand=None if selected_brand == "All brands" else selected_brand
+            )
+            filter_key = (tuple(selected_event_types), selected_brand)
 
             # Visualization 1: Distribution of Event Types
             st.markdown("<div class='sub-header'>1. Distribution of Event Types</div>", unsafe_allow_html=True)
-            event_types_fig = plt.figure(figsize=(8, 5))
-            sns.countplot(x='event_type', data=data, palette='viridis')
-            plt.title("Distribution of Event Types")
-            plt.xlabel("Event Type")
-            plt.ylabel("Count")
-            st.pyplot(event_types_fig)
+
+            def draw_event_types(ax):
+                event_counts = view.rollup('event_type')
+                ax.bar(
+                    event_counts.index.astype(str),
+                    event_counts.values,
+                    color=plt.cm.viridis(np.linspace(0, 1, len(event_counts))),
+                )
+                ax.set_title("Distribution of Event Types")
+                ax.set_xlabel("Event Type")
+                ax.set_ylabel("Count")
+
+            st.image(
+                cached_figure((data_version, "eda.event_types") + filter_key, draw_event_types),
+                use_column_width=True,
+            )
             st.markdown(
                 """
                 - **Insight**:
@@ -333,12 +429,17 @@ elif selected_page == "EDA":
 
             # Visualization 2: Distribution of Prices
             st.markdown("<div class='sub-header'>2. Distribution of Prices</div>", unsafe_allow_html=True)
-            price_fig = plt.figure(figsize=(8, 5))
-            sns.histplot(data['price'], kde=True, bins=30, color='blue')
-            plt.title("Distribution of Prices")
-            plt.xlabel("Price")
-            plt.ylabel("Density")
-            st.pyplot(price_fig)
+            def draw_prices(ax):
+                counts, edges = view.price_histogram(bins=30)
+                if counts.sum():
+                    draw_histogram(ax, counts, edges, color='blue', kde=kde_from_counts(*view.price_histogram()))
+                ax.set_title("Distribution of Prices")
+                ax.set_xlabel("Price")
+                ax.set_ylabel("Density")
+
+            st.image(
+                cached_figure((data_version, "eda.prices", 30) + filter_key, draw_prices), use_column_width=True
+            )
             st.markdown(
                 """
                 - **Insight**:
@@ -350,13 +451,17 @@ elif selected_page == "EDA":
 
             # Visualization 3: Hourly Interaction Trends
             st.markdown("<div class='sub-header'>3. Hourly Interaction Trends</div>", unsafe_allow_html=True)
-            hourly_trends_fig = plt.figure(figsize=(8, 5))
-            hourly_trends = data.groupby('event_hour')['event_type'].count()
-            sns.lineplot(x=hourly_trends.index, y=hourly_trends.values, marker='o', color='green')
-            plt.title("Hourly Interaction Trends")
-            plt.xlabel("Hour of the Day")
-            plt.ylabel("Number of Interactions")
-            st.pyplot(hourly_trends_fig)
+            def draw_hourly_trends(ax):
+                hourly_trends = view.rollup('hour').reindex(range(24), fill_value=0)
+                ax.plot(hourly_trends.index, hourly_trends.values, marker='o', color='green')
+                ax.set_title("Hourly Interaction Trends")
+                ax.set_xlabel("Hour of the Day")
+                ax.set_ylabel("Number of Interactions")
+
+            st.image(
+                cached_figure((data_version, "eda.hourly_trends") + filter_key, draw_hourly_trends),
+                use_column_width=True,
+            )
             st.markdown(
                 """
                 - **Insight**:
@@ -368,13 +473,22 @@ elif selected_page == "EDA":
 
             # Visualization 4: Top Brands by Interaction
             st.markdown("<div class='sub-header'>4. Top Brands by Interaction</div>", unsafe_allow_html=True)
-            top_brands_fig = plt.figure(figsize=(10, 6))
-            top_brands = data['brand'].value_counts().head(10)
-            sns.barplot(x=top_brands.values, y=top_brands.index, palette='viridis')
-            plt.title("Top 10 Brands by Interaction")
-            plt.xlabel("Number of Interactions")
-            plt.ylabel("Brand")
-            st.pyplot(top_brands_fig)
+            def draw_top_brands(ax):
+                top_brands = view.rollup('brand').nlargest(10)
+                ax.barh(
+                    top_brands.index.astype(str),
+                    top_brands.values,
+                    color=plt.cm.viridis(np.linspace(0, 1, len(top_brands))),
+                )
+                ax.invert_yaxis()
+                ax.set_title("Top 10 Brands by Interaction")
+                ax.set_xlabel("Number of Interactions")
+                ax.set_ylabel("Brand")
+
+            st.image(
+                cached_figure((data_version, "eda.top_brands", 10) + filter_key, draw_top_brands, figsize=(10, 6)),
+                use_column_width=True,
+            )
             st.markdown(
                 """
                 - **Insight**: 
@@ -386,12 +500,14 @@ elif selected_page == "EDA":
 
             # Visualization 5: User Activity Distribution
             st.markdown("<div class='sub-header'>5. User Activity Distribution</div>", unsafe_allow_html=True)
-            user_activity_fig = plt.figure(figsize=(8, 5))
-            sns.histplot(data['total_events'], bins=30, kde=False, color='orange')
-            plt.title("User Activity Distribution")
-            plt.xlabel("Total Events per User")
-            plt.ylabel("Frequency")
-            st.pyplot(user_activity_fig)
+            def draw_user_activity(ax):
+                counts, edges = np.histogram(cube.activity.index, bins=30, weights=cube.activity.to_numpy())
+                draw_histogram(ax, counts, edges, color='orange')
+                ax.set_title("User Activity Distribution")
+                ax.set_xlabel("Total Events per User")
+                ax.set_ylabel("Frequency")
+
+            st.image(cached_figure((data_version, "eda.user_activity", 30), draw_user_activity), use_column_width=True)
             st.markdown(
                 """
                 - **Insight**: 
@@ -410,139 +526,227 @@ elif selected_page == "EDA":
 # Hypothesis Testing Tab
 
 elif selected_page == 'Hypothesis Testing':
+    if data is not None:
+        # Per-group count / sum / sum of squares, computed once per dataset version;
+        # every test below works on these small tables only
+        hypothesis_stats = load_hypothesis_statistics(data, data_version)
 
-    # def show(image_url):
-    #     st.image(image_url, use_column_width=True)
-
-    tab1, tab2 = st.tabs(["One Sample T-Test", "Two Sample T-Test"])
+        tab1, tab2 = st.tabs(["One Sample T-Test", "Two Sample T-Test"])
 
-    with tab2:
-        # Display hypothesis testing description
-        st.write("# Hypothesis Testing 2")
+        with tab2:
+            # Display hypothesis testing description
+            st.write("# Hypothesis Testing 2")
 
-        # Hypothesis scenario introduction
-        st.write("""
-        High premiumness products are often considered more desirable due to their perceived higher quality and value. 
-        But, do they actually have a higher purchase rate % than low premiumness products? 
-        """)
+            # Hypothesis scenario introduction
+            st.write("""
+            High premiumness products are often considered more desirable due to their perceived higher quality and value. 
+            But, do they actually have a higher purchase rate % than low premiumness products? 
+            """)
 
-        # Price distribution
-        st.write("First, let’s check the price distribution.")
-        
-        price1_sg_image = Image.open(price1_sg_image) # Replace with the correct path
-        st.image(price1_sg_image, use_column_width=True)
+            # Price distribution
+            st.write("First, let’s check the price distribution.")
         
-        st.write("""
-        The price distribution is skewed. After applying a log transformation, the distribution becomes normal.
-        Let's look at that.
-        """)
+            price1_sg_image = Image.open(price1_sg_image) # Replace with the correct path
+            st.image(price1_sg_image, use_column_width=True)
         
-        price2_sg_image = Image.open(price2_sg_image) # Replace with the correct path
-        st.image(price2_sg_image, use_column_width=True)
+            st.write("""
+            The price distribution is skewed. After applying a log transformation, the distribution becomes normal.
+            Let's look at that.
+            """)
         
-        # Splitting the data
-        st.write("""
-        Let's split the data into three buckets: low, medium, and high premiumness, to avoid class imbalance.
-        """)
+            price2_sg_image = Image.open(price2_sg_image) # Replace with the correct path
+            st.image(price2_sg_image, use_column_width=True)
         
-        price3_sg_image = Image.open(price3_sg_image) # Replace with the correct path
-        st.image(price3_sg_image, use_column_width=True)
+            # Splitting the data
+            st.write("""
+            Let's split the data into three buckets: low, medium, and high premiumness, to avoid class imbalance.
+            """)
         
-        # Product comparison
-        st.write("""
-        Since we have two groups, we’ll use a Two-Sample t-test to check if the purchase values differ.
-        """)
-
-        product1_sg_image = Image.open(product1_sg_image) # Replace with the correct path
-        st.image(product1_sg_image, use_column_width=True)
-
-        # T-test results
-        st.subheader("After running the Two-Sample t-test")
-
-        product2_sg_image = Image.open(product2_sg_image) # Replace with the correct path
-        st.image(product2_sg_image, use_column_width=True)
+            price3_sg_image = Image.open(price3_sg_image) # Replace with the correct path
+            st.image(price3_sg_image, use_column_width=True)
         
-        st.write("""
-        The p-value is zero, and the confidence intervals for both groups do not overlap. This means the difference in purchase rates % is significant.
-        """)
-
-        st.write("""
-        - Confidence Interval for High Premium: [0.0615, 0.0635]
-        - Confidence Interval for Low Premium: [0.1285, 0.1314]
-        """)
-
-        # Inference
-        st.write("""
-        ### Inference:
-        The average purchase rate % for high-premium products is significantly higher than for low-premium products. 
-        We reject the null hypothesis and conclude that there is a significant difference in purchase behaviors basis product's premiumness
-        """)
-
-    with tab1:
-
-        # Display hypothesis testing description
-        st.write("# Hypothesis Testing 1")
+            # Product comparison
+            st.write("""
+            Since we have two groups, we’ll use a Two-Sample t-test to check if the purchase values differ.
+            The metric is the number of purchases of a product within a session.
+            """)
 
-        # Introduction to the hypothesis testing scenario
-        st.write("""
-        'Runail' is currently the most popular brand on the platform. 
+            premium_stats = hypothesis_stats["premiumness"]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                first_bucket = st.selectbox("First bucket", PREMIUMNESS_LEVELS, index=2)
+            with col2:
+                second_bucket = st.selectbox("Second bucket", PREMIUMNESS_LEVELS, index=0)
+            with col3:
+                equal_var = st.checkbox("Assume equal variances", value=True)
+
+            if first_bucket == second_bucket:
+                st.warning("Pick two different premiumness buckets to compare.")
+            else:
+                first, second = premium_stats.loc[first_bucket], premium_stats.loc[second_bucket]
+                result = two_sample_test(*first, *second, equal_var=equal_var)
+                power = t_test_power(result["cohens_d"], first["n"], second["n"])
+                buckets = summarize_groups(premium_stats.loc[[first_bucket, second_bucket]])
+                bucket_ci = {bucket: (row["ci_low"], row["ci_high"]) for bucket, row in buckets.iterrows()}
+
+                summary = buckets[["mean", "variance"]].rename(columns={"mean": "Mean", "variance": "Variance"})
+                summary.index = [f"{bucket} Premiumness" for bucket in summary.index]
+                bucket_key = (first_bucket, second_bucket, equal_var)
+
+                def draw_bucket_summary(ax):
+                    summary.plot.bar(ax=ax, color=["blue", "orange"], rot=0)
+                    ax.set_title(f"{first_bucket} vs {second_bucket} Premiumness")
+                    ax.set_ylabel("Metric")
+
+                st.image(
+                    cached_figure((data_version, "hypothesis.bucket_summary") + bucket_key, draw_bucket_summary, figsize=(8, 4)),
+                    use_column_width=True,
+                )
+
+                # T-test results
+                st.subheader("After running the Two-Sample t-test")
+
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("T-statistic", f"{result['t_stat']:.4f}")
+                col2.metric("P-value", f"{result['p_value']:.4g}")
+                col3.metric("Cohen's d", f"{result['cohens_d']:.4f}")
+                col4.metric("Power", f"{power:.4f}")
+
+                def draw_bucket_intervals(ax):
+                    for position, (bucket, color) in enumerate(zip(bucket_ci, ["royalblue", "red"])):
+                        low, high = bucket_ci[bucket]
+                        ax.barh(position, high - low, left=low, color=color, label=f"95% CI ({bucket})")
+                    ax.set_yticks([])
+                    ax.set_xlabel("Metric")
+                    ax.set_title(f"95% Confidence Intervals of {first_bucket} vs {second_bucket} Premiumness")
+                    ax.legend(loc="upper right")
+
+                st.image(
+                    cached_figure((data_version, "hypothesis.bucket_intervals") + bucket_key, draw_bucket_intervals, figsize=(8, 2.5)),
+                    use_column_width=True,
+                )
+
+                st.write("\n".join(
+                    f"- Confidence Interval for {bucket} Premium: [{low:.4f}, {high:.4f}]"
+                    for bucket, (low, high) in bucket_ci.items()
+                ))
+
+                # Inference
+                direction = "higher" if result["mean1"] > result["mean2"] else "lower"
+                if result["p_value"] < 0.05:
+                    st.write(f"""
+                    ### Inference:
+                    The average purchase rate % for {first_bucket.lower()}-premium products is significantly {direction} than for {second_bucket.lower()}-premium products 
+                    (p = {result['p_value']:.4g}). We reject the null hypothesis and conclude that there is a significant difference in purchase behaviors basis product's premiumness.
+                    """)
+                else:
+                    st.write(f"""
+                    ### Inference:
+                    The difference in average purchase rate % between {first_bucket.lower()}-premium and {second_bucket.lower()}-premium products is not significant 
+                    (p = {result['p_value']:.4g}). We fail to reject the null hypothesis.
+                    """)
+
+        with tab1:
+
+            # Display hypothesis testing description
+            st.write("# Hypothesis Testing 1")
+
+            brand_stats = hypothesis_stats["brand"]
+            # Brands with too few sessions or no variation get NaN p-values and leave the BH family
+            brand_tests = mask_untestable(one_sample_tests(brand_stats))
+            brand_tests["p_adjusted"] = adjust_pvalues(brand_tests["p_value"].to_numpy(), "bh")
+            brands_by_purchases = brand_stats["sum"].sort_values(ascending=False, kind="stable")
+
+            # Introduction to the hypothesis testing scenario
+            st.write(f"""
+            '{brands_by_purchases.index[0]}' is currently the most popular brand on the platform. 
         
-        But, we have a question: does it truly stand out in terms of purchase rate%,
-        or is its average purchase rate% quite similar to that of other brands? 
-        """)
-
-        brand1_sg_image = Image.open(brand1_sg_image) # Replace with the correct path
-        st.image(brand1_sg_image, use_column_width=True)
-
-        st.write("""
-        Our goal here is to test if 'Runail's purchase behavior is significantly 
-        different from the overall average purchase rate% of all brands. Let's dig into the data and find out.
-        """)
-
-        brand2_sg_image = Image.open(brand2_sg_image) # Replace with the correct path
-        st.image(brand2_sg_image, use_column_width=True)
-
-        st.write("""
-        As you can see in the bar graph above and below, we now have a understanding of the mean and variance of 'Runail' compared to other brands. 
+            But, we have a question: does a brand truly stand out in terms of purchase rate%,
+            or is its average purchase rate% quite similar to that of other brands? 
             """)
-        st.write("")
 
-        # Display the result of the t-test with a third image
+            def draw_popular_brands(ax):
+                popular = brands_by_purchases.head(15)
+                ax.bar(popular.index.astype(str), popular.values, color=plt.cm.Blues(np.linspace(1.0, 0.3, len(popular))))
+                ax.set_title("Most Popular Brands")
+                ax.set_xlabel("Brand")
+                ax.set_ylabel("Purchase Count")
+                ax.tick_params(axis="x", rotation=45)
+
+            st.image(
+                cached_figure((data_version, "hypothesis.popular_brands", 15), draw_popular_brands, figsize=(10, 4)),
+                use_column_width=True,
+            )
 
-        brand3_sg_image = Image.open(brand3_sg_image) # Replace with the correct path
-        st.image(brand3_sg_image, use_column_width=True)
+            brand_options = brands_by_purchases.index.tolist()
+            default_brand = brand_options.index("runail") if "runail" in brand_options else 0
+            selected_brand = st.selectbox("Brand", brand_options, index=default_brand)
+            brand_result = brand_tests.loc[selected_brand]
 
-        # Mentioning the next step
-        st.write("""
-            Let's look at the results of the One-Sample t-test and see if 'Runail' really stands out.
-        """)
-
-        # Show the final image after t-test analysis
+            st.write(f"""
+            Our goal here is to test if '{selected_brand}'s purchase behavior is significantly 
+            different from the overall average purchase rate% of all other brands. Let's dig into the data and find out.
+            """)
 
-        brand4_sg_image = Image.open(brand4_sg_image) # Replace with the correct path
-        st.image(brand4_sg_image, use_column_width=True)
-        
-        # Display inference text
-        st.write("""
-        The p-value is zero, and the  population mean does not lie in the confidence intervals of 'Runail'. This means the difference in purchase rate % is significant.
-        """)
+            versus = pd.DataFrame(
+                [brand_stats.loc[selected_brand], brand_stats.sum() - brand_stats.loc[selected_brand]],
+                index=[selected_brand, "Population"],
+            )
+            brand_summary = summarize_groups(versus)[["mean", "variance"]].rename(columns={"mean": "Mean", "variance": "Variance"})
+            def draw_brand_summary(ax):
+                brand_summary.plot.bar(ax=ax, color=["blue", "orange"], rot=0)
+                ax.set_title(f"'{selected_brand}' vs Population")
+                ax.set_ylabel("Metric")
+
+            st.image(
+                cached_figure((data_version, "hypothesis.brand_summary", selected_brand), draw_brand_summary, figsize=(8, 4)),
+                use_column_width=True,
+            )
 
-        st.write("""
-        - Confidence Interval for Runail: [ 0.204826, 0.233416 ]
-        - Population mean : [ 0.204826, 0.233416 ]
-        """)
-        
-        
-        st.write("""
-        ### Inference: 
+            st.write(f"""
+            As you can see in the bar graph above, we now have a understanding of the mean and variance of '{selected_brand}' compared to other brands. 
+            Let's look at the results of the One-Sample t-test and see if '{selected_brand}' really stands out.
+            """)
 
-        From the t-test results, we observe that the population mean (0.146) is not within the 95% confidence interval of 'Runail’s sample mean 
-        (0.204, 0.233). This leads us to reject the null hypothesis that 'Runail’s average purchase rate% is similar to the overall average.
-        
-        This means that 'Runail' does indeed stand out in terms of purchase behavior, and its average purchase rate % is significantly higher than 
-        the overall average of all brands on the e-commerce platform. 
-        
-        """)
+            if not np.isfinite(brand_result["t_stat"]):
+                st.warning(f"'{selected_brand}' has too few sessions, or no variation in purchases, to run a t-test.")
+            else:
+                power = t_test_power(brand_result["cohens_d"], brand_result["n"])
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("T-statistic", f"{brand_result['t_stat']:.4f}")
+                col2.metric("P-value", f"{brand_result['p_value']:.4g}")
+                col3.metric("Cohen's d", f"{brand_result['cohens_d']:.4f}")
+                col4.metric("Power", f"{power:.4f}")
+
+                st.write(f"""
+                - Sessions: {int(brand_result['n']):,} for '{selected_brand}', {int(brand_result['rest_n']):,} for the population
+                - Confidence Interval for {selected_brand}: [ {brand_result['ci_low']:.6f}, {brand_result['ci_high']:.6f} ]
+                - Population mean : {brand_result['rest_mean']:.6f}
+                - P-value adjusted for testing all {brand_tests['p_value'].notna().sum()} brands (Benjamini-Hochberg): {brand_result['p_adjusted']:.4g}
+                """)
+
+                inside = brand_result["ci_low"] <= brand_result["rest_mean"] <= brand_result["ci_high"]
+                direction = "higher" if brand_result["mean"] > brand_result["rest_mean"] else "lower"
+                if brand_result["p_value"] < 0.05:
+                    st.write(f"""
+                    ### Inference: 
+
+                    From the t-test results, we observe that the population mean ({brand_result['rest_mean']:.3f}) is {'within' if inside else 'not within'} the 95% confidence interval of '{selected_brand}'s sample mean 
+                    ({brand_result['ci_low']:.3f}, {brand_result['ci_high']:.3f}). This leads us to reject the null hypothesis that '{selected_brand}'s average purchase rate% is similar to the overall average.
+                
+                    This means that '{selected_brand}' does indeed stand out in terms of purchase behavior, and its average purchase rate % is significantly {direction} than 
+                    the overall average of all other brands on the e-commerce platform. 
+                    """)
+                else:
+                    st.write(f"""
+                    ### Inference: 
+
+                    From the t-test results, the population mean ({brand_result['rest_mean']:.3f}) lies within the 95% confidence interval of '{selected_brand}'s sample mean 
+                    ({brand_result['ci_low']:.3f}, {brand_result['ci_high']:.3f}), and we fail to reject the null hypothesis: '{selected_brand}'s average purchase rate% 
+                    is not significantly different from the overall average of all other brands.
+                    """)
+    else:
+        st.error("Failed to load the dataset. Please check the data source.")
 
 # Bayesian Recommendation Tab
 elif selected_page == "Recommendations - Bayesian approach":
@@ -587,41 +791,42 @@ elif selected_page == "Recommendations - Bayesian approach":
 
     # Moving forward with the recommendation logic
     st.write("### Product Recommendation Strategy")
-    
-    # Create the DataFrame with observed likelihoods for product and user
-    data = {
-        "Feature": ["Brand (RUNAIL)", "Premiumness (HIGH)", "Category (292)", "Prior"],
-        "Product": [0.073735, 0.044598, 0.080365, 0.051892],
-        "User": [0.014652, 0.012371, 0.013636, 0.016463]
-    }
-    
-    df10 = pd.DataFrame(data)
 
-    st.write(f"For user = 399445659 and product = 5809910, which belongs to High Premium and 'RUNAIL' brand, the calculated likelihoods are shown below:")
+    if data is not None:
+        model = load_naive_bayes_model(data, data_version)
 
-    # Display the DataFrame as a table in Streamlit
-    st.table(df10)
+        # Most active buyers first
+        top_users = model.user_ids[np.argsort(-model.user_totals[0], kind="stable")[:1000]]
+        selected_user = st.selectbox("Select User ID", top_users, help="Users ordered by number of purchases.")
+        user_recommendations = model.recommend(selected_user, n=10)
 
-    
-    st.write("""
-    Now, using the above likelihoods, we can calculate the posterior probabilities for a user purchasing different products. 
-    By ranking these probabilities in descending order, we can recommend the products with the highest likelihood of purchase to users.
-    """)
+        # The user's recommendations, then the products whose features lean most towards purchases
+        popular_products = model.product_ids[np.argsort(-model.product_log_ratio, kind="stable")[:1000]]
+        product_options = pd.unique(np.concatenate([user_recommendations['product_id'].to_numpy(), popular_products]))
+        selected_product = st.selectbox("Select Product ID", product_options, help="The user's top recommendations first.")
 
+        # Observed likelihoods for the selected product and user
+        likelihood_table, posterior = model.explain(selected_user, selected_product)
+        st.write(f"For user = {selected_user} and product = {selected_product}, the calculated likelihoods are shown below:")
+        st.table(likelihood_table)
+        st.metric("P(purchase | product, user)", f"{posterior:.4f}")
 
-    
-    st.write("#### Example - Probabilities of a user buying different products")
-    st.write("For 2 users and 10 products, let's calculate the likelihood!")
-    
-    # Show image to visualize the recommendation system
-    by_image1 = Image.open(by_image1) # Replace with the correct path
-    st.image(by_image1, use_column_width=True)
+        st.write("""
+        Now, using the above likelihoods, we can calculate the posterior probabilities for a user purchasing different products. 
+        By ranking these probabilities in descending order, we can recommend the products with the highest likelihood of purchase to users.
+        """)
 
-    st.write("")
-    st.write("""
-    Based on these probabilities, we can rank the products in descending order of purchase likelihood and make product recommendations to users, 
-    ensuring they receive personalized suggestions that maximize the likelihood of conversion.
-    """)
+        st.write("#### Probabilities of the user buying different products")
+        st.write(f"Top 10 of {model.n_products:,} products in the catalog for user {selected_user}:")
+        st.table(user_recommendations)
+
+        st.write("")
+        st.write("""
+        Based on these probabilities, we can rank the products in descending order of purchase likelihood and make product recommendations to users, 
+        ensuring they receive personalized suggestions that maximize the likelihood of conversion.
+        """)
+    else:
+        st.warning("Failed to load the dataset. Please check the data source.")
 
 # Price Sensitivity Page
 elif selected_page == "Price Analysis":
@@ -638,128 +843,195 @@ elif selected_page == "Price Analysis":
         unsafe_allow_html=True,
     )
 
-    # --- Load and Preprocess Data ---
-    st.markdown("### Log-Normal Distribution Fit for Prices")
-    log_prices = np.log(data['price'] + 1)
-
-    # Fit log-normal distribution
-    shape, loc, scale = stats.lognorm.fit(log_prices, floc=0)
-    x = np.linspace(log_prices.min(), log_prices.max(), 100)
-    pdf = stats.lognorm.pdf(x, shape, loc, scale)
-
-    # Visualization
-    fig1, ax1 = plt.subplots(figsize=(8, 5))
-    sns.histplot(log_prices, bins=30, kde=False, stat='density', ax=ax1, label='Data')
-    ax1.plot(x, pdf, label='Log-Normal Fit', color='red')
-    ax1.set_title("Log-Normal Distribution Fit for Prices")
-    ax1.set_xlabel("Log Price")
-    ax1.set_ylabel("Density")
-    ax1.legend()
-    st.pyplot(fig1)
+    if data is not None:
+        # --- Price distribution summaries (memoized per dataset version) ---
+        st.markdown("### Log-Normal Distribution Fit for Prices")
+        price_stats = price_summary(data)
+        price_distribution = price_stats["distribution"]
+        shape, loc, scale = price_stats["fit"]
+
+        # Visualization
+        def draw_lognormal_fit(ax):
+            density, bin_edges = price_distribution.density()
+            x = np.linspace(bin_edges[0], bin_edges[-1], 100)
+            ax.stairs(density, bin_edges, fill=True, alpha=0.5, label='Data')
+            ax.plot(x, stats.lognorm.pdf(x, shape, loc, scale), label='Log-Normal Fit', color='red')
+            ax.set_title("Log-Normal Distribution Fit for Prices")
+            ax.set_xlabel("Log Price")
+            ax.set_ylabel("Density")
+            ax.legend()
+
+        st.image(cached_figure((data_version, "price.lognormal_fit"), draw_lognormal_fit), use_column_width=True)
 
-    st.markdown(
-        """
-        **Insights:**  
-        - Prices follow a log-normal distribution, with most products priced in the lower range.
-        - The red curve represents the fitted log-normal distribution, confirming the statistical alignment with observed data.
-        """
-    )
+        st.markdown(
+            """
+            **Insights:**  
+            - Prices follow a log-normal distribution, with most products priced in the lower range.
+            - The red curve represents the fitted log-normal distribution, confirming the statistical alignment with observed data.
+            """
+        )
 
-    # Empirical vs Fitted CDF
-    st.markdown("### Empirical vs Fitted CDF")
-    empirical_cdf = np.arange(1, len(log_prices) + 1) / len(log_prices)
-    sorted_prices = np.sort(log_prices)
-    fitted_cdf = stats.lognorm.cdf(sorted_prices, shape, loc, scale)
-
-    fig2, ax2 = plt.subplots(figsize=(8, 5))
-    ax2.plot(sorted_prices, empirical_cdf, label='Empirical CDF', color='blue')
-    ax2.plot(sorted_prices, fitted_cdf, label='Fitted Log-Normal CDF', color='red', linestyle='--')
-    ax2.set_title("Empirical vs Fitted CDF")
-    ax2.set_xlabel("Log Price")
-    ax2.set_ylabel("Cumulative Probability")
-    ax2.legend()
-    st.pyplot(fig2)
+        # Empirical vs Fitted CDF
+        st.markdown("### Empirical vs Fitted CDF")
 
-    st.markdown(
-        """
-        **Insights:**  
-        - The empirical and fitted CDFs align closely, supporting the assumption of a log-normal price distribution.
-        - Minor deviations may indicate the presence of outliers or other influencing factors.
-        """
-    )
+        def draw_cdfs(ax):
+            sorted_prices, empirical_cdf = lttb(*price_distribution.ecdf())
+            fitted_cdf = stats.lognorm.cdf(sorted_prices, shape, loc, scale)
+            ax.step(sorted_prices, empirical_cdf, where='post', label='Empirical CDF', color='blue')
+            ax.plot(sorted_prices, fitted_cdf, label='Fitted Log-Normal CDF', color='red', linestyle='--')
+            ax.set_title("Empirical vs Fitted CDF")
+            ax.set_xlabel("Log Price")
+            ax.set_ylabel("Cumulative Probability")
+            ax.legend()
 
-    # Purchases by Price Category
-    st.markdown("### Purchases by Price Category")
-    data['price_category'] = data['price'].apply(lambda price: 'Low' if price < 20 else 'Medium' if 20 <= price <= 50 else 'High')
-    category_counts = data[data['event_type'] == 'purchase'].groupby('price_category').size()
+        st.image(cached_figure((data_version, "price.cdfs", LINE_POINTS), draw_cdfs), use_column_width=True)
 
-    fig3, ax3 = plt.subplots(figsize=(8, 5))
-    category_counts.plot(kind='bar', ax=ax3, color='green')
-    ax3.set_title("Purchases by Price Category")
-    ax3.set_xlabel("Price Category")
-    ax3.set_ylabel("Number of Purchases")
-    st.pyplot(fig3)
+        ks = price_stats["ks"]
+        st.write(f"Kolmogorov-Smirnov statistic: {ks['statistic']:.4f} (p-value {ks['pvalue']:.3g})")
 
-    st.markdown(
-        """
-        **Insights:**  
-        - Most purchases occur in the 'Low' and 'Medium' price categories.
-        - This indicates user preference for more affordable products, which should be considered in pricing strategies.
-        """
-    )
+        st.markdown(
+            """
+            **Insights:**  
+            - The empirical and fitted CDFs align closely, supporting the assumption of a log-normal price distribution.
+            - Minor deviations may indicate the presence of outliers or other influencing factors.
+            """
+        )
 
-    # User Clustering
-    st.markdown("### User Clustering Based on Price Sensitivity")
-    user_avg_prices = data[data['event_type'] == 'purchase'].groupby('user_id')['price'].mean().reset_index()
-    user_avg_prices.rename(columns={'price': 'avg_price'}, inplace=True)
+        # Purchases by Price Category
+        st.markdown("### Purchases by Price Category")
 
-    kmeans = KMeans(n_clusters=3, random_state=42)
-    user_avg_prices['cluster'] = kmeans.fit_predict(user_avg_prices[['avg_price']])
+        def draw_price_categories(ax):
+            category_counts = price_stats["purchases_by_category"]
+            ax.bar(category_counts.index, category_counts.values, color='green')
+            ax.set_title("Purchases by Price Category")
+            ax.set_xlabel("Price Category")
+            ax.set_ylabel("Number of Purchases")
 
-    fig4, ax4 = plt.subplots(figsize=(8, 5))
-    sns.scatterplot(x='user_id', y='avg_price', hue='cluster', data=user_avg_prices, palette='viridis', alpha=0.7, ax=ax4)
-    ax4.set_title("User Clusters Based on Average Price Sensitivity")
-    ax4.set_xlabel("User ID")
-    ax4.set_ylabel("Average Price")
-    st.pyplot(fig4)
+        st.image(cached_figure((data_version, "price.categories"), draw_price_categories), use_column_width=True)
 
-    st.markdown(
-        """
-        **Insights:**  
-        - Users are segmented into three clusters based on their average spending habits.
-        - These clusters provide actionable insights for targeted marketing and dynamic pricing strategies.
-        """
-    )
+        st.markdown(
+            """
+            **Insights:**  
+            - Most purchases occur in the 'Low' and 'Medium' price categories.
+            - This indicates user preference for more affordable products, which should be considered in pricing strategies.
+            """
+        )
 
-    # Monte Carlo Simulation
-    st.markdown("### Monte Carlo Simulation: Revenue Variability")
-    avg_price = data['price'].mean()
-    std_dev_price = data['price'].std()
-    conversion_rate = 0.1
-    total_users = 100000
-    n_simulations = 10000
-    revenues = []
-
-    for _ in range(n_simulations):
-        simulated_prices = np.random.normal(avg_price, std_dev_price, total_users)
-        purchases = np.random.binomial(1, conversion_rate, total_users)
-        revenue = np.sum(simulated_prices * purchases)
-        revenues.append(revenue)
-
-    fig5, ax5 = plt.subplots(figsize=(8, 5))
-    ax5.hist(revenues, bins=30, color='blue', alpha=0.7, edgecolor='black')
-    ax5.set_title("Monte Carlo Simulation: Revenue Distribution")
-    ax5.set_xlabel("Revenue")
-    ax5.set_ylabel("Frequency")
-    st.pyplot(fig5)
+        # User Clustering
+        st.markdown("### User Clustering Based on Price Sensitivity")
+
+        segments = load_price_segments(data, data_version)
+        assignments = segments["assignments"]
+        price_centers = segments["price"]["centers"]
+
+        def draw_price_segments(ax):
+            edges = np.histogram_bin_edges(assignments['avg_price'], bins=50)
+            colors = plt.cm.viridis(np.linspace(0, 1, len(price_centers)))
+            for segment, center in enumerate(price_centers):
+                counts, _ = np.histogram(assignments.loc[assignments['price_segment'] == segment, 'avg_price'], bins=edges)
+                label = f"Segment {segment} (center {center:.2f})"
+                ax.stairs(counts, edges, fill=True, alpha=0.7, color=colors[segment], label=label)
+            for boundary in segments["price"]["boundaries"]:
+                ax.axvline(boundary, color='black', linestyle='--', linewidth=1)
+            ax.set_title("User Segments Based on Average Purchase Price")
+            ax.set_xlabel("Average Price")
+            ax.set_ylabel("Number of Users")
+            ax.legend()
+
+        st.image(
+            cached_figure((data_version, "price.price_segments", segments["manifest"]["key"]), draw_price_segments),
+            use_column_width=True,
+        )
+
+        st.markdown("#### Segments over price, price variance, premiumness mix and purchase rate")
+
+        def draw_user_segments(ax):
+            grid = density_grid(assignments['avg_price'], assignments['purchase_rate'], assignments['segment'])
+            draw_density(ax, grid, labels=[f"Segment {segment}" for segment in grid["groups"]])
+            ax.legend()
+            ax.set_title("User Segments: Average Price vs Purchase Rate")
+            ax.set_xlabel("Average Price")
+            ax.set_ylabel("Purchase Rate")
+
+        st.image(
+            cached_figure(
+                (data_version, "price.user_segments", segments["manifest"]["key"], DENSITY_BINS), draw_user_segments
+            ),
+            use_column_width=True,
+        )
+        segment_centers = segments["users"].centers().assign(
+            users=np.bincount(assignments['segment'], minlength=len(segments["users"].centroids))
+        )
+        st.dataframe(segment_centers.rename_axis("Segment").round(3))
+
+        st.markdown(
+            """
+            **Insights:**  
+            - Users are segmented into three clusters based on their average spending habits; the price segments are
+              the exact optimal k-means split of average purchase prices, numbered from the cheapest.
+            - These clusters provide actionable insights for targeted marketing and dynamic pricing strategies.
+            """
+        )
+
+        # Monte Carlo Simulation
+        st.markdown("### Monte Carlo Simulation: Revenue Variability")
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            model_name = st.selectbox("Price model", MODELS, index=0)
+        with col2:
+            conversion_rate = st.number_input("Conversion rate", min_value=0.0, max_value=1.0, value=0.1, step=0.01)
+        with col3:
+            total_users = st.number_input("Users per run", min_value=1, value=100000, step=10000)
+        with col4:
+            n_simulations = st.number_input("Simulations", min_value=100, value=10000, step=1000)
+        with col5:
+            seed = st.number_input("Seed", min_value=0, value=42, step=1)
+
+        revenues, summary = run_revenue_simulation(
+            data,
+            data_version,
+            model_name,
+            int(total_users),
+            float(conversion_rate),
+            int(n_simulations),
+            int(seed),
+        )
+
+        def draw_revenues(ax):
+            counts, edges = histogram(revenues, bins=30)
+            ax.stairs(counts, edges, fill=True, color='blue', alpha=0.7)
+            ax.stairs(counts, edges, color='black')
+            ax.set_title("Monte Carlo Simulation: Revenue Distribution")
+            ax.set_xlabel("Revenue")
+            ax.set_ylabel("Frequency")
+
+        simulation_key = (model_name, int(total_users), float(conversion_rate), int(n_simulations), int(seed))
+        st.image(
+            cached_figure((data_version, "price.revenues", 30) + simulation_key, draw_revenues),
+            use_column_width=True,
+        )
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Expected Revenue", f"${summary['mean']:,.2f}")
+        col2.metric("Revenue Std Dev", f"${summary['std']:,.2f}")
+        col3.metric("95% Interval", f"${summary['interval_95'][0]:,.0f} - ${summary['interval_95'][1]:,.0f}")
+        st.table(
+            pd.DataFrame(
+                {"Revenue": list(summary["quantiles"].values())},
+                index=[f"{q:.1%}" for q in summary["quantiles"]],
+            ).rename_axis("Quantile")
+        )
+
+        st.markdown(
+            """
+            **Insights:**  
+            - The Monte Carlo simulation reveals expected revenue variability due to price and conversion rate fluctuations.
+            - This provides a 95% confidence interval for revenue projections, aiding in financial planning.
+            """
+        )
+    else:
+        st.error("Failed to load the dataset. Please check the data source.")
 
-    st.markdown(
-        """
-        **Insights:**  
-        - The Monte Carlo simulation reveals expected revenue variability due to price and conversion rate fluctuations.
-        - This provides a 95% confidence interval for revenue projections, aiding in financial planning.
-        """
-    )
 
 # --- Recommendation System Page ---
 if selected_page == "Recommendations - Frequentist approach":
@@ -781,77 +1053,32 @@ if selected_page == "Recommendations - Frequentist approach":
             # --- Preprocessing ---
             st.info("Preparing data for recommendations...")
 
-            data['event_time'] = pd.to_datetime(data['event_time'])
-            current_time = datetime.now(pytz.UTC)
-
-            # Compute time decay
-            data['time_decay'] = data['event_time'].apply(lambda x: 1 / (1 + abs((current_time - x).days)))
-            data['weighted_temporal'] = data['time_decay']
-
-            # Filter for interactions
+            # Models are loaded from (or built once into) the versioned artifact store
             min_user_interactions = 3
             min_item_interactions = 3
-            user_interaction_counts = data['user_id'].value_counts()
-            item_interaction_counts = data['product_id'].value_counts()
-            data = data[data['user_id'].isin(user_interaction_counts[user_interaction_counts >= min_user_interactions].index)]
-            data = data[data['product_id'].isin(item_interaction_counts[item_interaction_counts >= min_item_interactions].index)]
-
-            # Content-based filtering setup
-            unique_products = data[['product_id', 'price', 'log_price', 'brand']].drop_duplicates()
-            unique_products.reset_index(drop=True, inplace=True)
-
-            # Sampling for cosine similarity
-            sample_size = min(5000, len(unique_products))  # Limit for memory efficiency
-            sampled_products = unique_products.sample(sample_size, random_state=42)
-
-            product_features = sampled_products[['price', 'log_price']].fillna(0)
-            scaler = MinMaxScaler()
-            normalized_features = scaler.fit_transform(product_features)
-
-            # NearestNeighbors for cosine similarity
-            product_model = NearestNeighbors(metric='cosine', algorithm='brute')
-            product_model.fit(normalized_features)
-
-            def recommend_similar_products(product_id, n=10):
-                try:
-                    product_index = sampled_products[sampled_products['product_id'] == product_id].index[0]
-                    distances, indices = product_model.kneighbors([normalized_features[product_index]], n_neighbors=n)
-                    similar_products = sampled_products.iloc[indices[0]][['product_id', 'brand']]
-                    return similar_products
-                except IndexError:
-                    return pd.DataFrame(columns=['product_id', 'brand'])
-
-            # Collaborative filtering setup
-            interaction_matrix = coo_matrix(
-                (data['weighted_temporal'],
-                 (data['user_id'].astype('category').cat.codes,
-                  data['product_id'].astype('category').cat.codes))
+            artifacts = load_frequentist_artifacts(
+                data,
+                data_version,
+                datetime.now(pytz.UTC).date(),
+                min_user_interactions,
+                min_item_interactions,
             )
-            interaction_matrix_csr = interaction_matrix.tocsr()
+            index = artifacts["index"]
+            product_index = artifacts["product_index"]
+            interaction_matrix_csr = artifacts["interaction_matrix_csr"]
+            item_similarity = artifacts["item_similarity"]
 
-            model = NearestNeighbors(metric='cosine', algorithm='brute')
-            model.fit(interaction_matrix_csr.T)
+            def recommend_similar_products(product_id, n=10):
+                # Approximate cosine neighbors over the full product catalog
+                similar_codes, similarities = product_index.query_id(index.item_code(product_id), k=n)
+                return index.items_frame(similar_codes)
 
             def recommend_items(user_id, n=10):
-                try:
-                    user_idx = data['user_id'].astype('category').cat.codes[data['user_id'] == user_id].iloc[0]
-                    user_interactions = interaction_matrix_csr[user_idx]
-                    interacted_items = user_interactions.indices
-
-                    similar_items = []
-                    for item_idx in interacted_items:
-                        distances, indices = model.kneighbors(interaction_matrix_csr.T[item_idx], n_neighbors=n)
-                        similar_items.extend(indices.flatten())
-
-                    similar_items = set(similar_items) - set(interacted_items)
-                    recommended_products = [
-                        (data['product_id'].astype('category').cat.categories[i],
-                         unique_products[unique_products['product_id'] == data['product_id'].astype('category').cat.categories[i]]['brand'].values[0])
-                        for i in similar_items if i < len(data['product_id'].astype('category').cat.categories)
-                    ]
-                    return pd.DataFrame(recommended_products, columns=['product_id', 'brand'])[:n]
-                except IndexError:
+                user_idx = index.user_code(user_id)
+                if user_idx < 0:
                     return pd.DataFrame(columns=['product_id', 'brand'])
+                # One sparse product against the precomputed top-K item-item similarities
+                return index.items_frame(recommend_for_user(item_similarity, interaction_matrix_csr, user_idx, n=n))
 
             # Hybrid Recommendations
             def hybrid_recommendations(user_id, product_id, n=10):
@@ -862,8 +1089,8 @@ if selected_page == "Recommendations - Frequentist approach":
 
             # --- Interactive Inputs ---
             st.markdown("### Generate Hybrid Recommendations")
-            user_ids = data['user_id'].unique()
-            product_ids = data['product_id'].unique()
+            user_ids = index.user_ids
+            product_ids = index.item_ids
 
             selected_user = st.selectbox("Select User ID", user_ids, help="Choose a user ID for recommendations.")
             selected_product = st.selectbox("Select Product ID", product_ids, help="Choose a product ID for recommendations.")
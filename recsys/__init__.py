@@ -0,0 +1,4 @@
+"""
+Reusable data, modelling and analysis components behind the e-commerce
+recommendation dashboard (app/main.py) and the offline analysis scripts.
+"""
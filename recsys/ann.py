@@ -0,0 +1,227 @@
+"""
+Approximate nearest-neighbor index for cosine similarity, implemented on NumPy.
+
+Random-projection LSH: every table hashes a unit vector to the sign pattern of
+its projections on `n_bits` random hyperplanes. Each table keeps its codes
+sorted, so a bucket lookup is two binary searches. A query probes its own
+bucket plus the buckets reached by flipping the `n_probes` least certain bits
+(multi-probe LSH), then re-ranks the candidates exactly.
+
+Inside a bucket rows are ordered by their projection on one more random
+direction, and only the `window` rows on either side of the query's position
+are taken. This bounds the work per bucket when buckets are large, which is
+the normal case for low-dimensional features such as (price, log_price).
+
+More tables, probes and a wider window raise recall at the cost of latency.
+Rows added after the last compaction live in a small delta segment that is
+always scanned exactly until it is merged into the tables.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+# Rows that may sit in the delta segment before add() merges them into the tables
+DELTA_LIMIT = 10_000
+
+
+def _normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class RandomProjectionIndex:
+    """
+    Cosine-similarity ANN index.
+
+    Parameters:
+    - dim (int): Vector dimension.
+    - n_tables (int): Hash tables; more tables raise recall and latency.
+    - n_bits (int): Hyperplanes per table (at most 64); more bits mean smaller buckets.
+    - n_probes (int): Extra buckets probed per table by flipping the least certain bits.
+    - window (int): Rows taken on each side of the query inside a probed bucket.
+    - seed (int): Seed for the hyperplanes.
+    """
+
+    def __init__(self, dim, n_tables=4, n_bits=16, n_probes=2, window=32, seed=42):
+        if not 0 < n_bits <= 64:
+            raise ValueError("n_bits must be between 1 and 64.")
+        self.dim = dim
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self.window = window
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, n_bits, dim)).astype(np.float32)
+        # Direction ordering the rows inside each bucket
+        self.directions = rng.standard_normal((n_tables, dim)).astype(np.float32)
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        # Per table: row numbers sorted by (code, position along the table's direction)
+        self.order = np.empty((n_tables, 0), dtype=np.int64)
+        self.sorted_codes = np.empty((n_tables, 0), dtype=np.uint64)
+        self.sorted_positions = np.empty((n_tables, 0), dtype=np.float32)
+        self._id_lookup = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_indexed(self):
+        """
+        Rows covered by the hash tables; later rows form the delta segment.
+        """
+        return self.order.shape[1]
+
+    def _project(self, vectors):
+        return np.einsum("tbd,nd->tnb", self.planes, vectors)
+
+    def _codes(self, projections):
+        weights = np.left_shift(np.uint64(1), np.arange(self.n_bits, dtype=np.uint64))
+        return ((projections > 0).astype(np.uint64) * weights).sum(axis=-1, dtype=np.uint64)
+
+    def build(self, ids, vectors):
+        """
+        Bulk-loads the index, replacing its contents.
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = _normalize(vectors)
+        self.order = np.empty((self.n_tables, 0), dtype=np.int64)
+        self._id_lookup = None
+        self.compact()
+        return self
+
+    def add(self, ids, vectors):
+        """
+        Appends vectors; they are searchable immediately through the delta segment.
+        """
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.vectors = np.concatenate([self.vectors, _normalize(vectors)])
+        self._id_lookup = None
+        if len(self) - self.n_indexed > DELTA_LIMIT:
+            self.compact()
+        return self
+
+    def compact(self):
+        """
+        Rehashes all rows into the sorted tables, emptying the delta segment.
+        """
+        codes = self._codes(self._project(self.vectors))
+        positions = self.directions @ self.vectors.T
+        self.order = np.stack([np.lexsort((positions[table], codes[table])) for table in range(self.n_tables)])
+        self.sorted_codes = np.take_along_axis(codes, self.order, axis=1)
+        self.sorted_positions = np.take_along_axis(positions, self.order, axis=1)
+        return self
+
+    def _candidates(self, vector, n_probes, window):
+        projections = self._project(vector[None, :])[:, 0, :]
+        codes = self._codes(projections)
+        positions = self.directions @ vector
+
+        # Probe the query's bucket and the buckets one flip away on the least certain bits
+        n_probes = min(n_probes, self.n_bits)
+        flip_bits = np.argsort(np.abs(projections), axis=1)[:, :n_probes].astype(np.uint64)
+        probes = np.concatenate([codes[:, None], codes[:, None] ^ (np.uint64(1) << flip_bits)], axis=1)
+
+        found = []
+        for table in range(self.n_tables):
+            starts = np.searchsorted(self.sorted_codes[table], probes[table], side="left")
+            stops = np.searchsorted(self.sorted_codes[table], probes[table], side="right")
+            for start, stop in zip(starts, stops):
+                if stop - start > 2 * window:
+                    # Large bucket: keep the rows closest to the query along the table's direction
+                    middle = start + np.searchsorted(self.sorted_positions[table, start:stop], positions[table])
+                    start, stop = max(start, middle - window), min(stop, middle + window)
+                if stop > start:
+                    found.append(self.order[table, start:stop])
+        found.append(np.arange(self.n_indexed, len(self)))
+        return np.unique(np.concatenate(found))
+
+    def query(self, vector, k=10, n_probes=None, window=None):
+        """
+        Approximate k most cosine-similar rows to a vector.
+
+        Parameters:
+        - vector (array): Query vector.
+        - k (int): Number of neighbors.
+        - n_probes (int): Override the index's probe count for this query.
+        - window (int): Override the index's bucket window for this query.
+
+        Returns:
+        - tuple: (ids, similarities), most similar first.
+        """
+        vector = _normalize(vector)[0]
+        k = min(k, len(self))
+        candidates = self._candidates(
+            vector,
+            self.n_probes if n_probes is None else n_probes,
+            self.window if window is None else window,
+        )
+        if len(candidates) < k:
+            # Too few hash hits to fill the answer; fall back to an exact scan
+            candidates = np.arange(len(self))
+
+        scores = self.vectors[candidates] @ vector
+        if len(candidates) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[best], scores[best]
+        ranked = np.lexsort((candidates, -scores))
+        return self.ids[candidates[ranked]], scores[ranked]
+
+    def query_id(self, item_id, k=10, n_probes=None, window=None):
+        """
+        Neighbors of a stored row, looked up by id (the row itself ranks first).
+        Returns empty arrays when the id is not in the index.
+        """
+        if self._id_lookup is None:
+            self._id_lookup = dict(zip(self.ids.tolist(), range(len(self.ids))))
+        row = self._id_lookup.get(item_id)
+        if row is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return self.query(self.vectors[row], k, n_probes, window)
+
+    def save(self, directory):
+        """
+        Writes the index as .npy buffers plus a JSON header; the delta segment is merged first.
+        """
+        if self.n_indexed != len(self):
+            self.compact()
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "ann_ids.npy", self.ids)
+        np.save(directory / "ann_vectors.npy", self.vectors)
+        np.save(directory / "ann_planes.npy", self.planes)
+        np.save(directory / "ann_directions.npy", self.directions)
+        np.save(directory / "ann_sorted_positions.npy", self.sorted_positions)
+        np.save(directory / "ann_order.npy", self.order)
+        np.save(directory / "ann_sorted_codes.npy", self.sorted_codes)
+        header = {
+            "dim": self.dim,
+            "n_tables": self.n_tables,
+            "n_bits": self.n_bits,
+            "n_probes": self.n_probes,
+            "window": self.window,
+            "seed": self.seed,
+        }
+        (directory / "ann.json").write_text(json.dumps(header))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Loads an index written by save(), memory-mapping its buffers read-only by default.
+        """
+        directory = Path(directory)
+        header = json.loads((directory / "ann.json").read_text())
+        index = cls(**header)
+        mode = "r" if mmap else None
+        index.ids = np.load(directory / "ann_ids.npy", mmap_mode=mode)
+        index.vectors = np.load(directory / "ann_vectors.npy", mmap_mode=mode)
+        index.planes = np.load(directory / "ann_planes.npy")
+        index.directions = np.load(directory / "ann_directions.npy")
+        index.sorted_positions = np.load(directory / "ann_sorted_positions.npy", mmap_mode=mode)
+        index.order = np.load(directory / "ann_order.npy", mmap_mode=mode)
+        index.sorted_codes = np.load(directory / "ann_sorted_codes.npy", mmap_mode=mode)
+        return index
@@ -0,0 +1,271 @@
+"""
+Persisted, versioned model artifacts for the Frequentist recommender page.
+
+Everything the page used to rebuild on each Streamlit rerun (the user x item
+interaction matrix, the MinMaxScaler, the content-based ANN index over the
+whole catalog and the top-K item-item similarity matrix) is built
+once and written to `<cache dir>/artifacts/<key>/`. The key is derived from the
+dataset fingerprint and the build parameters, so a prebuilt directory is reused
+by every process that loads the same data with the same settings. The time
+decay's reference date is one of those parameters; a build for a new date
+removes the directories built for earlier dates with otherwise equal settings.
+
+Usage (offline build, e.g. during deploy):
+    python -m recsys.artifacts --data-path enhanced_1M_dataset.zip
+"""
+import argparse
+import json
+import logging
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+from sklearn.preprocessing import MinMaxScaler
+
+from recsys.ann import RandomProjectionIndex
+from recsys.data_store import LocalSource, dataset_version, default_source, load_dataset
+from recsys.index import InteractionIndex
+from recsys.item_similarity import build_item_similarity
+from recsys.preprocessing import prepare_interactions
+from recsys.store import build_manifest, store_key, store_root, write_directory
+
+# Bump when the artifact layout changes so stale directories are not reused (see recsys.store)
+ARTIFACT_FORMAT_VERSION = 4
+
+DEFAULT_PARAMS = {
+    "min_user_interactions": 3,
+    "min_item_interactions": 3,
+    "decay": "hyperbolic",
+    "neighbors": 50,
+    "ann_tables": 4,
+    "ann_bits": 16,
+    "ann_probes": 2,
+    "ann_window": 32,
+}
+
+
+def resolve_params(params=None, reference_date=None):
+    """
+    Fills in default build parameters. `reference_date` (ISO date) anchors the time decay.
+    """
+    resolved = dict(DEFAULT_PARAMS)
+    resolved.update(params or {})
+    resolved["reference_date"] = str(reference_date or resolved.get("reference_date") or datetime.now(timezone.utc).date())
+    return resolved
+
+
+def save_csr(matrix, directory, name):
+    """
+    Stores a CSR matrix as separate .npy buffers so it can be memory-mapped on load.
+    """
+    np.save(directory / f"{name}.data.npy", matrix.data)
+    np.save(directory / f"{name}.indices.npy", matrix.indices)
+    np.save(directory / f"{name}.indptr.npy", matrix.indptr)
+    return list(matrix.shape)
+
+
+def load_csr(directory, name, shape, mmap=True):
+    """
+    Loads a CSR matrix written by save_csr, memory-mapping its buffers read-only by default.
+    """
+    mode = "r" if mmap else None
+    data = np.load(directory / f"{name}.data.npy", mmap_mode=mode)
+    indices = np.load(directory / f"{name}.indices.npy", mmap_mode=mode)
+    indptr = np.load(directory / f"{name}.indptr.npy", mmap_mode=mode)
+    return csr_matrix((data, indices, indptr), shape=tuple(shape), copy=False)
+
+
+def build_artifacts(interactions, params):
+    """
+    Builds the content-based and collaborative-filtering models from prepared interactions.
+
+    Parameters:
+    - interactions (DataFrame): Output of recsys.preprocessing.prepare_interactions.
+    - params (dict): Resolved build parameters.
+
+    Returns:
+    - dict: Artifacts keyed by name.
+    """
+    index = InteractionIndex.from_interactions(interactions)
+
+    # Content-based filtering setup: one feature row per item code, covering the whole catalog
+    _, first_event = np.unique(index.item_codes, return_index=True)
+    product_features = interactions[["price", "log_price"]].iloc[first_event].fillna(0)
+    scaler = MinMaxScaler()
+    normalized_features = scaler.fit_transform(product_features)
+
+    product_index = RandomProjectionIndex(
+        normalized_features.shape[1],
+        n_tables=params["ann_tables"],
+        n_bits=params["ann_bits"],
+        n_probes=params["ann_probes"],
+        window=params["ann_window"],
+    )
+    product_index.build(np.arange(index.n_items), normalized_features)
+
+    # Collaborative filtering setup
+    interaction_matrix_csr = coo_matrix(
+        (interactions["weighted_temporal"].to_numpy(), (index.user_codes, index.item_codes)),
+        shape=(index.n_users, index.n_items),
+    ).tocsr()
+
+    item_similarity = build_item_similarity(interaction_matrix_csr, k=params["neighbors"])
+
+    return {
+        "scaler": scaler,
+        "product_index": product_index,
+        "index": index,
+        "interaction_matrix_csr": interaction_matrix_csr,
+        "item_similarity": item_similarity,
+    }
+
+
+def save_artifacts(artifacts, directory, manifest, replace=False):
+    """
+    Writes artifacts to `directory` atomically (see recsys.store.write_directory).
+    """
+
+    def write(tmp_dir):
+        artifacts["index"].save(tmp_dir)
+        artifacts["product_index"].save(tmp_dir)
+        manifest["interaction_shape"] = save_csr(artifacts["interaction_matrix_csr"], tmp_dir, "interactions")
+        manifest["similarity_shape"] = save_csr(artifacts["item_similarity"], tmp_dir, "item_similarity")
+        joblib.dump({"scaler": artifacts["scaler"]}, tmp_dir / "models.joblib")
+        (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    write_directory(directory, write, replace)
+
+
+def prune_artifacts(root, manifest):
+    """
+    Removes the artifact directories a newer build supersedes: same dataset version and build
+    parameters, with the time decay anchored to an earlier reference date.
+
+    Returns:
+    - list: Removed directories.
+    """
+    params = {name: value for name, value in manifest["params"].items() if name != "reference_date"}
+    removed = []
+    for directory in Path(root).iterdir():
+        manifest_path = directory / "manifest.json"
+        if directory.name == manifest["key"] or not manifest_path.exists():
+            continue
+        try:
+            other = json.loads(manifest_path.read_text())
+        except (OSError, ValueError):
+            continue
+        other_params = dict(other.get("params", {}))
+        other_date = other_params.pop("reference_date", None)
+        if (
+            other.get("dataset_version") == manifest["dataset_version"]
+            and other_params == params
+            and other_date is not None
+            and other_date < manifest["params"]["reference_date"]
+        ):
+            # Processes still memory-mapping these files keep them until they unmap
+            shutil.rmtree(directory, ignore_errors=True)
+            removed.append(directory)
+    return removed
+
+
+def load_artifacts(directory):
+    """
+    Loads an artifact directory written by save_artifacts.
+
+    Returns:
+    - dict: Artifacts keyed by name, plus the build manifest under 'manifest' and
+      the artifact directory under 'directory'.
+    """
+    directory = Path(directory)
+    manifest = json.loads((directory / "manifest.json").read_text())
+    artifacts = joblib.load(directory / "models.joblib")
+    artifacts.update(
+        {
+            "manifest": manifest,
+            "directory": directory,
+            "index": InteractionIndex.load(directory),
+            "product_index": RandomProjectionIndex.load(directory),
+            "interaction_matrix_csr": load_csr(directory, "interactions", manifest["interaction_shape"]),
+            "item_similarity": load_csr(directory, "item_similarity", manifest["similarity_shape"]),
+        }
+    )
+    return artifacts
+
+
+def load_or_build_artifacts(data, params=None, reference_date=None, root=None, rebuild=False):
+    """
+    Returns the artifacts for a dataset, building and persisting them on a cache miss.
+
+    Parameters:
+    - data (DataFrame): Enhanced dataset.
+    - params (dict): Build parameters overriding DEFAULT_PARAMS.
+    - reference_date: Date the time decay is anchored to (default: today, UTC).
+    - root (Path): Artifact root directory (default: <cache dir>/artifacts).
+    - rebuild (bool): Build even if the artifacts already exist.
+
+    Returns:
+    - dict: Artifacts keyed by name.
+    """
+    params = resolve_params(params, reference_date)
+    version = dataset_version(data)
+    key = store_key(version, params, ARTIFACT_FORMAT_VERSION)
+    directory = store_root("artifacts", root) / key
+
+    if rebuild or not (directory / "manifest.json").exists():
+        start = time.perf_counter()
+        interactions = prepare_interactions(
+            data,
+            params["min_user_interactions"],
+            params["min_item_interactions"],
+            params["decay"],
+            now=pd.Timestamp(params["reference_date"], tz="UTC"),
+        )
+        artifacts = build_artifacts(interactions, params)
+        manifest = build_manifest(key, version, params, ARTIFACT_FORMAT_VERSION, time.perf_counter() - start)
+        save_artifacts(artifacts, directory, manifest, replace=rebuild)
+        prune_artifacts(directory.parent, manifest)
+
+    return load_artifacts(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Frequentist recommender artifacts offline.")
+    parser.add_argument("--data-path", help="Local dataset file (default: ECOM_DATA_PATH or Google Drive).")
+    parser.add_argument("--root", help="Artifact root directory (default: <cache dir>/artifacts).")
+    parser.add_argument("--min-user-interactions", type=int, default=DEFAULT_PARAMS["min_user_interactions"])
+    parser.add_argument("--min-item-interactions", type=int, default=DEFAULT_PARAMS["min_item_interactions"])
+    parser.add_argument("--decay", default=DEFAULT_PARAMS["decay"])
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_PARAMS["neighbors"], help="Item-item neighbors kept per item.")
+    parser.add_argument("--ann-tables", type=int, default=DEFAULT_PARAMS["ann_tables"], help="LSH tables (recall vs latency).")
+    parser.add_argument("--ann-bits", type=int, default=DEFAULT_PARAMS["ann_bits"], help="Hyperplanes per LSH table.")
+    parser.add_argument("--ann-probes", type=int, default=DEFAULT_PARAMS["ann_probes"], help="Extra buckets probed per table.")
+    parser.add_argument("--ann-window", type=int, default=DEFAULT_PARAMS["ann_window"], help="Rows taken around the query per bucket.")
+    parser.add_argument("--reference-date", help="ISO date the time decay is anchored to (default: today).")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the artifacts exist.")
+    args = parser.parse_args()
+    # Shows the dataset cache's memory report when the dataset is converted
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    source = LocalSource(args.data_path) if args.data_path else default_source()
+    data = load_dataset(source, read_only=True)
+    params = {
+        "min_user_interactions": args.min_user_interactions,
+        "min_item_interactions": args.min_item_interactions,
+        "decay": args.decay,
+        "neighbors": args.neighbors,
+        "ann_tables": args.ann_tables,
+        "ann_bits": args.ann_bits,
+        "ann_probes": args.ann_probes,
+        "ann_window": args.ann_window,
+    }
+    artifacts = load_or_build_artifacts(data, params, args.reference_date, args.root, args.rebuild)
+    print(json.dumps(artifacts["manifest"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Offline latency, throughput and memory benchmarks for the dashboard's hot paths.
+
+Runs without network access or Streamlit: a synthetic event log of each
+requested size (recsys.synthetic) is written to a temporary directory and
+pushed through the same code the app uses. Every stage is timed separately over several runs
+(p50/p95/p99 in milliseconds), then run once more under tracemalloc for its
+peak Python/NumPy allocation. The results are written as JSON so two commits
+can be compared with --compare.
+
+Stages:
+- load_cold: fetch, decode, compact and write the Arrow cache (recsys.data_store)
+- load_warm: memory-map the cached Arrow file
+- preprocess: time decay and interaction filters (recsys.preprocessing)
+- fit: index, ANN index and item-item similarity (recsys.artifacts.build_artifacts)
+- recommend_single: one hybrid recommendation, as served by the Frequentist page
+- recommend_batch: top-N for every user (recsys.batch)
+- price_analysis: the Price Analysis page's log-normal fit, price categories and clustering
+
+Usage:
+    python -m recsys.benchmark --sizes 50000 200000 1000000 --output bench.json
+    python -m recsys.benchmark --sizes 50000 --compare bench.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from recsys.artifacts import DEFAULT_PARAMS, build_artifacts
+from recsys.batch import recommend_batch
+from recsys.data_store import LocalSource, load_dataset
+from recsys.item_similarity import recommend_for_user
+from recsys.preprocessing import prepare_interactions
+from recsys.price_distribution import PriceDistribution, log_prices, purchases_by_category
+from recsys.segmentation import build_segments, resolve_params as resolve_segment_params
+from recsys.synthetic import generate_events
+
+DEFAULT_SIZES = [50_000, 200_000]
+# Reference time for the decay, so runs on different days do the same work
+REFERENCE_TIME = pd.Timestamp("2020-03-01", tz="UTC")
+
+
+def fixture_events(n_events, seed=0):
+    """
+    Synthetic enhanced-schema event log (recsys.synthetic).
+
+    Parameters:
+    - n_events (int): Number of events.
+    - seed (int): Random seed.
+
+    Returns:
+    - DataFrame: Events with the columns the benchmarked stages read.
+    """
+    return pd.concat(generate_events(n_events, seed=seed), ignore_index=True)
+
+
+def summarize(seconds):
+    """
+    Latency percentiles in milliseconds for a list of timings in seconds.
+    """
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        "runs": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def measure(function, repeats, setup=None):
+    """
+    Times `function` over `repeats` runs, then runs it once more under tracemalloc.
+
+    Parameters:
+    - function (callable): Stage to benchmark; called with no arguments.
+    - repeats (int): Timed runs.
+    - setup (callable): Called before every run, outside the timed section.
+
+    Returns:
+    - tuple: (summary dict with percentiles and peak_memory_mb, result of the last run)
+    """
+    timings = []
+    result = None
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    summary = summarize(timings)
+    summary["peak_memory_mb"] = round(peak / 2**20, 2)
+    return summary, result
+
+
+def price_analysis(data):
+    """
+    The Price Analysis page's computations without the plotting.
+    """
+    # The summaries price_summary memoizes, built from scratch on every call
+    distribution = PriceDistribution(log_prices(data["price"].to_numpy()))
+    shape, _, scale = distribution.fit()
+    distribution.ks_test()
+    purchases_by_category(data)
+
+    # The segments load_or_build_segments persists, fitted from scratch
+    build_segments(data, resolve_segment_params())
+    return shape, scale
+
+
+def benchmark_size(n_events, workdir, repeats=5, request_repeats=200, seed=0):
+    """
+    Benchmarks every stage on a fixture of `n_events` events.
+
+    Returns:
+    - dict: Dataset shape and per-stage results.
+    """
+    workdir = Path(workdir)
+    source_path = workdir / f"events_{n_events}.parquet"
+    fixture_events(n_events, seed).to_parquet(source_path, index=False)
+    source = LocalSource(source_path)
+    cache = workdir / f"cache_{n_events}"
+
+    def clear_cache():
+        shutil.rmtree(cache, ignore_errors=True)
+
+    results = {}
+    results["load_cold"], _ = measure(lambda: load_dataset(source, cache), repeats, setup=clear_cache)
+    results["load_warm"], data = measure(lambda: load_dataset(source, cache), repeats)
+
+    def preprocess():
+        return prepare_interactions(
+            data,
+            DEFAULT_PARAMS["min_user_interactions"],
+            DEFAULT_PARAMS["min_item_interactions"],
+            DEFAULT_PARAMS["decay"],
+            now=REFERENCE_TIME,
+        )
+
+    results["preprocess"], interactions = measure(preprocess, repeats)
+    results["fit"], artifacts = measure(lambda: build_artifacts(interactions, DEFAULT_PARAMS), repeats)
+
+    index = artifacts["index"]
+    rng = np.random.default_rng(seed)
+    user_codes = rng.integers(0, index.n_users, request_repeats)
+    item_codes = rng.integers(0, index.n_items, request_repeats)
+    requests = itertools.count()
+
+    def recommend_single():
+        # Same work as hybrid_recommendations on the Frequentist page
+        request = next(requests) % request_repeats
+        content = artifacts["product_index"].query_id(int(item_codes[request]), k=10)[0]
+        collaborative = recommend_for_user(
+            artifacts["item_similarity"], artifacts["interaction_matrix_csr"], int(user_codes[request]), n=10
+        )
+        frame = pd.concat([index.items_frame(content), index.items_frame(collaborative)])
+        return frame.drop_duplicates().head(10)
+
+    results["recommend_single"], _ = measure(recommend_single, request_repeats)
+
+    results["recommend_batch"], _ = measure(lambda: recommend_batch(artifacts, n=10), repeats)
+    results["recommend_batch"]["users"] = index.n_users
+    results["recommend_batch"]["users_per_second"] = round(index.n_users / (results["recommend_batch"]["p50_ms"] / 1000.0), 1)
+
+    results["price_analysis"], _ = measure(lambda: price_analysis(data), repeats)
+
+    return {
+        "events": int(len(data)),
+        "interactions": int(len(interactions)),
+        "users": int(index.n_users),
+        "items": int(index.n_items),
+        "stages": results,
+    }
+
+
+def environment():
+    """
+    Machine and code version the results were measured on.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).resolve().parent, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "run_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def run_benchmarks(sizes=None, repeats=5, request_repeats=200, seed=0):
+    """
+    Runs the benchmark for every dataset size in a temporary directory.
+
+    Returns:
+    - dict: JSON-serializable results keyed by dataset size.
+    """
+    report = {"environment": environment(), "repeats": repeats, "request_repeats": request_repeats, "sizes": {}}
+    with tempfile.TemporaryDirectory(prefix="recsys-bench-") as workdir:
+        for n_events in sizes or DEFAULT_SIZES:
+            report["sizes"][str(n_events)] = benchmark_size(n_events, workdir, repeats, request_repeats, seed)
+    return report
+
+
+def compare(baseline, current):
+    """
+    p50 ratio (current / baseline) per size and stage; above 1 means slower.
+    """
+    ratios = {}
+    for size, result in current["sizes"].items():
+        if size not in baseline["sizes"]:
+            continue
+        before = baseline["sizes"][size]["stages"]
+        ratios[size] = {
+            stage: round(values["p50_ms"] / before[stage]["p50_ms"], 3)
+            for stage, values in result["stages"].items()
+            if stage in before and before[stage]["p50_ms"] > 0
+        }
+    return ratios
+
+
+def format_report(report):
+    lines = [f"{'size':>10} {'stage':<18} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak MB':>9}"]
+    for size, result in report["sizes"].items():
+        for stage, values in result["stages"].items():
+            lines.append(
+                f"{size:>10} {stage:<18} {values['p50_ms']:>10.3f} {values['p95_ms']:>10.3f} "
+                f"{values['p99_ms']:>10.3f} {values['peak_memory_mb']:>9.1f}"
+            )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data loading, preprocessing and recommendation offline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Fixture sizes in events.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per stage.")
+    parser.add_argument("--request-repeats", type=int, default=200, help="Timed single recommendations.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    parser.add_argument("--compare", help="Earlier JSON results to compare p50 latencies against.")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.repeats, args.request_repeats, args.seed)
+    if args.compare:
+        with open(args.compare) as handle:
+            report["compared_to"] = {"file": args.compare, "p50_ratio": compare(json.load(handle), report)}
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    print(format_report(report))
+    if args.compare:
+        print(json.dumps(report["compared_to"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Versioned local cache for the enhanced event dataset.
+
+The first load fetches the raw payload from a source (Google Drive by default,
+or a local file), fingerprints its content and converts it into an uncompressed
+Arrow IPC file using the compact schema from recsys.schema. Every later start memory-maps that file instead of downloading
+and unpickling the dataset again.
+
+Environment variables:
+- ECOM_DATA_PATH: read the dataset from this local file instead of Google Drive
+  (.zip, .pkl, .parquet, .arrow/.feather or .csv).
+- ECOM_CACHE_DIR: directory holding the cached Arrow files (default ~/.cache/ecom_recsys).
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import weakref
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from recsys.schema import frame_memory, memory_report, optimize_frame
+
+logger = logging.getLogger(__name__)
+
+# id(frame) -> (weak reference to the frame, dataset version), see register_version
+_versions = {}
+
+# Bump when the on-disk layout changes so old cache files are rebuilt
+CACHE_FORMAT_VERSION = 2
+
+DRIVE_FILE_ID = "1YcnadUrqyq68Cag_7diw9JW9yUPDvkhr"
+MANIFEST_NAME = "manifest.json"
+
+
+def cache_dir():
+    """
+    Returns the dataset cache directory, creating it if needed.
+    """
+    path = Path(os.environ.get("ECOM_CACHE_DIR", Path.home() / ".cache" / "ecom_recsys"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class DriveSource:
+    """
+    Fetches the zipped pickle of the enhanced dataset from Google Drive.
+    """
+
+    def __init__(self, file_id=DRIVE_FILE_ID):
+        self.file_id = file_id
+
+    def cache_key(self):
+        return f"drive-{self.file_id}"
+
+    def fetch(self):
+        # Imported lazily so air-gapped hosts using a LocalSource do not need gdown
+        import gdown
+
+        buffer = io.BytesIO()
+        gdown.download(f"https://drive.google.com/uc?id={self.file_id}", output=buffer, quiet=False, fuzzy=True)
+        return buffer.getvalue(), "dataset.zip"
+
+
+class LocalSource:
+    """
+    Reads the dataset from a file on the local filesystem.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser().resolve()
+
+    def cache_key(self):
+        # Size and mtime are enough to notice a replaced file without hashing it on every start
+        stat = self.path.stat()
+        path_hash = hashlib.sha256(str(self.path).encode()).hexdigest()[:12]
+        return f"local-{path_hash}-{stat.st_size}-{stat.st_mtime_ns}"
+
+    def fetch(self):
+        return self.path.read_bytes(), self.path.name
+
+
+def default_source():
+    """
+    Returns a LocalSource when ECOM_DATA_PATH is set, otherwise the Google Drive source.
+    """
+    local_path = os.environ.get("ECOM_DATA_PATH")
+    if local_path:
+        return LocalSource(local_path)
+    return DriveSource()
+
+
+def fingerprint(raw):
+    """
+    Content fingerprint of a raw dataset payload.
+    """
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def frame_fingerprint(frame):
+    """
+    Content fingerprint of an in-memory DataFrame, for frames that did not come from load_dataset.
+    """
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(",".join(map(str, frame.columns)).encode())
+    return digest.hexdigest()[:16]
+
+
+def register_version(frame, version):
+    """
+    Records `version` as the dataset version of this frame object. Only register frames whose
+    content cannot change (e.g. read_only_frame output): the version is not re-checked.
+
+    Returns:
+    - DataFrame: `frame`.
+    """
+    key = id(frame)
+    # The entry goes away with the frame, so a later object reusing its id is not mistaken for it
+    _versions[key] = (weakref.ref(frame, lambda _, key=key: _versions.pop(key, None)), version)
+    return frame
+
+
+def registered_version(frame):
+    """
+    The version registered for this very frame object, or None.
+    """
+    entry = _versions.get(id(frame))
+    return entry[1] if entry is not None and entry[0]() is frame else None
+
+
+def dataset_version(frame):
+    """
+    Version of a dataset: the version registered for this very frame object (e.g. by
+    load_dataset), or a fingerprint of its content. Frames derived from a registered one
+    (filtered, sorted, modified) are not registered themselves and are fingerprinted.
+    """
+    return registered_version(frame) or frame_fingerprint(frame)
+
+
+def decode_payload(raw, name):
+    """
+    Decodes a raw payload into a DataFrame based on its content or file extension.
+
+    Parameters:
+    - raw (bytes): File content.
+    - name (str): File name, used to pick the decoder.
+
+    Returns:
+    - DataFrame: Decoded dataset.
+    """
+    buffer = io.BytesIO(raw)
+    if zipfile.is_zipfile(buffer):
+        with zipfile.ZipFile(buffer, "r") as z:
+            # Assumes the archive holds a single dataset file
+            member = z.namelist()[0]
+            return decode_payload(z.read(member), member)
+
+    suffix = Path(name).suffix.lower()
+    buffer.seek(0)
+    if suffix in (".pkl", ".pickle"):
+        return pickle.load(buffer)
+    if suffix == ".parquet":
+        return pd.read_parquet(buffer)
+    if suffix in (".arrow", ".feather"):
+        return pd.read_feather(buffer)
+    if suffix == ".csv":
+        return pd.read_csv(buffer)
+    raise ValueError(f"Unsupported dataset file '{name}'.")
+
+
+def _to_arrow(frame):
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Pickled frames can hold object columns with mixed types; store those as strings
+        frame = frame.copy()
+        for column in frame.columns[frame.dtypes == object]:
+            values = frame[column]
+            frame[column] = values.where(values.isna(), values.astype(str))
+        return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def write_cache_file(frame, path):
+    """
+    Writes a DataFrame as an uncompressed Arrow IPC file so it can be memory-mapped.
+    """
+    table = _to_arrow(frame)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_only_frame(frame):
+    """
+    The same columns, each backed by a read-only buffer, so in-place writes raise instead of
+    changing data other callers share. Buffers that are already read-only are kept as they are.
+    """
+    columns = {}
+    for name in frame.columns:
+        values = frame[name].array
+        if isinstance(values, pd.Categorical):
+            # .codes is a read-only view of the codes
+            columns[name] = pd.Categorical.from_codes(values.codes, dtype=values.dtype, validate=False)
+        elif isinstance(values, pd.arrays.NumpyExtensionArray) or (
+            isinstance(values, pd.arrays.DatetimeArray) and values.tz is None
+        ):
+            view = values.to_numpy().view()
+            view.flags.writeable = False
+            columns[name] = view
+        else:
+            columns[name] = values
+    frozen = pd.DataFrame(columns, index=frame.index, copy=False)
+    frozen.attrs.update(frame.attrs)
+    return frozen
+
+
+def read_cache_file(path, read_only=False):
+    """
+    Memory-maps a cached Arrow IPC file and returns it as a DataFrame.
+
+    With `read_only`, every column is its own block: Arrow hands columns without missing
+    values over as zero-copy views of the read-only memory map, and the rest are made
+    read-only by read_only_frame.
+    """
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    if read_only:
+        return read_only_frame(table.to_pandas(split_blocks=True))
+    return table.to_pandas()
+
+
+def _read_manifest(directory):
+    manifest_path = directory / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    try:
+        return json.loads(manifest_path.read_text())
+    except ValueError:
+        return {}
+
+
+def _write_manifest(directory, manifest):
+    manifest_path = directory / MANIFEST_NAME
+    tmp_path = manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, manifest_path)
+
+
+def load_dataset(source=None, directory=None, refresh=False, read_only=False):
+    """
+    Loads the dataset through the local columnar cache.
+
+    Parameters:
+    - source: Object with cache_key() and fetch() methods (default: default_source()).
+    - directory (Path): Cache directory (default: cache_dir()).
+    - refresh (bool): Fetch the source again even if a cached copy exists.
+    - read_only (bool): Return read-only columns, mostly zero-copy views of the cache file
+      (see read_cache_file), for a frame shared between callers.
+
+    Returns:
+    - DataFrame: The dataset. A read-only frame is registered with the payload's fingerprint as
+      its dataset_version; a writable one may be modified, so its version is computed from content.
+    """
+    source = source or default_source()
+    directory = Path(directory) if directory else cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    manifest = _read_manifest(directory)
+    key = source.cache_key()
+    entry = manifest.get(key)
+
+    if (
+        refresh
+        or entry is None
+        or entry.get("format") != CACHE_FORMAT_VERSION
+        or not (directory / entry["file"]).exists()
+    ):
+        raw, name = source.fetch()
+        version = fingerprint(raw)
+        file_name = f"events-v{CACHE_FORMAT_VERSION}-{version}.arrow"
+        entry = {
+            "file": file_name,
+            "fingerprint": version,
+            "format": CACHE_FORMAT_VERSION,
+            "created": datetime.now(timezone.utc).isoformat(),
+        }
+        if not (directory / file_name).exists():
+            frame = decode_payload(raw, name)
+            del raw
+            entry["memory_before"] = frame_memory(frame)
+            frame = optimize_frame(frame)
+            entry["memory_after"] = frame_memory(frame)
+            logger.info(memory_report(entry["memory_before"], entry["memory_after"]))
+            write_cache_file(frame, directory / file_name)
+            del frame
+        manifest = _read_manifest(directory)
+        manifest[key] = entry
+        _write_manifest(directory, manifest)
+
+    data = read_cache_file(directory / entry["file"], read_only)
+    if read_only:
+        register_version(data, entry["fingerprint"])
+    return data
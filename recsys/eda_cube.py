@@ -0,0 +1,250 @@
+"""
+Event-count cube behind the EDA page.
+
+The EDA page counted event types, hours and brands and histogrammed prices
+from the raw rows every time it was opened. Here one pass over the events
+reduces them to the counts of every observed combination of
+
+    event_type x hour x brand x price bucket x day
+
+(a sparse cube: only non-empty cells are stored). Any chart of the page is a
+slice and roll-up of those cells, e.g. the hourly trend of purchases of one
+brand, without touching the events again. Prices are bucketed by
+`PRICE_BUCKET_WIDTH`; a bucket is identified by its lower edge. Missing brands
+and prices are kept as their own cells. The distribution of `total_events`
+(activity of the user behind each event) is not a cube dimension, so the cube
+also keeps the event count per distinct `total_events` value.
+
+Cubes are written as Arrow IPC files next to the cached dataset, named after
+the dataset fingerprint, so every process loading the same data reuses them.
+
+Usage:
+    python -m recsys.eda_cube sampled_df.csv
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from recsys.data_store import cache_dir, dataset_version, read_cache_file, write_cache_file
+from recsys.schema import read_events_csv
+
+DIMENSIONS = ["event_type", "hour", "brand", "price_bucket", "day"]
+PRICE_BUCKET_WIDTH = 1.0
+# Bump when the cube layout changes so stale files are rebuilt
+CUBE_FORMAT_VERSION = 1
+
+
+def cube_paths(version, directory=None):
+    """
+    Cell and activity files of the cube of a dataset version.
+    """
+    directory = Path(directory) if directory else cache_dir()
+    return (
+        directory / f"eda-cube-v{CUBE_FORMAT_VERSION}-{version}.arrow",
+        directory / f"eda-activity-v{CUBE_FORMAT_VERSION}-{version}.arrow",
+    )
+
+
+def event_dimensions(events, price_bucket_width=PRICE_BUCKET_WIDTH):
+    """
+    The cube dimensions of every event. `event_hour` and `event_date` columns (e.g. from
+    recsys.features) are used when present.
+
+    Returns:
+    - DataFrame: One row per event with the DIMENSIONS columns.
+    """
+    event_time = events["event_time"]
+    hours = events["event_hour"] if "event_hour" in events.columns else event_time.dt.hour
+    prices = events["price"].to_numpy(dtype=np.float64)
+    if "event_date" in events.columns:
+        days = events["event_date"]
+    else:
+        days = event_time.dt.floor("D")
+        if days.dt.tz is not None:
+            days = days.dt.tz_localize(None)
+    return pd.DataFrame(
+        {
+            "event_type": events["event_type"].to_numpy(),
+            "hour": hours.to_numpy().astype(np.int8),
+            "brand": events["brand"].to_numpy(),
+            "price_bucket": np.floor(prices / price_bucket_width) * price_bucket_width,
+            "day": days.to_numpy(),
+        }
+    )
+
+
+def count_cells(dimensions):
+    """
+    Number of rows per distinct combination of the dimension columns, missing values included.
+
+    Returns:
+    - DataFrame: The distinct combinations plus a `count` column.
+    """
+    codes = np.zeros(len(dimensions), dtype=np.int64)
+    for column in dimensions.columns:
+        column_codes, levels = pd.factorize(dimensions[column], use_na_sentinel=False)
+        if codes.max(initial=0) >= 2**62 // max(len(levels), 1):
+            # Re-densify so the combined code never overflows
+            codes = pd.factorize(codes)[0]
+        codes = codes * max(len(levels), 1) + column_codes
+    _, first, counts = np.unique(codes, return_index=True, return_counts=True)
+    cells = dimensions.iloc[first].reset_index(drop=True)
+    cells["count"] = counts
+    return cells
+
+
+class EventCube:
+    """
+    Sparse event counts by event type, hour, brand, price bucket and day.
+
+    Parameters:
+    - cells (DataFrame): DIMENSIONS columns plus `count`, one row per non-empty cell.
+    - activity (Series): Number of events per distinct `total_events` value.
+    - price_bucket_width (float): Width of the price buckets.
+    """
+
+    def __init__(self, cells, activity, price_bucket_width=PRICE_BUCKET_WIDTH):
+        self.cells = cells
+        self.activity = activity
+        self.price_bucket_width = price_bucket_width
+
+    @classmethod
+    def from_events(cls, events, price_bucket_width=PRICE_BUCKET_WIDTH):
+        """
+        Builds the cube in one pass over an event log.
+        """
+        cells = count_cells(event_dimensions(events, price_bucket_width))
+        cells["brand"] = cells["brand"].astype("category")
+        cells["event_type"] = cells["event_type"].astype("category")
+        activity_values, activity_counts = np.unique(events["total_events"].to_numpy(), return_counts=True)
+        activity = pd.Series(activity_counts, index=pd.Index(activity_values, name="total_events"), name="count")
+        return cls(cells, activity, price_bucket_width)
+
+    @property
+    def n_events(self):
+        return int(self.cells["count"].sum())
+
+    @property
+    def nbytes(self):
+        return int(self.cells.memory_usage(deep=True).sum() + self.activity.memory_usage(deep=True))
+
+    def save(self, cells_path, activity_path):
+        cells = self.cells.copy()
+        cells["price_bucket_width"] = np.float64(self.price_bucket_width)
+        write_cache_file(cells, Path(cells_path))
+        write_cache_file(self.activity.reset_index(), Path(activity_path))
+
+    @classmethod
+    def load(cls, cells_path, activity_path):
+        cells = read_cache_file(Path(cells_path))
+        width = float(cells["price_bucket_width"].iloc[0]) if len(cells) else PRICE_BUCKET_WIDTH
+        activity = read_cache_file(Path(activity_path)).set_index("total_events")["count"]
+        return cls(cells.drop(columns="price_bucket_width"), activity, width)
+
+    def slice(self, **filters):
+        """
+        Sub-cube of the cells matching every filter.
+
+        Parameters:
+        - filters: Dimension name -> value or list of values, e.g.
+          `slice(brand="runail", event_type=["cart", "purchase"])`. None keeps every value.
+
+        Returns:
+        - EventCube: The matching cells (the activity counts are not sliced).
+        """
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions {sorted(unknown)}. Expected some of {DIMENSIONS}.")
+        keep = np.ones(len(self.cells), dtype=bool)
+        for dimension, values in filters.items():
+            if values is None:
+                continue
+            values = list(values) if isinstance(values, (list, tuple, set, np.ndarray, pd.Index)) else [values]
+            keep &= self.cells[dimension].isin(values).to_numpy()
+        return EventCube(self.cells[keep], self.activity, self.price_bucket_width)
+
+    def rollup(self, by, dropna=True):
+        """
+        Event counts summed over every dimension not in `by`.
+
+        Parameters:
+        - by (str or list): Dimension(s) kept.
+        - dropna (bool): Drop cells whose kept dimensions are missing (as groupby does).
+
+        Returns:
+        - Series: Counts indexed by the kept dimension(s), in sorted order.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions {sorted(unknown)}. Expected some of {DIMENSIONS}.")
+        counts = self.cells.groupby(by if len(by) > 1 else by[0], observed=True, dropna=dropna)["count"].sum()
+        return counts.astype(np.int64)
+
+    def price_histogram(self, bins=None):
+        """
+        Price histogram from the bucket counts.
+
+        Parameters:
+        - bins (int): Merge the buckets into at most this many equal-width bins, each a whole number
+          of buckets wide so the counts stay exact. None returns one bin per bucket, from the
+          lowest to the highest non-empty bucket.
+
+        Returns:
+        - tuple: (counts, edges)
+        """
+        buckets = self.rollup("price_bucket")
+        if len(buckets) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(1)
+        width = self.price_bucket_width
+        positions = np.rint((buckets.index.to_numpy() - buckets.index[0]) / width).astype(np.int64)
+        counts = np.bincount(positions, weights=buckets.to_numpy(), minlength=positions[-1] + 1).astype(np.int64)
+        edges = buckets.index[0] + width * np.arange(len(counts) + 1)
+        if bins is None:
+            return counts, edges
+        per_bin = -(-len(counts) // bins)
+        padded = np.zeros(-(-len(counts) // per_bin) * per_bin, dtype=np.int64)
+        padded[: len(counts)] = counts
+        return padded.reshape(-1, per_bin).sum(axis=1), edges[0] + width * per_bin * np.arange(len(padded) // per_bin + 1)
+
+
+def load_or_build_cube(events, directory=None, rebuild=False):
+    """
+    Returns the cube of a dataset, building and persisting it on a cache miss.
+
+    Parameters:
+    - events (DataFrame): Enhanced dataset.
+    - directory (Path): Directory of the cube files (default: the dataset cache directory).
+    - rebuild (bool): Build even if the cube files exist.
+
+    Returns:
+    - EventCube: The cube.
+    """
+    cells_path, activity_path = cube_paths(dataset_version(events), directory)
+    if rebuild or not (cells_path.exists() and activity_path.exists()):
+        cube = EventCube.from_events(events)
+        cube.save(cells_path, activity_path)
+        return cube
+    return EventCube.load(cells_path, activity_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the EDA event-count cube of an event log.")
+    parser.add_argument("input", help="Event log CSV.")
+    parser.add_argument("--directory", help="Output directory (default: the dataset cache directory).")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the cube exists.")
+    args = parser.parse_args()
+
+    start = time.time()
+    events = read_events_csv(args.input, usecols=["event_time", "event_type", "brand", "price", "total_events"])
+    cube = load_or_build_cube(events, args.directory, args.rebuild)
+    print(f"{cube.n_events:,} events in {len(cube.cells):,} cells ({cube.nbytes / 1e6:.1f} MB)")
+    print(cube.rollup("event_type").to_string())
+    print(f"Time taken: {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Derived per-event columns, kept apart from the event log.
+
+The dashboard shares one read-only event frame between all sessions, so pages
+must not add columns to it. Derived columns are computed here instead: each
+one with a single vectorized call, once per dataset version, and memoized as
+a read-only column. `with_features` returns a new frame holding the event
+columns (shared, not copied) plus the requested features.
+
+Usage:
+    from recsys.features import with_features
+    events = with_features(data, ["premiumness"])
+"""
+import pandas as pd
+
+from recsys.data_store import dataset_version, read_only_frame, register_version, registered_version
+from recsys.memo import LRUMemo
+from recsys.naive_bayes import premiumness
+
+
+def _event_date(events):
+    days = events["event_time"].dt.floor("D")
+    return days.dt.tz_localize(None) if days.dt.tz is not None else days
+
+
+# Feature name -> function of the events returning one value per event
+FEATURES = {
+    "premiumness": lambda events: premiumness(events["price"].to_numpy()),
+    "event_date": _event_date,
+}
+# Dataset versions whose features are kept at most
+MAX_CACHED_VERSIONS = 4
+
+_features = LRUMemo(MAX_CACHED_VERSIONS)
+
+
+def event_features(events, names):
+    """
+    Derived columns of an event log, computed on first request and memoized per dataset version
+    (the registered version of a loaded dataset, otherwise a fingerprint of the rows).
+
+    Parameters:
+    - events (DataFrame): Event log.
+    - names (list): Feature names (keys of FEATURES).
+
+    Returns:
+    - DataFrame: One read-only column per feature, aligned with `events`.
+    """
+    unknown = [name for name in names if name not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features {unknown}. Expected some of {list(FEATURES)}.")
+    # Feature name -> read-only column, filled as features are requested
+    cached = _features.get(dataset_version(events), dict)
+    for name in names:
+        if name not in cached:
+            values = pd.DataFrame({name: pd.array(FEATURES[name](events))})
+            cached[name] = read_only_frame(values)[name].array
+    return pd.DataFrame({name: cached[name] for name in names}, index=events.index, copy=False)
+
+
+def with_features(events, names):
+    """
+    Event columns plus the named features, as a new frame sharing the event columns' buffers.
+    When `events` has a registered version (see recsys.data_store.register_version), the new
+    frame is registered with it too: its rows are the same and its features derive from them.
+    """
+    features = event_features(events, names)
+    columns = {name: events[name].array for name in events.columns if name not in names}
+    columns.update({name: features[name].array for name in names})
+    frame = pd.DataFrame(columns, index=events.index, copy=False)
+    frame.attrs.update(events.attrs)
+    version = registered_version(events)
+    return register_version(frame, version) if version else frame
@@ -0,0 +1,341 @@
+"""
+Funnel metrics (view -> cart -> purchase / remove_from_cart) at any grouping level.
+
+`df.groupby([...keys, 'event_type']).size().unstack(fill_value=0)` materialises a
+multi-index row per key combination and per event type before the ratios are
+taken. Here the key columns are factorized into one dense integer code per
+row and the event types of every group are counted with a single bincount
+into a groups x event-types array. Only the distinct key combinations are kept
+as a frame.
+
+Input may arrive in chunks (e.g. the monthly raw CSVs): each chunk is reduced
+to its groups' counts, and the partial tables are merged whenever enough of
+them pile up, so memory is bounded by the number of groups rather than the
+number of rows.
+
+Ratios are numerator / denominator totals of each group. A group whose
+denominator is zero (e.g. a session with a purchase but no recorded cart) gets
+`zero_division` (NaN by default) instead of inf.
+
+Usage:
+    python -m recsys.funnel path/to/cosmetics/ --by brand --output brand_funnel.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from recsys.naive_bayes import PREMIUMNESS_QUANTILES, premiumness
+from recsys.sampling import DEFAULT_CHUNKSIZE, list_csv_files
+from recsys.schema import parse_event_time
+
+EVENT_TYPES = ["view", "cart", "purchase", "remove_from_cart"]
+# Ratio name -> (numerator event, denominator event)
+RATIOS = {
+    "view_to_cart": ("cart", "view"),
+    "cart_to_purchase": ("purchase", "cart"),
+    "cart_to_remove": ("remove_from_cart", "cart"),
+}
+# Short level names -> event-log columns
+LEVELS = {
+    "product": "product_id",
+    "brand": "brand",
+    "category": "category_id",
+    "premiumness": "premiumness",
+    "session": "user_session",
+    "user": "user_id",
+    "hour": "event_hour",
+}
+# Merge pending partial tables once they hold this many groups
+MERGE_THRESHOLD = 5_000_000
+
+
+def key_columns(by):
+    """
+    Event-log columns for a level name, a column name or a list of either.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    return [LEVELS.get(level, level) for level in by]
+
+
+def _column_codes(values):
+    # Categorical columns already carry dense codes; everything else is factorized
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64), len(values.cat.categories)
+    codes, levels = pd.factorize(values)
+    return codes.astype(np.int64), len(levels)
+
+
+def encode_keys(events, columns):
+    """
+    Dense group code per row for the combination of `columns`.
+
+    Rows with a missing key get code -1 and belong to no group, as with groupby.
+
+    Returns:
+    - tuple: (codes array, DataFrame of the distinct key combinations in code order)
+    """
+    codes = np.zeros(len(events), dtype=np.int64)
+    valid = np.ones(len(events), dtype=bool)
+    size = 1
+    for column in columns:
+        column_codes, n_levels = _column_codes(events[column])
+        valid &= column_codes >= 0
+        n_levels = max(n_levels, 1)
+        if size * n_levels >= 2**62:
+            # Re-densify so the combined code never overflows
+            codes, uniques = pd.factorize(codes)
+            size = len(uniques)
+        codes = codes * n_levels + column_codes
+        size *= n_levels
+    rows = np.flatnonzero(valid)
+    _, first, group_codes = np.unique(codes[rows], return_index=True, return_inverse=True)
+    codes = np.full(len(events), -1, dtype=np.int64)
+    codes[rows] = group_codes
+    keys = events[columns].iloc[rows[first]].reset_index(drop=True)
+    return codes, keys
+
+
+def count_events(events, by, event_types=None):
+    """
+    Event-type counts per group, from one bincount over the encoded keys.
+
+    Parameters:
+    - events (DataFrame): Event log with `event_type` and the key columns.
+    - by (str or list): Level(s) or column(s) to group by.
+    - event_types (list): Event types counted (default EVENT_TYPES); other types are ignored.
+
+    Returns:
+    - DataFrame: Key columns plus one count column per event type, one row per group.
+    """
+    columns = key_columns(by)
+    event_types = list(event_types or EVENT_TYPES)
+    missing = [column for column in columns + ["event_type"] if column not in events.columns]
+    if missing:
+        raise ValueError(f"Events are missing the columns {missing}.")
+
+    codes, keys = encode_keys(events, columns)
+    type_codes = pd.Categorical(events["event_type"], categories=event_types).codes
+    counted = (codes >= 0) & (type_codes >= 0)
+    n_types = len(event_types)
+    counts = np.bincount(
+        codes[counted] * n_types + type_codes[counted], minlength=len(keys) * n_types
+    ).reshape(len(keys), n_types)
+    return pd.concat([keys, pd.DataFrame(counts, columns=event_types)], axis=1)
+
+
+def _concat_keys(frames, columns):
+    # Categorical key columns of different chunks have different categories; union them
+    # instead of letting concat fall back to object dtype
+    merged = {}
+    for column in columns:
+        parts = [frame[column] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            merged[column] = union_categoricals([part.array for part in parts])
+        else:
+            merged[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(merged)
+
+
+def merge_counts(tables, event_types=None):
+    """
+    Sums partial count tables (outputs of count_events) over their common keys.
+    """
+    tables = [table for table in tables if len(table)] or tables[:1]
+    if len(tables) == 1:
+        return tables[0]
+    event_types = list(event_types or EVENT_TYPES)
+    columns = [column for column in tables[0].columns if column not in event_types]
+    keys = _concat_keys(tables, columns)
+    codes, unique_keys = encode_keys(keys, columns)
+    totals = {
+        name: np.bincount(
+            codes, weights=np.concatenate([table[name].to_numpy() for table in tables]), minlength=len(unique_keys)
+        ).astype(np.int64)
+        for name in event_types
+    }
+    return pd.concat([unique_keys, pd.DataFrame(totals)], axis=1)
+
+
+def add_ratios(counts, zero_division=np.nan):
+    """
+    Adds the RATIOS columns to a count table.
+
+    Parameters:
+    - counts (DataFrame): Output of count_events or FunnelAggregator.counts.
+    - zero_division (float): Value of a ratio whose denominator is zero.
+
+    Returns:
+    - DataFrame: Copy of `counts` with `view_to_cart`, `cart_to_purchase` and `cart_to_remove`.
+    """
+    funnel = counts.copy()
+    for name, (numerator, denominator) in RATIOS.items():
+        top = funnel[numerator].to_numpy(dtype=np.float64)
+        bottom = funnel[denominator].to_numpy(dtype=np.float64)
+        funnel[name] = np.divide(top, bottom, out=np.full(len(funnel), zero_division, dtype=np.float64), where=bottom > 0)
+    return funnel
+
+
+class FunnelAggregator:
+    """
+    Accumulates funnel counts per group over chunks of events.
+
+    Parameters:
+    - by (str or list): Level(s) (see LEVELS) or column(s) to group by.
+    - event_types (list): Event types counted (default EVENT_TYPES).
+    """
+
+    def __init__(self, by, event_types=None):
+        self.columns = key_columns(by)
+        self.event_types = list(event_types or EVENT_TYPES)
+        self.rows = 0
+        self._merged = None
+        self._pending = []
+        self._pending_groups = 0
+
+    def update(self, events):
+        """
+        Folds a chunk of events into the counts.
+        """
+        table = count_events(events, self.columns, self.event_types)
+        self.rows += len(events)
+        self._pending.append(table)
+        self._pending_groups += len(table)
+        merged_groups = len(self._merged) if self._merged is not None else 0
+        if self._pending_groups > max(MERGE_THRESHOLD, merged_groups):
+            self._merge()
+        return self
+
+    def _merge(self):
+        if self._pending:
+            parts = ([self._merged] if self._merged is not None else []) + self._pending
+            self._merged = merge_counts(parts, self.event_types)
+            self._pending, self._pending_groups = [], 0
+
+    def counts(self):
+        """
+        Count table of everything seen so far, indexed by the key columns.
+        """
+        self._merge()
+        if self._merged is None:
+            return pd.DataFrame(columns=self.columns + self.event_types).set_index(self.columns)
+        return self._merged.set_index(self.columns)
+
+    def result(self, zero_division=np.nan):
+        """
+        Counts plus funnel ratios, indexed by the key columns.
+        """
+        return add_ratios(self.counts(), zero_division)
+
+
+def funnel_table(events, by, zero_division=np.nan, event_types=None):
+    """
+    Funnel counts and ratios per group.
+
+    Parameters:
+    - events (DataFrame or iterable of DataFrames): Event log, whole or in chunks.
+    - by (str or list): Level(s) (see LEVELS) or column(s) to group by, e.g. 'brand' or
+      ['product', 'premiumness', 'session'].
+    - zero_division (float): Ratio value when its denominator is zero.
+    - event_types (list): Event types counted (default EVENT_TYPES).
+
+    Returns:
+    - DataFrame: Indexed by the key columns with one count column per event type and
+      `view_to_cart`, `cart_to_purchase`, `cart_to_remove`.
+    """
+    chunks = [events] if isinstance(events, pd.DataFrame) else events
+    aggregator = FunnelAggregator(by, event_types)
+    for chunk in chunks:
+        aggregator.update(chunk)
+    return aggregator.result(zero_division)
+
+
+# Derived column -> raw column it is computed from, for CSVs that lack it
+DERIVED_COLUMNS = {"event_hour": "event_time", "premiumness": "price"}
+
+
+def premiumness_edges(paths, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Log-price edges of the premiumness tiers over all event CSVs, from one pass over their prices.
+
+    The count of every distinct price is accumulated chunk by chunk, so the quantiles are the
+    ones premiumness would compute on the whole price column without holding it in memory.
+
+    Returns:
+    - tuple: (low, medium) log-price edges.
+    """
+    counts = None
+    for path in list_csv_files(paths):
+        for chunk in pd.read_csv(path, usecols=["price"], chunksize=chunksize):
+            chunk_counts = chunk["price"].value_counts()
+            counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    if counts is None:
+        counts = pd.Series(dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_price = np.log(counts.index.to_numpy(dtype=np.float64))
+    # Prices without a finite log (zero or negative) have no tier, as in premiumness
+    valid = np.isfinite(log_price)
+    if not valid.any():
+        raise ValueError("No positive prices to compute the premiumness tiers from.")
+    order = np.argsort(log_price[valid])
+    log_price, weights = log_price[valid][order], counts.to_numpy(dtype=np.int64)[valid][order]
+    # np.quantile interpolates linearly between the order statistics around (n - 1) * q
+    positions = np.asarray(PREMIUMNESS_QUANTILES) * (weights.sum() - 1)
+    cumulative = np.cumsum(weights)
+    below = log_price[np.searchsorted(cumulative, np.floor(positions), side="right")]
+    above = log_price[np.searchsorted(cumulative, np.ceil(positions), side="right")]
+    return tuple(below + (positions - np.floor(positions)) * (above - below))
+
+
+def read_chunks(paths, columns, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Streams only `columns` of the event CSVs, string keys read as categories.
+
+    Columns of DERIVED_COLUMNS missing from a file are computed per chunk: `event_hour`
+    from `event_time` and `premiumness` from `price`, with tier edges taken from a first
+    pass over the prices of all files (see premiumness_edges).
+    """
+    dtype = {column: "category" for column in columns if column in ("event_type", "brand", "user_session", "premiumness")}
+    files = list_csv_files(paths)
+    edges = None
+    for path in files:
+        header = set(pd.read_csv(path, nrows=0).columns)
+        derived = [column for column in columns if column not in header and column in DERIVED_COLUMNS]
+        missing = [column for column in columns if column not in header and column not in derived]
+        missing += [DERIVED_COLUMNS[column] for column in derived if DERIVED_COLUMNS[column] not in header]
+        if missing:
+            raise ValueError(f"{path} has no column(s) {missing} and they cannot be derived.")
+        if "premiumness" in derived and edges is None:
+            edges = premiumness_edges(files, chunksize)
+        usecols = sorted({column for column in columns if column in header} | {DERIVED_COLUMNS[c] for c in derived})
+        for chunk in pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize):
+            if "event_hour" in derived:
+                chunk["event_hour"] = parse_event_time(chunk["event_time"]).dt.hour.to_numpy(dtype=np.int8)
+            if "premiumness" in derived:
+                chunk["premiumness"] = premiumness(chunk["price"].to_numpy(), edges)
+            yield chunk[columns]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Funnel counts and ratios per group over event CSVs, read in chunks.")
+    parser.add_argument("inputs", nargs="+", help="Event CSV files or directories of CSVs.")
+    parser.add_argument("--by", nargs="+", default=["brand"], help=f"Levels ({', '.join(LEVELS)}) or columns.")
+    parser.add_argument("--output", default="funnel.csv")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--zero-division", type=float, default=np.nan, help="Ratio value when the denominator is zero.")
+    args = parser.parse_args()
+
+    start = time.time()
+    aggregator = FunnelAggregator(args.by)
+    for chunk in read_chunks(args.inputs, aggregator.columns + ["event_type"], args.chunksize):
+        aggregator.update(chunk)
+    funnel = aggregator.result(args.zero_division)
+    funnel.to_csv(args.output)
+    print(f"Aggregated {aggregator.rows:,} events into {len(funnel):,} groups; wrote {args.output}")
+    print(f"Time taken: {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
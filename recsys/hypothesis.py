@@ -0,0 +1,366 @@
+"""
+Hypothesis tests from per-group sufficient statistics.
+
+The analysis tests session-level purchase counts: for every (group, session)
+unit that has at least one event, the number of purchases in it. Instead of
+building a dense group x session x event-type table and filtering it once per
+test, the group and unit keys are factorized into one integer key, the
+per-unit counts are a bincount, and every group is reduced to its count, sum
+and sum of squares. Means, variances, t statistics, confidence intervals and
+p-values for all groups then follow in closed form, so testing every brand
+costs one pass over the events.
+
+Usage:
+    python -m recsys.hypothesis sampled_df.csv --group brand --test one_sample --correction bh
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from recsys.schema import read_events_csv
+
+TESTS = ["one_sample", "welch"]
+CORRECTIONS = ["bh", "holm", "none"]
+
+
+def _unit_codes(events, columns):
+    """
+    Dense code per distinct combination of `columns`; -1 where any of them is missing.
+    """
+    codes = np.zeros(len(events), dtype=np.int64)
+    valid = np.ones(len(events), dtype=bool)
+    for column in columns:
+        column_codes, levels = pd.factorize(events[column])
+        valid &= column_codes >= 0
+        # Re-densify after every column so the combined key never overflows
+        codes, _ = pd.factorize(codes * max(len(levels), 1) + column_codes)
+    return np.where(valid, codes, -1)
+
+
+def group_statistics(events, group, unit="user_session", event_type="purchase"):
+    """
+    Count, sum and sum of squares per group of the number of `event_type` events per unit.
+
+    A unit is a (group, unit columns) combination with at least one event of any
+    type, matching `groupby([group, unit, 'event_type']).size().unstack(fill_value=0)`.
+
+    Parameters:
+    - events (DataFrame): Event log.
+    - group (str): Column the tests compare (e.g. 'brand', 'premiumness').
+    - unit (str or list): Column(s) defining an observation within a group.
+    - event_type (str): Event type counted per unit.
+
+    Returns:
+    - DataFrame: Indexed by group label with `n`, `sum` and `sum_sq`.
+    """
+    units = [unit] if isinstance(unit, str) else list(unit)
+    group_codes, group_labels = pd.factorize(events[group], sort=True)
+    unit_codes = _unit_codes(events, units)
+    valid = (group_codes >= 0) & (unit_codes >= 0)
+    group_codes, unit_codes = group_codes[valid], unit_codes[valid]
+    n_units = int(unit_codes.max()) + 1 if len(unit_codes) else 1
+
+    # One integer key per (group, unit); the value of a unit is its number of matching events
+    keys = group_codes.astype(np.int64) * n_units + unit_codes
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    matches = events["event_type"].to_numpy()[valid] == event_type
+    values = np.bincount(inverse, weights=matches, minlength=len(unique_keys))
+    unit_groups = unique_keys // n_units
+
+    n_groups = len(group_labels)
+    return pd.DataFrame(
+        {
+            "n": np.bincount(unit_groups, minlength=n_groups),
+            "sum": np.bincount(unit_groups, weights=values, minlength=n_groups),
+            "sum_sq": np.bincount(unit_groups, weights=values**2, minlength=n_groups),
+        },
+        index=pd.Index(np.asarray(group_labels), name=group),
+    )
+
+
+def _moments(n, total, total_sq):
+    """
+    Mean and sample variance (ddof=1) from count, sum and sum of squares.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / n
+        variance = np.maximum(total_sq - n * mean**2, 0.0) / (n - 1)
+    return mean, variance
+
+
+def mean_interval(n, total, total_sq, confidence=0.95):
+    """
+    t-based confidence interval of the mean from count, sum and sum of squares, element-wise.
+
+    Returns:
+    - tuple: (lower, upper) arrays.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    mean, variance = _moments(n, total, total_sq)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = stats.t.ppf((1 + confidence) / 2, n - 1) * np.sqrt(variance / n)
+    return mean - margin, mean + margin
+
+
+def summarize_groups(statistics, confidence=0.95):
+    """
+    Mean, variance and confidence interval of the mean for every row of a group_statistics table.
+
+    Returns:
+    - DataFrame: `n`, `mean`, `variance`, `ci_low`, `ci_high`, same index as `statistics`.
+    """
+    n, total, total_sq = (statistics[column].to_numpy(dtype=np.float64) for column in ("n", "sum", "sum_sq"))
+    mean, variance = _moments(n, total, total_sq)
+    ci_low, ci_high = mean_interval(n, total, total_sq, confidence)
+    return pd.DataFrame(
+        {"n": n.astype(np.int64), "mean": mean, "variance": variance, "ci_low": ci_low, "ci_high": ci_high},
+        index=statistics.index,
+    )
+
+
+def t_test_power(effect_size, n1, n2=None, alpha=0.05):
+    """
+    Power of a two-sided t-test from the noncentral t distribution, element-wise.
+
+    Parameters:
+    - effect_size (float or array): Cohen's d.
+    - n1 (int or array): Sample size (of the first group).
+    - n2 (int or array): Size of the second group for a two-sample test; None for a one-sample test.
+    - alpha (float): Significance level.
+
+    Returns:
+    - ndarray: Probability of rejecting the null hypothesis when the true effect is `effect_size`.
+    """
+    effect_size = np.asarray(effect_size, dtype=np.float64)
+    n1 = np.asarray(n1, dtype=np.float64)
+    if n2 is None:
+        df = n1 - 1
+        noncentrality = effect_size * np.sqrt(n1)
+    else:
+        n2 = np.asarray(n2, dtype=np.float64)
+        df = n1 + n2 - 2
+        noncentrality = effect_size * np.sqrt(n1 * n2 / (n1 + n2))
+    critical = stats.t.isf(alpha / 2, df)
+    return stats.nct.sf(critical, df, noncentrality) + stats.nct.cdf(-critical, df, noncentrality)
+
+
+def one_sample_tests(statistics, confidence=0.95):
+    """
+    One-sample t-test of every group's mean against the mean of all other groups' units.
+
+    Parameters:
+    - statistics (DataFrame): Output of group_statistics.
+    - confidence (float): Level of the confidence interval for each group mean.
+
+    Returns:
+    - DataFrame: `n`, `mean`, `rest_n`, `rest_mean`, `t_stat`, `df`, `p_value`, `ci_low`, `ci_high`
+      and `cohens_d` (difference in means over the group's standard deviation).
+    """
+    n, total, total_sq = (statistics[column].to_numpy(dtype=np.float64) for column in ("n", "sum", "sum_sq"))
+    mean, variance = _moments(n, total, total_sq)
+    rest_n = n.sum() - n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rest_mean = (total.sum() - total) / rest_n
+        t_stat = (mean - rest_mean) / np.sqrt(variance / n)
+        cohens_d = (mean - rest_mean) / np.sqrt(variance)
+    df = n - 1
+    p_value = 2 * stats.t.sf(np.abs(t_stat), df)
+    ci_low, ci_high = mean_interval(n, total, total_sq, confidence)
+    return pd.DataFrame(
+        {
+            "n": n.astype(np.int64),
+            "mean": mean,
+            "rest_n": rest_n.astype(np.int64),
+            "rest_mean": rest_mean,
+            "t_stat": t_stat,
+            "df": df,
+            "p_value": p_value,
+            "ci_low": ci_low,
+            "ci_high": ci_high,
+            "cohens_d": cohens_d,
+        },
+        index=statistics.index,
+    )
+
+
+def two_sample_test(n1, sum1, sum_sq1, n2, sum2, sum_sq2, equal_var=False, confidence=0.95):
+    """
+    Two-sample t-test (Welch by default, pooled Student when `equal_var`) from sufficient
+    statistics. Arguments may be arrays to test many pairs at once.
+
+    Returns:
+    - dict: `mean1`, `mean2`, `t_stat`, `df`, `p_value`, `ci_low`, `ci_high` (interval of mean1 - mean2)
+      and `cohens_d` (difference over the pooled standard deviation).
+    """
+    n1, n2 = np.asarray(n1, dtype=np.float64), np.asarray(n2, dtype=np.float64)
+    mean1, var1 = _moments(n1, sum1, sum_sq1)
+    mean2, var2 = _moments(n2, sum2, sum_sq2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pooled_var = ((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2)
+        if equal_var:
+            se = np.sqrt(pooled_var * (1 / n1 + 1 / n2))
+            df = n1 + n2 - 2
+        else:
+            a, b = var1 / n1, var2 / n2
+            se = np.sqrt(a + b)
+            # Welch-Satterthwaite degrees of freedom
+            df = (a + b) ** 2 / (a**2 / (n1 - 1) + b**2 / (n2 - 1))
+        t_stat = (mean1 - mean2) / se
+        cohens_d = (mean1 - mean2) / np.sqrt(pooled_var)
+    margin = stats.t.ppf((1 + confidence) / 2, df) * se
+    return {
+        "mean1": mean1,
+        "mean2": mean2,
+        "t_stat": t_stat,
+        "df": df,
+        "p_value": 2 * stats.t.sf(np.abs(t_stat), df),
+        "ci_low": mean1 - mean2 - margin,
+        "ci_high": mean1 - mean2 + margin,
+        "cohens_d": cohens_d,
+    }
+
+
+def welch_tests(statistics, confidence=0.95):
+    """
+    Welch two-sample t-test of every group against all other groups' units combined.
+
+    Returns:
+    - DataFrame: `n`, `mean`, `rest_n`, `rest_mean`, `t_stat`, `df`, `p_value`, `ci_low`, `ci_high`
+      (interval of the difference in means) and `cohens_d`.
+    """
+    n, total, total_sq = (statistics[column].to_numpy(dtype=np.float64) for column in ("n", "sum", "sum_sq"))
+    result = two_sample_test(
+        n, total, total_sq, n.sum() - n, total.sum() - total, total_sq.sum() - total_sq, confidence=confidence
+    )
+    return pd.DataFrame(
+        {
+            "n": n.astype(np.int64),
+            "mean": result["mean1"],
+            "rest_n": (n.sum() - n).astype(np.int64),
+            "rest_mean": result["mean2"],
+            "t_stat": result["t_stat"],
+            "df": result["df"],
+            "p_value": result["p_value"],
+            "ci_low": result["ci_low"],
+            "ci_high": result["ci_high"],
+            "cohens_d": result["cohens_d"],
+        },
+        index=statistics.index,
+    )
+
+
+def adjust_pvalues(p_values, method="bh"):
+    """
+    Multiple-testing adjusted p-values; NaN p-values are left out of the family and stay NaN.
+
+    Parameters:
+    - p_values (array): Raw p-values.
+    - method (str): 'bh' (Benjamini-Hochberg false discovery rate), 'holm' (family-wise error) or 'none'.
+
+    Returns:
+    - ndarray: Adjusted p-values in the input order.
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    if method == "none":
+        return p_values.copy()
+    if method not in CORRECTIONS:
+        raise ValueError(f"Unknown correction '{method}'. Expected one of {CORRECTIONS}.")
+
+    adjusted = np.full(len(p_values), np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+    order = valid[np.argsort(p_values[valid], kind="stable")]
+    ranked = p_values[order]
+    if method == "bh":
+        # p_(i) * m / i, made monotone from the largest p-value down
+        scaled = ranked * m / np.arange(1, m + 1)
+        scaled = np.minimum.accumulate(scaled[::-1])[::-1]
+    else:
+        # p_(i) * (m - i + 1), made monotone from the smallest p-value up
+        scaled = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    adjusted[order] = np.minimum(scaled, 1.0)
+    return adjusted
+
+
+def mask_untestable(results, min_units=2):
+    """
+    Blanks the t statistic and p-value of groups a t-test cannot judge: fewer than `min_units`
+    units, or units that all have the same value (zero variance, infinite t). Their NaN
+    p-values keep them out of adjust_pvalues' family.
+
+    Returns:
+    - DataFrame: A copy of `results` (output of one_sample_tests or welch_tests).
+    """
+    results = results.copy()
+    untestable = (results["n"] < min_units) | ~np.isfinite(results["t_stat"])
+    results.loc[untestable, ["t_stat", "p_value"]] = np.nan
+    return results
+
+
+def test_groups(
+    events,
+    group="brand",
+    unit="user_session",
+    event_type="purchase",
+    test="one_sample",
+    correction="bh",
+    confidence=0.95,
+    alpha=0.05,
+    min_units=2,
+):
+    """
+    Tests every group of `group` against the rest of the population in one pass.
+
+    Parameters:
+    - events (DataFrame): Event log.
+    - group (str): Grouping column.
+    - unit (str or list): Observation unit within a group.
+    - event_type (str): Event type counted per unit.
+    - test (str): 'one_sample' (group mean vs the rest's mean) or 'welch'.
+    - correction (str): Multiple-testing correction, see adjust_pvalues.
+    - confidence (float): Confidence level of the intervals.
+    - alpha (float): Significance level for the `reject` column.
+    - min_units (int): Groups with fewer units are reported but not tested. Groups whose
+      units all have the same value (zero variance, infinite t) are not tested either.
+
+    Returns:
+    - DataFrame: One row per group with the test results, `p_adjusted` and `reject`,
+      sorted by adjusted p-value.
+    """
+    if test not in TESTS:
+        raise ValueError(f"Unknown test '{test}'. Expected one of {TESTS}.")
+    statistics = group_statistics(events, group, unit, event_type)
+    results = one_sample_tests(statistics, confidence) if test == "one_sample" else welch_tests(statistics, confidence)
+    results = mask_untestable(results, min_units)
+    results["p_adjusted"] = adjust_pvalues(results["p_value"].to_numpy(), correction)
+    results["reject"] = results["p_adjusted"] < alpha
+    return results.sort_values("p_adjusted", kind="stable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test every group against the population from sufficient statistics.")
+    parser.add_argument("input", help="Event log CSV.")
+    parser.add_argument("--group", default="brand", help="Grouping column.")
+    parser.add_argument("--unit", nargs="+", default=["user_session"], help="Observation unit column(s).")
+    parser.add_argument("--event-type", default="purchase", help="Event type counted per unit.")
+    parser.add_argument("--test", choices=TESTS, default="one_sample")
+    parser.add_argument("--correction", choices=CORRECTIONS, default="bh")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--output", help="Write the results table to this CSV file.")
+    args = parser.parse_args()
+
+    columns = sorted({args.group, "event_type", *args.unit})
+    events = read_events_csv(args.input, usecols=columns)
+    results = test_groups(events, args.group, args.unit, args.event_type, args.test, args.correction, alpha=args.alpha)
+    if args.output:
+        results.to_csv(args.output)
+    print(results.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Precomputed id <-> index maps for the recommenders.
+
+Built once from the prepared interactions, the index replaces re-factorizing
+`user_id`/`product_id` and scanning `unique_products` on every request: user and
+item lookups are dictionary hits and brands are read from a code-indexed array.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class InteractionIndex:
+    """
+    Dense codes for users and items of the interaction matrix.
+
+    Attributes:
+    - user_ids (ndarray): Code -> user id (sorted, so codes match `astype('category')`).
+    - item_ids (ndarray): Code -> product id (sorted).
+    - item_brand_codes (ndarray): Item code -> position in `brand_names` (-1 if unknown).
+    - brand_names (list): Brand names.
+    - user_codes, item_codes (ndarray): Per-event codes, only kept right after building.
+    """
+
+    def __init__(self, user_ids, item_ids, item_brand_codes, brand_names, user_codes=None, item_codes=None):
+        self.user_ids = np.asarray(user_ids)
+        self.item_ids = np.asarray(item_ids)
+        self.item_brand_codes = np.asarray(item_brand_codes)
+        self.brand_names = list(brand_names)
+        self.user_codes = user_codes
+        self.item_codes = item_codes
+        self.user_lookup = dict(zip(self.user_ids.tolist(), range(len(self.user_ids))))
+        self.item_lookup = dict(zip(self.item_ids.tolist(), range(len(self.item_ids))))
+
+    @classmethod
+    def from_interactions(cls, interactions):
+        """
+        Builds the index from a DataFrame with `user_id`, `product_id` and `brand` columns.
+        """
+        user_codes, user_ids = pd.factorize(interactions["user_id"], sort=True)
+        item_codes, item_ids = pd.factorize(interactions["product_id"], sort=True)
+        brand_codes, brand_names = pd.factorize(interactions["brand"].astype(object))
+
+        # Brand of the first event seen for each item
+        first_event = np.full(len(item_ids), len(item_codes), dtype=np.int64)
+        np.minimum.at(first_event, item_codes, np.arange(len(item_codes)))
+        item_brand_codes = brand_codes[first_event].astype(np.int32)
+
+        return cls(
+            np.asarray(user_ids),
+            np.asarray(item_ids),
+            item_brand_codes,
+            [str(name) for name in brand_names],
+            user_codes.astype(np.int32),
+            item_codes.astype(np.int32),
+        )
+
+    @property
+    def n_users(self):
+        return len(self.user_ids)
+
+    @property
+    def n_items(self):
+        return len(self.item_ids)
+
+    def user_code(self, user_id):
+        """
+        Code of a user id, or -1 if the user is not in the index.
+        """
+        return self.user_lookup.get(user_id, -1)
+
+    def item_code(self, product_id):
+        """
+        Code of a product id, or -1 if the product is not in the index.
+        """
+        return self.item_lookup.get(product_id, -1)
+
+    def user_codes_for(self, user_ids):
+        """
+        Vectorized user id -> code lookup; unknown ids map to -1.
+        """
+        return _codes_for(self.user_ids, user_ids)
+
+    def item_codes_for(self, product_ids):
+        """
+        Vectorized product id -> code lookup; unknown ids map to -1.
+        """
+        return _codes_for(self.item_ids, product_ids)
+
+    def brands(self, item_codes):
+        """
+        Brand names for an array of item codes (None where unknown).
+        """
+        names = np.array(self.brand_names + [None], dtype=object)
+        return names[self.item_brand_codes[np.asarray(item_codes, dtype=np.int64)]]
+
+    def items_frame(self, item_codes):
+        """
+        DataFrame with `product_id` and `brand` for an array of item codes.
+        """
+        item_codes = np.asarray(item_codes, dtype=np.int64)
+        return pd.DataFrame({"product_id": self.item_ids[item_codes], "brand": self.brands(item_codes)})
+
+    def save(self, directory):
+        directory = Path(directory)
+        np.save(directory / "index_user_ids.npy", self.user_ids)
+        np.save(directory / "index_item_ids.npy", self.item_ids)
+        np.save(directory / "index_item_brand_codes.npy", self.item_brand_codes)
+        (directory / "index_brand_names.json").write_text(json.dumps(self.brand_names))
+
+    @classmethod
+    def load(cls, directory):
+        directory = Path(directory)
+        return cls(
+            np.load(directory / "index_user_ids.npy"),
+            np.load(directory / "index_item_ids.npy"),
+            np.load(directory / "index_item_brand_codes.npy"),
+            json.loads((directory / "index_brand_names.json").read_text()),
+        )
+
+
+def _codes_for(sorted_ids, ids):
+    ids = np.asarray(ids)
+    if len(sorted_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, positions, -1)
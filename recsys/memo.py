@@ -0,0 +1,59 @@
+"""
+Bounded in-memory memo shared by the modules that keep derived results per process.
+
+Price summaries, feature columns and rendered figures are computed once per key
+(dataset version plus parameters) and reused by every later call, including
+calls from other Streamlit sessions running on other threads. LRUMemo keeps the
+most recently used entries up to a fixed count, so memory stays bounded when
+datasets or parameters change over the life of a server.
+
+Usage:
+    from recsys.memo import LRUMemo
+    _summaries = LRUMemo(8)
+    summary = _summaries.get(key, lambda: compute_summary(events))
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUMemo:
+    """
+    Keeps the values of the `max_entries` most recently used keys.
+
+    Parameters:
+    - max_entries (int): Entries kept at most; the least recently used one is dropped first.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        The memoized value of `key`, computed with `compute()` on a miss.
+
+        The value is computed outside the lock, so two threads missing the same key at once
+        may both compute it; the last one stored is kept.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
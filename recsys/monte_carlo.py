@@ -0,0 +1,234 @@
+"""
+Monte Carlo revenue simulation for the Price Analysis page.
+
+One run is a day of `n_users` visitors who each buy with probability
+`conversion_rate` at a price drawn from a price model; its revenue is the sum
+of the purchasers' prices. Drawing a price and a conversion flag for every
+visitor wastes almost all draws on visitors who never buy, so a run instead
+draws its number of purchasers from Binomial(n_users, conversion_rate) and
+then only that many prices. For the normal model the sum of K prices is itself
+normal, so it is drawn directly.
+
+Runs are simulated in vectorized chunks of bounded size. Every chunk has its
+own stream spawned from one `SeedSequence`, so results depend only on the
+seed and parameters, not on how many worker processes share the chunks.
+
+Usage:
+    python -m recsys.monte_carlo sampled_df.csv --model lognormal --simulations 10000 --jobs 4
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from recsys.schema import read_events_csv
+
+MODELS = ["normal", "lognormal", "empirical"]
+QUANTILES = [0.025, 0.05, 0.25, 0.5, 0.75, 0.95, 0.975]
+# Upper bound on the prices drawn per chunk of runs
+CHUNK_DRAWS = 2**22
+
+# Price model of a pool worker process, set by _init_worker
+_worker_state = {}
+
+
+def _observed(prices):
+    prices = np.asarray(prices, dtype=np.float64)
+    return prices[~np.isnan(prices)]
+
+
+class NormalPrices:
+    """
+    Normally distributed prices (the page's original model; it can draw negative prices).
+    """
+
+    def __init__(self, mean, std):
+        self.mean = float(mean)
+        self.std = float(std)
+
+    @classmethod
+    def from_prices(cls, prices):
+        prices = _observed(prices)
+        return cls(prices.mean(), prices.std(ddof=1))
+
+    def sample(self, rng, size):
+        return rng.normal(self.mean, self.std, size)
+
+    def sample_sums(self, rng, counts):
+        # A sum of K independent normal prices is N(K * mean, K * std^2)
+        counts = np.asarray(counts, dtype=np.float64)
+        return rng.normal(counts * self.mean, np.sqrt(counts) * self.std)
+
+
+class LogNormalPrices:
+    """
+    Log-normal prices with the closed-form maximum-likelihood fit (mean and std of log price).
+    """
+
+    def __init__(self, mu, sigma):
+        self.mu = float(mu)
+        self.sigma = float(sigma)
+
+    @classmethod
+    def from_prices(cls, prices):
+        prices = _observed(prices)
+        log_prices = np.log(prices[prices > 0])
+        return cls(log_prices.mean(), log_prices.std())
+
+    def sample(self, rng, size):
+        return rng.lognormal(self.mu, self.sigma, size)
+
+
+class EmpiricalPrices:
+    """
+    Bootstrap of observed prices: every draw picks one observed price uniformly at random.
+    """
+
+    def __init__(self, prices):
+        self.prices = _observed(prices)
+
+    @classmethod
+    def from_prices(cls, prices):
+        return cls(prices)
+
+    def sample(self, rng, size):
+        return self.prices[rng.integers(0, len(self.prices), size)]
+
+
+PRICE_MODELS = {"normal": NormalPrices, "lognormal": LogNormalPrices, "empirical": EmpiricalPrices}
+
+
+def price_model(name, prices):
+    """
+    Price model fitted to observed prices.
+
+    Parameters:
+    - name (str): 'normal', 'lognormal' or 'empirical'.
+    - prices (array): Observed prices.
+
+    Returns:
+    - object: Model with `sample(rng, size)` (and optionally `sample_sums(rng, counts)`).
+    """
+    if name not in PRICE_MODELS:
+        raise ValueError(f"Unknown price model '{name}'. Expected one of {MODELS}.")
+    return PRICE_MODELS[name].from_prices(prices)
+
+
+def sample_sums(model, rng, counts):
+    """
+    Sum of `counts[i]` independent prices for every i, drawing all prices in one call.
+    """
+    if hasattr(model, "sample_sums"):
+        return model.sample_sums(rng, counts)
+    counts = np.asarray(counts, dtype=np.int64)
+    prices = model.sample(rng, int(counts.sum()))
+    # Prices are laid out run after run; runs without purchasers sum to zero
+    sums = np.zeros(len(counts))
+    bought = counts > 0
+    if bought.any():
+        sums[bought] = np.add.reduceat(prices, (np.cumsum(counts) - counts)[bought])
+    return sums
+
+
+def _init_worker(model):
+    _worker_state["model"] = model
+
+
+def _simulate_chunk(task, model):
+    n_runs, n_users, conversion_rate, seed_sequence = task
+    rng = np.random.default_rng(seed_sequence)
+    purchasers = rng.binomial(n_users, conversion_rate, n_runs)
+    return sample_sums(model, rng, purchasers)
+
+
+def _pool_chunk(task):
+    # Pool workers receive the model once, through _init_worker
+    return _simulate_chunk(task, _worker_state["model"])
+
+
+def chunk_runs(model, n_simulations, n_users, conversion_rate):
+    """
+    Runs per chunk so that a chunk draws about CHUNK_DRAWS prices (models drawing
+    sums directly need one draw per run).
+    """
+    expected_draws = 1.0 if hasattr(model, "sample_sums") else max(n_users * conversion_rate, 1.0)
+    return int(min(n_simulations, max(1, CHUNK_DRAWS // expected_draws)))
+
+
+def simulate_revenue(model, n_users=100000, conversion_rate=0.1, n_simulations=10000, seed=0, n_jobs=1):
+    """
+    Revenue of `n_simulations` independent runs.
+
+    Parameters:
+    - model: Price model (see price_model).
+    - n_users (int): Visitors per run.
+    - conversion_rate (float): Probability that a visitor buys.
+    - n_simulations (int): Number of runs.
+    - seed (int): Seed of the root SeedSequence.
+    - n_jobs (int): Worker processes (1 simulates in the current process).
+
+    Returns:
+    - ndarray: Revenue per run, in run order.
+    """
+    if not 0 <= conversion_rate <= 1:
+        raise ValueError("conversion_rate must be between 0 and 1.")
+    size = chunk_runs(model, n_simulations, n_users, conversion_rate)
+    starts = range(0, n_simulations, size)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    tasks = [(min(size, n_simulations - start), n_users, conversion_rate, child) for start, child in zip(starts, seeds)]
+
+    if n_jobs > 1 and len(tasks) > 1:
+        # Spawned, not forked: callers such as the Streamlit server are multithreaded
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(n_jobs, context, initializer=_init_worker, initargs=(model,)) as executor:
+            results = list(executor.map(_pool_chunk, tasks))
+    else:
+        results = [_simulate_chunk(task, model) for task in tasks]
+    return np.concatenate(results) if results else np.empty(0)
+
+
+def summarize(revenues, quantiles=None):
+    """
+    Summary of simulated revenues.
+
+    Returns:
+    - dict: `mean`, `std`, `quantiles` ({q: value}) and `interval_95` (2.5% and 97.5% quantiles).
+    """
+    quantiles = QUANTILES if quantiles is None else list(quantiles)
+    revenues = np.asarray(revenues, dtype=np.float64)
+    values = np.quantile(revenues, quantiles)
+    low, high = np.quantile(revenues, [0.025, 0.975])
+    return {
+        "mean": float(revenues.mean()),
+        "std": float(revenues.std()),
+        "quantiles": {float(q): float(value) for q, value in zip(quantiles, values)},
+        "interval_95": (float(low), float(high)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo revenue simulation from observed prices.")
+    parser.add_argument("input", help="Event log CSV (its `price` column is used).")
+    parser.add_argument("--model", choices=MODELS, default="normal")
+    parser.add_argument("--users", type=int, default=100000, help="Visitors per run.")
+    parser.add_argument("--conversion-rate", type=float, default=0.1)
+    parser.add_argument("--simulations", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes.")
+    args = parser.parse_args()
+
+    start = time.time()
+    prices = read_events_csv(args.input, usecols=["price"])["price"].to_numpy(dtype=np.float64)
+    model = price_model(args.model, prices)
+    revenues = simulate_revenue(model, args.users, args.conversion_rate, args.simulations, args.seed, args.jobs)
+    summary = summarize(revenues)
+    print(f"Expected Revenue: ${summary['mean']:,.2f}")
+    print(f"Revenue Std Dev: ${summary['std']:,.2f}")
+    print(f"95% Interval: ${summary['interval_95'][0]:,.2f} - ${summary['interval_95'][1]:,.2f}")
+    print(f"Time taken: {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
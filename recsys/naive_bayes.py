@@ -0,0 +1,241 @@
+"""
+Naive-Bayes purchase posterior over product and user features.
+
+Implements the formula on the "Recommendations - Bayesian approach" page:
+
+    P(purchase | product, user) ∝ P(purchase) · Π_f P(f(product) | purchase) · P(f(user) | purchase)
+
+for the features f = brand, category and premiumness. Product-side likelihoods
+P(value | class) are global tables with one entry per feature level. User-side
+likelihoods are the user's own share of events on the product's level, smoothed
+towards the global table, and come from sparse users x levels count matrices.
+The evidence P(product) · P(user) is the same product summed over both classes
+(purchase and no purchase), so posteriors are proper probabilities.
+
+All tables are built in one pass of factorize + bincount over the events and
+stored as arrays indexed by level code. Scoring a block of users against a
+block of products is a handful of gathers and additions in log space.
+"""
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.special import expit
+
+FEATURES = ["brand", "category_id", "premiumness"]
+FEATURE_LABELS = {"brand": "Brand", "category_id": "Category", "premiumness": "Premiumness"}
+PREMIUMNESS_LEVELS = ["Low", "Medium", "High"]
+# Quantiles of log price splitting the premiumness tiers
+PREMIUMNESS_QUANTILES = [0.333, 0.66]
+# Target number of cells (users x products) scored per block
+BLOCK_CELLS = 2**22
+
+
+def premiumness(price, edges=None):
+    """
+    Low/Medium/High price tiers split at the 33.3% and 66% quantiles of log price,
+    as in the hypothesis-testing analysis.
+
+    Parameters:
+    - price (array): Prices.
+    - edges (tuple): (low, medium) log-price edges to use instead of the quantiles of `price`,
+      e.g. quantiles of the whole dataset when `price` is one chunk of it.
+
+    Returns:
+    - Categorical: Tier per price; missing, zero and negative prices (no finite log) are missing.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_price = np.log(np.asarray(price, dtype=np.float64))
+    finite = np.isfinite(log_price)
+    if edges is None:
+        edges = np.quantile(log_price[finite], PREMIUMNESS_QUANTILES) if finite.any() else (np.nan, np.nan)
+    low, medium = edges
+    tier = np.where(log_price <= low, 0, np.where(log_price <= medium, 1, 2))
+    return pd.Categorical.from_codes(np.where(finite, tier, -1), PREMIUMNESS_LEVELS)
+
+
+def _feature_codes(values):
+    """
+    Level codes and level names of a feature column; missing values form their own level.
+    """
+    codes, levels = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    names = ["unknown" if pd.isna(level) else str(level) for level in levels]
+    return codes, names
+
+
+class NaiveBayesModel:
+    """
+    Likelihood tables for the naive-Bayes purchase posterior.
+
+    Parameters:
+    - events (DataFrame): Events with `user_id`, `product_id`, `event_type`, `brand`,
+      `category_id` and `price` (or a `premiumness` column).
+    - smoothing (float): Additive (Laplace) smoothing of the global likelihood tables.
+    - user_strength (float): Pseudo-events pulling a user's likelihoods towards the global table.
+
+    Attributes:
+    - user_ids, product_ids (ndarray): Code -> id, sorted.
+    - product_levels (dict): Feature -> level code per product (from its first event).
+    - levels (dict): Feature -> level names.
+    - log_prior (ndarray): log P(class) for (purchase, no purchase).
+    - global_likelihood (dict): Feature -> (2, n_levels) array of P(level | class).
+    - user_counts (dict): Feature -> [purchase, no purchase] users x levels CSR event counts.
+    - user_totals (ndarray): (2, n_users) events per user and class.
+    """
+
+    def __init__(self, events, smoothing=1.0, user_strength=5.0):
+        self.smoothing = smoothing
+        self.user_strength = user_strength
+
+        purchase = (events["event_type"].to_numpy() == "purchase").astype(np.int64)
+        # Class 0 is purchase, class 1 everything else
+        event_class = 1 - purchase
+        user_codes, self.user_ids = pd.factorize(events["user_id"].to_numpy(), sort=True)
+        product_codes, self.product_ids = pd.factorize(events["product_id"].to_numpy(), sort=True)
+        self.user_ids = np.asarray(self.user_ids)
+        self.product_ids = np.asarray(self.product_ids)
+        self.user_lookup = dict(zip(self.user_ids.tolist(), range(len(self.user_ids))))
+        self.product_lookup = dict(zip(self.product_ids.tolist(), range(len(self.product_ids))))
+
+        class_totals = np.bincount(event_class, minlength=2).astype(np.float64)
+        self.log_prior = np.log((class_totals + smoothing) / (class_totals.sum() + 2 * smoothing))
+        self.user_totals = np.stack(
+            [np.bincount(user_codes[event_class == label], minlength=self.n_users) for label in (0, 1)]
+        ).astype(np.float64)
+
+        first_event = np.full(self.n_products, len(product_codes), dtype=np.int64)
+        np.minimum.at(first_event, product_codes, np.arange(len(product_codes)))
+
+        self.levels = {}
+        self.product_levels = {}
+        self.global_likelihood = {}
+        self.user_counts = {}
+        for feature in FEATURES:
+            if feature == "premiumness" and "premiumness" not in events.columns:
+                values = premiumness(events["price"])
+            else:
+                values = events[feature]
+            codes, names = _feature_codes(values)
+            n_levels = len(names)
+            self.levels[feature] = names
+            self.product_levels[feature] = codes[first_event]
+
+            counts = np.bincount(event_class * n_levels + codes, minlength=2 * n_levels).reshape(2, n_levels)
+            self.global_likelihood[feature] = (counts + smoothing) / (class_totals[:, None] + smoothing * n_levels)
+            self.user_counts[feature] = [
+                coo_matrix(
+                    (np.ones(int((event_class == label).sum())), (user_codes[event_class == label], codes[event_class == label])),
+                    shape=(self.n_users, n_levels),
+                ).tocsr()
+                for label in (0, 1)
+            ]
+
+        # Product-side log-likelihood ratio per product, summed over the features
+        self.product_log_ratio = np.zeros(self.n_products)
+        for feature in FEATURES:
+            likelihood = self.global_likelihood[feature][:, self.product_levels[feature]]
+            self.product_log_ratio += np.log(likelihood[0]) - np.log(likelihood[1])
+
+    @property
+    def n_users(self):
+        return len(self.user_ids)
+
+    @property
+    def n_products(self):
+        return len(self.product_ids)
+
+    def user_code(self, user_id):
+        return self.user_lookup.get(user_id, -1)
+
+    def product_code(self, product_id):
+        return self.product_lookup.get(product_id, -1)
+
+    def user_likelihood(self, feature, user_codes, product_codes, label=0):
+        """
+        Smoothed P(level of each product | class) for each user, as a users x products array.
+        """
+        levels = self.product_levels[feature][product_codes]
+        prior = self.global_likelihood[feature][label, levels]
+        counts = self.user_counts[feature][label][user_codes].toarray()[:, levels]
+        totals = self.user_totals[label, user_codes][:, None]
+        return (counts + self.user_strength * prior) / (totals + self.user_strength)
+
+    def log_odds(self, user_codes, product_codes):
+        """
+        log P(purchase | product, user) - log P(no purchase | product, user) for a users x products block.
+        """
+        user_codes = np.atleast_1d(np.asarray(user_codes, dtype=np.int64))
+        product_codes = np.atleast_1d(np.asarray(product_codes, dtype=np.int64))
+        scores = np.empty((len(user_codes), len(product_codes)))
+        scores[:] = self.log_prior[0] - self.log_prior[1] + self.product_log_ratio[product_codes]
+        for feature in FEATURES:
+            scores += np.log(self.user_likelihood(feature, user_codes, product_codes, 0))
+            scores -= np.log(self.user_likelihood(feature, user_codes, product_codes, 1))
+        return scores
+
+    def posterior(self, user_codes, product_codes):
+        """
+        P(purchase | product, user) for every user x product pair of the two code arrays.
+        """
+        return expit(self.log_odds(user_codes, product_codes))
+
+    def recommend(self, user_id, n=10, product_codes=None):
+        """
+        The n products with the highest purchase posterior for a user, scored against
+        the full catalog (or `product_codes`) block by block.
+
+        Returns:
+        - DataFrame: `product_id`, `posterior` and the product's feature levels, best first.
+          Empty when the user is unknown.
+        """
+        user = self.user_code(user_id)
+        columns = ["product_id", "posterior"] + FEATURES
+        if user < 0:
+            return pd.DataFrame(columns=columns)
+        if product_codes is None:
+            product_codes = np.arange(self.n_products)
+
+        block = max(BLOCK_CELLS, n)
+        best_codes, best_scores = [], []
+        for start in range(0, len(product_codes), block):
+            codes = product_codes[start:start + block]
+            scores = self.log_odds([user], codes)[0]
+            if len(codes) > n:
+                top = np.argpartition(-scores, n - 1)[:n]
+                codes, scores = codes[top], scores[top]
+            best_codes.append(codes)
+            best_scores.append(scores)
+
+        codes, scores = np.concatenate(best_codes), np.concatenate(best_scores)
+        order = np.lexsort((codes, -scores))[:n]
+        codes, scores = codes[order], scores[order]
+        frame = pd.DataFrame({"product_id": self.product_ids[codes], "posterior": expit(scores)})
+        for feature in FEATURES:
+            frame[feature] = np.asarray(self.levels[feature], dtype=object)[self.product_levels[feature][codes]]
+        return frame
+
+    def explain(self, user_id, product_id):
+        """
+        Likelihood table for one user and product, as shown on the Bayesian page.
+
+        Returns:
+        - tuple: (DataFrame with Feature / Product / User columns, posterior probability),
+          or (None, None) when the user or product is unknown.
+        """
+        user, product = self.user_code(user_id), self.product_code(product_id)
+        if user < 0 or product < 0:
+            return None, None
+        rows = []
+        for feature in FEATURES:
+            level = self.product_levels[feature][product]
+            rows.append(
+                {
+                    "Feature": f"{FEATURE_LABELS[feature]} ({self.levels[feature][level]})",
+                    "Product": self.global_likelihood[feature][0, level],
+                    "User": self.user_likelihood(feature, [user], [product])[0, 0],
+                }
+            )
+        user_prior = (self.user_totals[0, user] + self.user_strength * np.exp(self.log_prior[0])) / (
+            self.user_totals[:, user].sum() + self.user_strength
+        )
+        rows.append({"Feature": "Prior", "Product": np.exp(self.log_prior[0]), "User": user_prior})
+        return pd.DataFrame(rows), float(self.posterior([user], [product])[0, 0])
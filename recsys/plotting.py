@@ -0,0 +1,204 @@
+"""
+Plots drawn from pre-aggregated inputs, rendered once and cached as PNG bytes.
+
+Handing a million rows to seaborn makes every rerun of a dashboard page
+re-bin, re-estimate and re-draw them. Here the inputs are reduced first:
+
+- histograms are `np.histogram` counts and edges,
+- KDE curves are a Gaussian kernel convolved with fine histogram counts on a
+  fixed grid (binned KDE), so their cost depends on the grid, not on n,
+- long lines are downsampled with Largest-Triangle-Three-Buckets (LTTB),
+- scatters become 2-D count grids drawn as density maps.
+
+Figures are drawn on `matplotlib.figure.Figure` objects (no pyplot state, safe
+across Streamlit sessions) and cached as PNG bytes keyed by the caller's key,
+e.g. (dataset version, plot name, plot parameters); the aggregation runs only
+when the key is new, so page render time does not grow with the data.
+"""
+from io import BytesIO
+
+import numpy as np
+from matplotlib.colors import LinearSegmentedColormap, to_rgba
+from matplotlib.figure import Figure
+
+from recsys.memo import LRUMemo
+
+KDE_GRID_POINTS = 512
+LINE_POINTS = 1000
+DENSITY_BINS = (200, 100)
+MIN_OPACITY = 0.3
+FIGURE_DPI = 100
+MAX_CACHED_FIGURES = 64
+
+_figures = LRUMemo(MAX_CACHED_FIGURES)
+
+
+def histogram(values, bins=30, range=None):
+    """
+    np.histogram of the non-missing values.
+
+    Returns:
+    - tuple: (counts, edges)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.histogram(values[~np.isnan(values)], bins=bins, range=range)
+
+
+def binned_kde(values, grid_points=KDE_GRID_POINTS, bandwidth=None):
+    """
+    Gaussian KDE evaluated on a fixed grid from binned counts.
+
+    Parameters:
+    - values (array): Sample.
+    - grid_points (int): Grid size (and number of fine histogram bins).
+    - bandwidth (float): Kernel standard deviation; Scott's rule (as gaussian_kde) by default.
+
+    Returns:
+    - tuple: (grid, density) arrays; kernel mass past the sample's range is cut off.
+    """
+    counts, edges = histogram(values, bins=grid_points)
+    return kde_from_counts(counts, edges, bandwidth)
+
+
+def kde_from_counts(counts, edges, bandwidth=None):
+    """
+    Gaussian KDE on the bin centers of a histogram with equal-width bins.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    centers = (edges[:-1] + edges[1:]) / 2
+    n = counts.sum()
+    if n == 0:
+        return centers, np.zeros_like(centers)
+    step = edges[1] - edges[0]
+    if bandwidth is None:
+        mean = (counts * centers).sum() / n
+        std = np.sqrt((counts * (centers - mean) ** 2).sum() / n)
+        bandwidth = std * n ** (-1 / 5)
+    sigma = max(bandwidth / step, 1e-3) if step > 0 else 1e-3
+    half_width = int(min(np.ceil(4 * sigma), len(counts)))
+    offsets = np.arange(-half_width, half_width + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel /= kernel.sum()
+    density = np.convolve(counts, kernel, mode="same") / (n * step if step > 0 else n)
+    return centers, density
+
+
+def lttb(x, y, n_out=LINE_POINTS):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line to at most n_out points.
+
+    The first and last points are kept; every bucket in between keeps the point forming
+    the largest triangle with the previously kept point and the next bucket's mean.
+
+    Returns:
+    - tuple: (x, y) of the kept points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    for bucket in range(n_out - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        if bucket + 2 < len(bounds):
+            next_x = x[end:bounds[bucket + 2]].mean()
+            next_y = y[end:bounds[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        previous = kept[bucket]
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        kept[bucket + 1] = start + int(np.argmax(area))
+    return x[kept], y[kept]
+
+
+def density_grid(x, y, groups=None, bins=DENSITY_BINS):
+    """
+    2-D point counts for a density-binned scatter, optionally one grid per group.
+
+    Parameters:
+    - x, y (array): Point coordinates.
+    - groups (array): Integer group per point (e.g. cluster labels), or None.
+    - bins (tuple): Cells along x and y.
+
+    Returns:
+    - dict: `counts` (groups x bins_x x bins_y), `x_edges`, `y_edges` and `groups` (group labels).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    groups = np.zeros(len(x), dtype=np.int64) if groups is None else np.asarray(groups)
+    labels, codes = np.unique(groups, return_inverse=True)
+    x_edges = np.histogram_bin_edges(x, bins=bins[0])
+    y_edges = np.histogram_bin_edges(y, bins=bins[1])
+    x_cells = np.clip(np.searchsorted(x_edges, x, side="right") - 1, 0, bins[0] - 1)
+    y_cells = np.clip(np.searchsorted(y_edges, y, side="right") - 1, 0, bins[1] - 1)
+    flat = (codes * bins[0] + x_cells) * bins[1] + y_cells
+    counts = np.bincount(flat, minlength=len(labels) * bins[0] * bins[1]).reshape(len(labels), bins[0], bins[1])
+    return {"counts": counts, "x_edges": x_edges, "y_edges": y_edges, "groups": labels}
+
+
+def draw_histogram(ax, counts, edges, color="blue", density=False, kde=None, label=None):
+    """
+    Draws histogram counts (as a density when `density`) and an optional (grid, density) KDE curve.
+    """
+    heights = counts / (counts.sum() * np.diff(edges)) if density else counts
+    ax.stairs(heights, edges, fill=True, color=color, alpha=0.6, label=label)
+    ax.stairs(heights, edges, color=color)
+    if kde is not None:
+        grid, curve = kde
+        if not density:
+            # Scale the density curve to the counts of this histogram
+            curve = curve * counts.sum() * np.diff(edges).mean()
+        ax.plot(grid, curve, color=color)
+
+
+def draw_density(ax, grid, colors=None, labels=None):
+    """
+    Draws the output of density_grid: one translucent single-colour map per group,
+    with opacity growing with the log of the cell count.
+    """
+    colors = colors or ["#440154", "#21918c", "#fde725", "#3b528b", "#5ec962"]
+    counts = grid["counts"]
+    scale = np.log1p(counts.max()) if counts.size and counts.max() > 0 else 1.0
+    for index, group in enumerate(grid["groups"]):
+        color = to_rgba(colors[index % len(colors)])
+        cmap = LinearSegmentedColormap.from_list("group", [color[:3] + (0.0,), color[:3] + (1.0,)])
+        cells = counts[index].T
+        # Occupied cells are never fainter than MIN_OPACITY so single points stay visible
+        opacity = MIN_OPACITY + (1 - MIN_OPACITY) * np.log1p(cells) / scale
+        ax.pcolormesh(grid["x_edges"], grid["y_edges"], np.ma.masked_where(cells == 0, opacity), cmap=cmap, vmin=0, vmax=1)
+        ax.scatter([], [], color=color, label=labels[index] if labels is not None else str(group))
+
+
+def figure_png(figure, dpi=FIGURE_DPI):
+    """
+    PNG bytes of a figure.
+    """
+    buffer = BytesIO()
+    figure.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def cached_figure(key, draw, figsize=(8, 5)):
+    """
+    PNG bytes of a figure drawn by `draw(ax)`, rendered only the first time `key` is seen.
+
+    Parameters:
+    - key (tuple): Hashable cache key, e.g. (dataset version, plot name, plot parameters).
+    - draw (callable): Draws on the Axes it is given; aggregate inside it so cache hits skip that too.
+    - figsize (tuple): Figure size in inches.
+
+    Returns:
+    - bytes: PNG image.
+    """
+
+    def render():
+        figure = Figure(figsize=figsize)
+        draw(figure.add_subplot())
+        return figure_png(figure)
+
+    return _figures.get(key, render)
@@ -0,0 +1,222 @@
+"""
+Log-normal price fit and goodness of fit from compact summaries.
+
+The Price Analysis page fits a log-normal distribution to log(price + 1) with
+`stats.lognorm.fit(values, floc=0)` (a numerical optimizer over every row),
+sorts every value for the ECDF and evaluates the fitted CDF on each of them.
+With the location fixed at 0 the maximum-likelihood fit has a closed form:
+
+    shape = std(log x),  scale = exp(mean(log x))
+
+so it only needs the count, sum and sum of squares of log x. The ECDF and the
+Kolmogorov-Smirnov distance come from a sketch of the distinct values and their
+cumulative counts, thinned to at most `SKETCH_POINTS` points; prices are
+discrete, so on this dataset the sketch is usually exact. Summaries are
+memoized per dataset version and price-category scheme and take a few
+kilobytes, so the page renders without touching the raw rows.
+
+Usage:
+    python -m recsys.price_distribution sampled_df.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from recsys.data_store import dataset_version
+from recsys.memo import LRUMemo
+from recsys.schema import read_events_csv
+
+SKETCH_POINTS = 2048
+HISTOGRAM_BINS = 30
+# Price categories of the page: Low below 20, Medium from 20 to 50 inclusive, High above 50
+PRICE_CATEGORY_EDGES = (20, 50)
+PRICE_CATEGORY_LABELS = ("Low", "Medium", "High")
+# Memoized summaries kept at most
+MAX_CACHED_SUMMARIES = 8
+
+_summaries = LRUMemo(MAX_CACHED_SUMMARIES)
+
+
+def log_prices(prices):
+    """
+    log(price + 1), the values the page fits and plots; missing prices are dropped.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    return np.log(prices[~np.isnan(prices)] + 1)
+
+
+class PriceDistribution:
+    """
+    Sufficient statistics, histogram and ECDF sketch of a sample, with the log-normal fit on top.
+
+    Parameters:
+    - values (array): Sample (e.g. log_prices(data['price'])).
+    - sketch_points (int): Most distinct values kept in the ECDF sketch.
+    - bins (int): Histogram bins.
+
+    Attributes:
+    - n (int): Sample size.
+    - log_n, log_sum, log_sum_sq: Count, sum and sum of squares of log(value) over positive values.
+    - histogram, bin_edges (ndarray): np.histogram of the sample.
+    - sketch_values, sketch_counts, sketch_cumulative (ndarray): Kept distinct values, their counts
+      and the number of values at or below each of them.
+    """
+
+    def __init__(self, values, sketch_points=SKETCH_POINTS, bins=HISTOGRAM_BINS):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            raise ValueError("No values to summarize.")
+        self.n = len(values)
+
+        positive = values[values > 0]
+        logs = np.log(positive)
+        self.log_n = len(positive)
+        self.log_sum = float(logs.sum())
+        self.log_sum_sq = float((logs**2).sum())
+
+        self.histogram, self.bin_edges = np.histogram(values, bins=bins)
+
+        distinct, counts = np.unique(values, return_counts=True)
+        cumulative = np.cumsum(counts)
+        if len(distinct) > sketch_points:
+            # Keep the values where the cumulative count crosses evenly spaced ranks, plus the extremes
+            targets = np.linspace(0, self.n, sketch_points)
+            keep = np.unique(np.r_[0, np.searchsorted(cumulative, targets, side="left"), len(distinct) - 1])
+            keep = keep[keep < len(distinct)]
+            distinct, counts, cumulative = distinct[keep], counts[keep], cumulative[keep]
+        self.sketch_values = distinct
+        self.sketch_counts = counts
+        self.sketch_cumulative = cumulative
+
+    @property
+    def nbytes(self):
+        arrays = (self.histogram, self.bin_edges, self.sketch_values, self.sketch_counts, self.sketch_cumulative)
+        return sum(array.nbytes for array in arrays)
+
+    def fit(self):
+        """
+        Closed-form log-normal MLE with loc fixed at 0, over the positive values.
+
+        Returns:
+        - tuple: (shape, loc, scale) as returned by stats.lognorm.fit(values, floc=0).
+        """
+        if self.log_n == 0:
+            raise ValueError("A log-normal fit needs positive values.")
+        mean = self.log_sum / self.log_n
+        variance = max(self.log_sum_sq / self.log_n - mean**2, 0.0)
+        return np.sqrt(variance), 0.0, np.exp(mean)
+
+    def pdf(self, x):
+        return stats.lognorm.pdf(x, *self.fit())
+
+    def cdf(self, x):
+        return stats.lognorm.cdf(x, *self.fit())
+
+    def density(self):
+        """
+        Histogram as a density (area 1), with the bin edges.
+        """
+        return self.histogram / (self.n * np.diff(self.bin_edges)), self.bin_edges
+
+    def ecdf(self):
+        """
+        (values, cumulative probability) at the sketch points.
+        """
+        return self.sketch_values, self.sketch_cumulative / self.n
+
+    def ks_test(self):
+        """
+        Kolmogorov-Smirnov test of the sample against the fitted log-normal.
+
+        The statistic is evaluated on both sides of every sketch point, as scipy's kstest
+        does at every sample; it is exact when the sketch keeps every distinct value.
+        Otherwise the true statistic is at most `error_bound` larger.
+
+        Returns:
+        - dict: `statistic`, `pvalue` and `error_bound`.
+        """
+        fitted = self.cdf(self.sketch_values)
+        upper = self.sketch_cumulative / self.n
+        lower = (self.sketch_cumulative - self.sketch_counts) / self.n
+        statistic = float(max((upper - fitted).max(), (fitted - lower).max()))
+        # Mass of the values dropped between consecutive sketch points
+        error_bound = float(np.max(lower[1:] - upper[:-1], initial=0.0))
+        return {"statistic": statistic, "pvalue": float(stats.kstwo.sf(statistic, self.n)), "error_bound": error_bound}
+
+
+def price_categories(prices, edges=PRICE_CATEGORY_EDGES, labels=PRICE_CATEGORY_LABELS):
+    """
+    Price category per price: the first label below edges[0], then one label per edge
+    interval with upper edges inclusive (Low < 20 <= Medium <= 50 < High by default).
+    Missing prices get no category.
+
+    Returns:
+    - Categorical: Category per price.
+    """
+    if len(labels) != len(edges) + 1:
+        raise ValueError("Price categories need one more label than edges.")
+    prices = np.asarray(prices, dtype=np.float64)
+    codes = (prices >= edges[0]).astype(np.int64)
+    for edge in edges[1:]:
+        codes += prices > edge
+    codes[np.isnan(prices)] = -1
+    return pd.Categorical.from_codes(codes, list(labels))
+
+
+def purchases_by_category(events, edges=PRICE_CATEGORY_EDGES, labels=PRICE_CATEGORY_LABELS):
+    """
+    Number of purchase events per price category, in label order.
+    """
+    purchases = events.loc[events["event_type"].to_numpy() == "purchase", "price"]
+    categories = price_categories(purchases.to_numpy(), edges, labels)
+    return pd.Series(np.bincount(categories.codes[categories.codes >= 0], minlength=len(labels)), index=list(labels))
+
+
+def price_summary(events, edges=PRICE_CATEGORY_EDGES, labels=PRICE_CATEGORY_LABELS):
+    """
+    Everything the Price Analysis page shows about the price distribution, memoized per
+    dataset version and price-category scheme.
+
+    Returns:
+    - dict: `distribution` (PriceDistribution of log(price + 1)), `fit` ((shape, loc, scale)),
+      `ks` (ks_test result) and `purchases_by_category` (Series).
+    """
+    key = (dataset_version(events), tuple(edges), tuple(labels))
+
+    def summarize():
+        distribution = PriceDistribution(log_prices(events["price"].to_numpy()))
+        return {
+            "distribution": distribution,
+            "fit": distribution.fit(),
+            "ks": distribution.ks_test(),
+            "purchases_by_category": purchases_by_category(events, edges, labels),
+        }
+
+    return _summaries.get(key, summarize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log-normal fit and KS test of log(price + 1).")
+    parser.add_argument("input", help="Event log CSV.")
+    args = parser.parse_args()
+
+    start = time.time()
+    events = read_events_csv(args.input, usecols=["price", "event_type"])
+    summary = price_summary(events)
+    shape, loc, scale = summary["fit"]
+    ks = summary["ks"]
+    print(f"Log-normal fit parameters: shape={shape}, loc={loc}, scale={scale}")
+    print(f"Kolmogorov-Smirnov Test Statistic: {ks['statistic']} (error bound {ks['error_bound']})")
+    print(f"P-value: {ks['pvalue']}")
+    print("Purchases by Price Category:")
+    print(summary["purchases_by_category"].to_string())
+    print(f"Summary size: {summary['distribution'].nbytes / 1e3:.1f} kB")
+    print(f"Time taken: {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
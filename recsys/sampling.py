@@ -0,0 +1,232 @@
+"""
+Streaming stratified sampler for the monthly raw event CSVs.
+
+Reproduces Data_preparation/Stratified_sampling.ipynb without loading the full
+dataset: users are stratified by their total event count and every event of a
+selected user is kept, so complete user histories survive the sampling.
+
+The job makes two streaming passes over the CSVs:
+1. Count events per user (only the `user_id` column is read).
+2. Emit every event of the selected users to the output file.
+
+Users are picked within each activity stratum by a seeded hash of their id,
+which is equivalent to a uniform random sample without replacement but needs
+no per-stratum shuffling and gives the same selection on every run.
+
+Usage:
+    python -m recsys.sampling path/to/cosmetics/ --output sampled_df.csv --target-rows 1000000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 1_000_000
+# Flush buffered per-chunk counts into the running totals once this many entries pile up
+MERGE_THRESHOLD = 5_000_000
+
+
+def list_csv_files(inputs):
+    """
+    Expands directories into the CSV files they contain (sorted by name).
+    """
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        if item.is_dir():
+            paths.extend(sorted(item.glob("*.csv")))
+        else:
+            paths.append(item)
+    return paths
+
+
+def _merge_counts(parts):
+    ids = np.concatenate([part[0] for part in parts])
+    counts = np.concatenate([part[1] for part in parts])
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    return unique_ids, np.bincount(inverse, weights=counts, minlength=len(unique_ids)).astype(np.int64)
+
+
+def count_user_events(paths, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    First pass: counts events per user by streaming the `user_id` column.
+
+    Parameters:
+    - paths (list): CSV files.
+    - chunksize (int): Rows read per chunk.
+
+    Returns:
+    - tuple: (sorted user ids, event count per user, total number of rows)
+    """
+    merged = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    pending = []
+    pending_size = 0
+    total_rows = 0
+
+    for path in paths:
+        for chunk in pd.read_csv(path, usecols=["user_id"], dtype={"user_id": np.int64}, chunksize=chunksize):
+            ids, counts = np.unique(chunk["user_id"].to_numpy(), return_counts=True)
+            pending.append((ids, counts))
+            pending_size += len(ids)
+            total_rows += len(chunk)
+            if pending_size > max(MERGE_THRESHOLD, len(merged[0])):
+                merged = _merge_counts([merged] + pending)
+                pending, pending_size = [], 0
+
+    if pending:
+        merged = _merge_counts([merged] + pending)
+    return merged[0], merged[1], total_rows
+
+
+def stratum_quotas(user_counts, total_rows, target_rows, sparse_level_step=20):
+    """
+    Number of users to draw per activity level, as computed in the notebook.
+
+    Levels are allocated users in proportion to their share of all users, scaled so
+    the sample holds about `target_rows` events. Levels that round to zero users get
+    one user for every `sparse_level_step + 1`-th such level, walking them from the
+    most to the least common.
+
+    Parameters:
+    - user_counts (ndarray): Event count per user.
+    - total_rows (int): Total number of events.
+    - target_rows (int): Desired number of sampled events.
+    - sparse_level_step (int): Spacing between the zero-quota levels that still get a user.
+
+    Returns:
+    - Series: Quota per event-count level, ordered from most to least common level.
+    """
+    level_sizes = pd.Series(user_counts).value_counts()
+    target_users = len(user_counts) / total_rows * target_rows
+    quotas = (level_sizes / len(user_counts) * target_users).round().astype(int)
+
+    n = 0
+    for level in quotas[quotas == 0].index:
+        if n == sparse_level_step:
+            quotas.loc[level] = 1
+            n = 0
+        else:
+            n += 1
+    return quotas
+
+
+def hash_priority(user_ids, seed):
+    """
+    Seeded 64-bit hash (splitmix64 finaliser) of each user id, used as a sampling priority.
+    """
+    with np.errstate(over="ignore"):
+        z = user_ids.astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def select_users(user_ids, user_counts, quotas, seed=42):
+    """
+    Picks `quotas[level]` users from each activity level by lowest hash priority.
+
+    Parameters:
+    - user_ids (ndarray): User ids.
+    - user_counts (ndarray): Event count per user.
+    - quotas (Series): Users to keep per event-count level.
+    - seed (int): Hash seed.
+
+    Returns:
+    - ndarray: Sorted ids of the selected users.
+    """
+    order = np.lexsort((hash_priority(user_ids, seed), user_counts))
+    sorted_levels = user_counts[order]
+
+    # Rank of every user inside its level, after ordering by priority
+    level_starts = np.flatnonzero(np.r_[True, sorted_levels[1:] != sorted_levels[:-1]])
+    level_sizes = np.diff(np.r_[level_starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(level_starts, level_sizes)
+
+    level_quota = quotas.reindex(sorted_levels, fill_value=0).to_numpy()
+    return np.sort(user_ids[order[rank < level_quota]])
+
+
+def write_sample(paths, selected_users, output, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Second pass: streams the CSVs and writes every event of the selected users.
+
+    A `month` column is added from each file name (e.g. '2020-Jan.csv' -> '2020-Jan').
+
+    Returns:
+    - int: Number of rows written.
+    """
+    written = 0
+    header = True
+    with open(output, "w", newline="") as sink:
+        for path in paths:
+            month_year = Path(path).stem
+            for chunk in pd.read_csv(path, chunksize=chunksize):
+                ids = chunk["user_id"].to_numpy(dtype=np.int64)
+                positions = np.minimum(np.searchsorted(selected_users, ids), len(selected_users) - 1)
+                chunk = chunk[selected_users[positions] == ids]
+                if chunk.empty:
+                    continue
+                chunk = chunk.assign(month=month_year)
+                chunk.to_csv(sink, header=header, index=False)
+                header = False
+                written += len(chunk)
+    return written
+
+
+def stratified_sample(inputs, output, target_rows=1_000_000, seed=42, chunksize=DEFAULT_CHUNKSIZE, sparse_level_step=20):
+    """
+    Samples complete user histories stratified by user activity level.
+
+    Parameters:
+    - inputs (list): CSV files or directories of CSV files.
+    - output (str or Path): Destination CSV.
+    - target_rows (int): Desired number of sampled events.
+    - seed (int): Seed for the user selection.
+    - chunksize (int): Rows read per chunk; bounds the memory used for events.
+    - sparse_level_step (int): See stratum_quotas.
+
+    Returns:
+    - dict: Summary of the run.
+    """
+    if target_rows <= 0:
+        raise ValueError("target_rows must be positive.")
+    paths = list_csv_files(inputs)
+    if not paths:
+        raise ValueError("No CSV files found in the given inputs.")
+
+    user_ids, user_counts, total_rows = count_user_events(paths, chunksize)
+    quotas = stratum_quotas(user_counts, total_rows, target_rows, sparse_level_step)
+    selected = select_users(user_ids, user_counts, quotas, seed)
+    if len(selected) == 0:
+        raise ValueError("The sampling quotas selected no users; increase target_rows.")
+    rows = write_sample(paths, selected, output, chunksize)
+
+    return {
+        "files": len(paths),
+        "input_rows": total_rows,
+        "input_users": len(user_ids),
+        "sampled_users": len(selected),
+        "sampled_rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stratified sampling of complete user histories from raw event CSVs.")
+    parser.add_argument("inputs", nargs="+", help="Monthly CSV files or directories containing them.")
+    parser.add_argument("--output", required=True, help="Output CSV path.")
+    parser.add_argument("--target-rows", type=int, default=1_000_000, help="Approximate number of events to keep.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = stratified_sample(args.inputs, args.output, args.target_rows, args.seed, args.chunksize)
+    for key, value in summary.items():
+        print(f"{key}: {value:,}")
+    print(f"elapsed: {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Compact typed schema for the event log.
+
+Low-cardinality strings become `category` dtypes (sessions are dictionary-encoded
+the same way), ids use the smallest integer type that holds them, prices and
+derived floats are stored as float32 and `event_time` is parsed once with an
+explicit format.
+
+Usage:
+    python -m recsys.schema path/to/sampled_df.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+EVENT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+
+CATEGORICAL_COLUMNS = [
+    "event_type",
+    "brand",
+    "category_code",
+    "user_session",
+    "price_category",
+    "event_day_of_week",
+    "premiumness",
+]
+FLOAT_COLUMNS = ["price", "normalized_price", "log_price", "temporal_weight"]
+# Ids that always fit in int32 on this dataset are still range-checked before downcasting
+ID_COLUMNS = ["product_id", "user_id", "category_id"]
+COUNT_COLUMNS = ["event_hour", "total_events", "count_cart", "count_purchase", "count_remove_from_cart", "count_view"]
+
+
+def frame_memory(df):
+    """
+    Resident memory of a DataFrame in bytes, including string payloads.
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(before, after):
+    """
+    Formats a before/after memory comparison.
+
+    Parameters:
+    - before (int): Memory in bytes before compaction.
+    - after (int): Memory in bytes after compaction.
+
+    Returns:
+    - str: Human readable summary.
+    """
+    ratio = before / after if after else float("inf")
+    return f"Memory usage: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB ({ratio:.1f}x smaller)"
+
+
+def _smallest_int(values):
+    # Nullable integer types keep missing ids instead of falling back to float64
+    nullable = values.isna().any()
+    if values.empty:
+        return "Int32" if nullable else "int32"
+    low, high = values.min(), values.max()
+    info = np.iinfo(np.int32)
+    fits_32 = info.min <= low and high <= info.max
+    if nullable:
+        return "Int32" if fits_32 else "Int64"
+    return "int32" if fits_32 else "int64"
+
+
+def parse_event_time(values):
+    """
+    Parses `event_time` strings such as '2019-12-01 00:00:02 UTC' into UTC timestamps.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format=EVENT_TIME_FORMAT, utc=True)
+    except ValueError:
+        # Files re-saved by pandas drop the ' UTC' suffix and carry an offset instead
+        return pd.to_datetime(values, format="ISO8601", utc=True)
+
+
+def optimize_frame(df, verbose=False):
+    """
+    Converts the known event-log columns of a DataFrame to the compact schema.
+
+    Parameters:
+    - df (DataFrame): Event log with any subset of the known columns.
+    - verbose (bool): Print the before/after memory usage.
+
+    Returns:
+    - DataFrame: New DataFrame using the compact dtypes.
+    """
+    before = frame_memory(df) if verbose else 0
+    df = df.copy()
+
+    if "event_time" in df.columns:
+        df["event_time"] = parse_event_time(df["event_time"])
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(np.float32)
+
+    for column in ID_COLUMNS + COUNT_COLUMNS:
+        if column in df.columns and pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype(_smallest_int(df[column]))
+
+    if verbose:
+        print(memory_report(before, frame_memory(df)))
+    return df
+
+
+def read_events_csv(path, verbose=False, **kwargs):
+    """
+    Reads an event-log CSV straight into the compact schema.
+
+    String columns are read as categories and prices as float32 by the CSV parser
+    itself, so the object-dtype copy of the file is never materialised.
+
+    Parameters:
+    - path (str or Path): CSV file.
+    - verbose (bool): Print the memory usage of the parsed frame.
+    - kwargs: Extra arguments passed to pd.read_csv.
+
+    Returns:
+    - DataFrame: Event log using the compact dtypes.
+    """
+    dtype = {column: "category" for column in CATEGORICAL_COLUMNS}
+    dtype.update({column: np.float32 for column in FLOAT_COLUMNS})
+    dtype.update(kwargs.pop("dtype", {}))
+    df = pd.read_csv(path, dtype=dtype, **kwargs)
+    df = optimize_frame(df)
+    if verbose:
+        print(f"Memory usage: {frame_memory(df) / 1e6:,.1f} MB")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the memory saved by the compact event-log schema.")
+    parser.add_argument("path", help="Event-log CSV file.")
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.path)
+    compact = read_events_csv(args.path)
+    print(memory_report(frame_memory(raw), frame_memory(compact)))
+    print(compact.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    main()
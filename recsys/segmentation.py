@@ -0,0 +1,398 @@
+"""
+Price-sensitivity segments of purchasing users.
+
+Two segmentations are fitted once per dataset and persisted:
+
+- Price segments: k-means on each purchaser's average purchase price. In one
+  dimension the optimal k-means partition splits the sorted values into
+  contiguous runs, so it is found exactly by dynamic programming over the
+  sorted (deduplicated, weighted) values. Every DP layer is solved with the
+  divide-and-conquer optimization, one vectorized step per recursion level,
+  for O(k n log n) after sorting. Segments are numbered by increasing center.
+- User segments: mini-batch k-means over richer per-user features (average
+  purchase price, purchase price variance, share of purchases per premiumness
+  tier and purchase rate), standardized and streamed to sklearn's
+  MiniBatchKMeans in batches of users.
+
+Only centroids are needed to assign a user: a price segment is found by
+comparing the price with the k - 1 midpoints between centers, a user segment
+by the nearest of the k centroids. The fitted centroids and every purchaser's
+assignment are written to `<cache dir>/segments/<key>/`, keyed by the dataset
+fingerprint and parameters, so a page view only loads the stored assignment.
+
+Usage:
+    python -m recsys.segmentation --data-path enhanced_1M_dataset.zip --segments 3
+"""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+
+from recsys.data_store import (
+    LocalSource,
+    dataset_version,
+    default_source,
+    load_dataset,
+    read_cache_file,
+    write_cache_file,
+)
+from recsys.naive_bayes import PREMIUMNESS_LEVELS, premiumness
+from recsys.store import build_manifest, store_key, store_root, write_directory
+
+# Stored in the segment key (see recsys.store); bump when the saved files change
+SEGMENT_FORMAT_VERSION = 1
+
+DEFAULT_PARAMS = {
+    "n_segments": 3,
+    "batch_size": 4096,
+    "epochs": 5,
+    "seed": 42,
+}
+FEATURES = ["avg_price", "price_variance"] + [f"share_{level.lower()}" for level in PREMIUMNESS_LEVELS] + ["purchase_rate"]
+
+
+def _segment_cost(prefix_w, prefix_wx, prefix_wxx, start, stop):
+    # Weighted sum of squared deviations of sorted values start..stop (inclusive) from their mean
+    w = prefix_w[stop + 1] - prefix_w[start]
+    wx = prefix_wx[stop + 1] - prefix_wx[start]
+    wxx = prefix_wxx[stop + 1] - prefix_wxx[start]
+    return np.maximum(wxx - wx * wx / w, 0.0)
+
+
+def _dp_layer(previous, layer, prefix_w, prefix_wx, prefix_wxx):
+    """
+    One layer of the k-means DP: best[i] = min over m of previous[m - 1] + cost(m, i), for i >= layer.
+
+    The optimal m is non-decreasing in i, so the rows are solved by divide and conquer:
+    the middle row of every open range is solved with candidates restricted by its neighbours'
+    optima, all middle rows of a recursion level in one vectorized step.
+    """
+    n = len(previous)
+    best = np.full(n, np.inf)
+    argmin = np.zeros(n, dtype=np.int64)
+    low, high = np.array([layer]), np.array([n - 1])
+    low_opt, high_opt = np.array([layer]), np.array([n - 1])
+    while len(low):
+        middle = (low + high) // 2
+        top = np.minimum(middle, high_opt)
+        lengths = top - low_opt + 1
+        starts = np.cumsum(lengths) - lengths
+        segment = np.repeat(np.arange(len(middle)), lengths)
+        candidates = low_opt[segment] + np.arange(lengths.sum()) - starts[segment]
+        rows = middle[segment]
+        values = previous[candidates - 1] + _segment_cost(prefix_w, prefix_wx, prefix_wxx, candidates, rows)
+        minima = np.minimum.reduceat(values, starts)
+        # First candidate reaching each segment's minimum (candidates are grouped by segment)
+        hits = np.flatnonzero(values == minima[segment])
+        first = np.r_[True, segment[hits][1:] != segment[hits][:-1]]
+        chosen = candidates[hits[first]]
+        best[middle] = minima
+        argmin[middle] = chosen
+
+        left = low <= middle - 1
+        right = middle + 1 <= high
+        low = np.concatenate([low[left], middle[right] + 1])
+        high = np.concatenate([middle[left] - 1, high[right]])
+        low_opt, high_opt = (
+            np.concatenate([low_opt[left], chosen[right]]),
+            np.concatenate([chosen[left], high_opt[right]]),
+        )
+    return best, argmin
+
+
+def kmeans_1d(values, k, weights=None):
+    """
+    Exact (globally optimal) k-means of one-dimensional values.
+
+    Parameters:
+    - values (array): Values to cluster; missing values are ignored.
+    - k (int): Number of clusters (fewer if there are fewer distinct values).
+    - weights (array): Optional non-negative weight per value.
+
+    Returns:
+    - dict: `centers` (ascending), `boundaries` (k - 1 midpoints between consecutive centers),
+      `sizes` (total weight per cluster) and `inertia` (weighted sum of squared distances).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+    observed = ~np.isnan(values)
+    if not observed.any():
+        raise ValueError("No values to cluster.")
+    if k < 1:
+        raise ValueError("k must be at least 1.")
+    distinct, inverse = np.unique(values[observed], return_inverse=True)
+    distinct_weights = np.bincount(inverse, weights=weights[observed], minlength=len(distinct))
+    k = min(k, len(distinct))
+
+    # Prefix sums of values shifted by their weighted mean, for numerical stability
+    shift = np.average(distinct, weights=distinct_weights)
+    shifted = distinct - shift
+    prefix_w = np.r_[0.0, np.cumsum(distinct_weights)]
+    prefix_wx = np.r_[0.0, np.cumsum(distinct_weights * shifted)]
+    prefix_wxx = np.r_[0.0, np.cumsum(distinct_weights * shifted**2)]
+
+    n = len(distinct)
+    cost = _segment_cost(prefix_w, prefix_wx, prefix_wxx, np.zeros(n, dtype=np.int64), np.arange(n))
+    splits = []
+    for layer in range(1, k):
+        cost, argmin = _dp_layer(cost, layer, prefix_w, prefix_wx, prefix_wxx)
+        splits.append(argmin)
+
+    # Backtrack the first index of every cluster
+    starts = np.zeros(k, dtype=np.int64)
+    stop = n - 1
+    for layer in range(k - 1, 0, -1):
+        starts[layer] = splits[layer - 1][stop]
+        stop = starts[layer] - 1
+    stops = np.r_[starts[1:] - 1, n - 1]
+    sizes = prefix_w[stops + 1] - prefix_w[starts]
+    centers = shift + (prefix_wx[stops + 1] - prefix_wx[starts]) / sizes
+    return {
+        "centers": centers,
+        "boundaries": (centers[:-1] + centers[1:]) / 2,
+        "sizes": sizes,
+        "inertia": float(cost[n - 1]),
+    }
+
+
+def assign_1d(values, boundaries):
+    """
+    Segment of each value given the boundaries between ascending centers (nearest center).
+    """
+    return np.searchsorted(np.asarray(boundaries), np.asarray(values, dtype=np.float64), side="left")
+
+
+def user_features(events):
+    """
+    Per-purchaser features for segmentation, from bincounts over user codes. A `premiumness`
+    column (e.g. from recsys.features) is used when present.
+
+    Returns:
+    - DataFrame: Indexed by user_id (users with at least one purchase) with the FEATURES columns.
+    """
+    user_codes, users = pd.factorize(events["user_id"])
+    n_users = len(users)
+    prices = events["price"].to_numpy(dtype=np.float64)
+    if "premiumness" in events.columns:
+        tiers = pd.Categorical(events["premiumness"], categories=PREMIUMNESS_LEVELS).codes
+    else:
+        tiers = premiumness(prices).codes
+    purchased = (events["event_type"].to_numpy() == "purchase") & ~np.isnan(prices) & (user_codes >= 0)
+
+    buyer_codes = user_codes[purchased]
+    buyer_prices = prices[purchased]
+    n_events = np.bincount(user_codes[user_codes >= 0], minlength=n_users)
+    n_purchases = np.bincount(buyer_codes, minlength=n_users)
+    price_sum = np.bincount(buyer_codes, weights=buyer_prices, minlength=n_users)
+    price_sum_sq = np.bincount(buyer_codes, weights=buyer_prices**2, minlength=n_users)
+    # Purchases without a tier (zero prices) count towards no share
+    tiered = tiers[purchased] >= 0
+    tier_counts = np.bincount(
+        buyer_codes[tiered] * len(PREMIUMNESS_LEVELS) + tiers[purchased][tiered],
+        minlength=n_users * len(PREMIUMNESS_LEVELS),
+    ).reshape(n_users, len(PREMIUMNESS_LEVELS))
+
+    buyers = n_purchases > 0
+    count = n_purchases[buyers]
+    avg_price = price_sum[buyers] / count
+    features = {
+        "avg_price": avg_price,
+        "price_variance": np.maximum(price_sum_sq[buyers] / count - avg_price**2, 0.0),
+    }
+    for index, level in enumerate(PREMIUMNESS_LEVELS):
+        features[f"share_{level.lower()}"] = tier_counts[buyers, index] / count
+    features["purchase_rate"] = count / n_events[buyers]
+    return pd.DataFrame(features, index=pd.Index(np.asarray(users)[buyers], name="user_id"))
+
+
+class UserSegments:
+    """
+    Mini-batch k-means over standardized user features.
+
+    Parameters:
+    - n_segments (int): Number of segments.
+    - batch_size (int): Users per mini-batch.
+    - seed (int): Seed of the batch order and of the centroid initialization.
+    """
+
+    def __init__(self, n_segments=3, batch_size=4096, seed=42):
+        self.n_segments = n_segments
+        self.batch_size = batch_size
+        self.seed = seed
+        self.features = list(FEATURES)
+        self.mean = None
+        self.scale = None
+        self.centroids = None
+
+    def _standardize(self, features):
+        return (features[self.features].to_numpy(dtype=np.float64) - self.mean) / self.scale
+
+    def fit(self, features, epochs=5):
+        """
+        Streams shuffled batches of users to MiniBatchKMeans.partial_fit for `epochs` passes.
+        Centroids are ordered by increasing average price.
+        """
+        values = features[self.features].to_numpy(dtype=np.float64)
+        if len(values) < self.n_segments:
+            raise ValueError("Need at least as many users as segments.")
+        self.mean = values.mean(axis=0)
+        self.scale = np.where(values.std(axis=0) > 0, values.std(axis=0), 1.0)
+        standardized = (values - self.mean) / self.scale
+
+        rng = np.random.default_rng(self.seed)
+        model = MiniBatchKMeans(n_clusters=self.n_segments, random_state=self.seed, n_init=3)
+        for _ in range(epochs):
+            order = rng.permutation(len(standardized))
+            for start in range(0, len(order), self.batch_size):
+                model.partial_fit(standardized[order[start : start + self.batch_size]])
+        centroids = model.cluster_centers_
+        self.centroids = centroids[np.argsort(centroids[:, self.features.index("avg_price")], kind="stable")]
+        return self
+
+    def predict(self, features):
+        """
+        Nearest centroid of each user: k distances per user.
+        """
+        standardized = self._standardize(features)
+        distances = ((standardized[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+
+    def centers(self):
+        """
+        Centroids in the original feature units.
+        """
+        return pd.DataFrame(self.centroids * self.scale + self.mean, columns=self.features)
+
+    def to_dict(self):
+        return {
+            "n_segments": self.n_segments,
+            "batch_size": self.batch_size,
+            "seed": self.seed,
+            "features": self.features,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "centroids": self.centroids.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        segments = cls(state["n_segments"], state["batch_size"], state["seed"])
+        segments.features = list(state["features"])
+        segments.mean = np.asarray(state["mean"])
+        segments.scale = np.asarray(state["scale"])
+        segments.centroids = np.asarray(state["centroids"])
+        return segments
+
+
+def resolve_params(params=None):
+    resolved = dict(DEFAULT_PARAMS)
+    resolved.update(params or {})
+    return resolved
+
+
+def build_segments(events, params):
+    """
+    Fits both segmentations and assigns every purchaser.
+
+    Returns:
+    - dict: `price` (kmeans_1d result), `users` (UserSegments) and `assignments` (DataFrame indexed
+      by user_id with the features, `price_segment` and `segment`).
+    """
+    features = user_features(events)
+    price = kmeans_1d(features["avg_price"].to_numpy(), params["n_segments"])
+    users = UserSegments(params["n_segments"], params["batch_size"], params["seed"]).fit(features, params["epochs"])
+    assignments = features.assign(
+        price_segment=assign_1d(features["avg_price"].to_numpy(), price["boundaries"]).astype(np.int8),
+        segment=users.predict(features).astype(np.int8),
+    )
+    return {"price": price, "users": users, "assignments": assignments}
+
+
+def save_segments(segments, directory, manifest, replace=False):
+    """
+    Writes segments to `directory` atomically (see recsys.store.write_directory).
+    """
+    manifest["price"] = {name: np.asarray(value).tolist() for name, value in segments["price"].items()}
+    manifest["users"] = segments["users"].to_dict()
+
+    def write(tmp_dir):
+        write_cache_file(segments["assignments"].reset_index(), tmp_dir / "assignments.arrow")
+        (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    write_directory(directory, write, replace)
+
+
+def load_segments(directory):
+    """
+    Loads a segment directory written by save_segments.
+    """
+    directory = Path(directory)
+    manifest = json.loads((directory / "manifest.json").read_text())
+    price = {name: np.asarray(value) for name, value in manifest["price"].items()}
+    price["inertia"] = float(price["inertia"])
+    return {
+        "manifest": manifest,
+        "price": price,
+        "users": UserSegments.from_dict(manifest["users"]),
+        "assignments": read_cache_file(directory / "assignments.arrow").set_index("user_id"),
+    }
+
+
+def load_or_build_segments(events, params=None, root=None, rebuild=False):
+    """
+    Returns the segments of a dataset, fitting and persisting them on a cache miss.
+
+    Parameters:
+    - events (DataFrame): Enhanced dataset.
+    - params (dict): Parameters overriding DEFAULT_PARAMS.
+    - root (Path): Segment root directory (default: <cache dir>/segments).
+    - rebuild (bool): Fit even if the segments already exist.
+
+    Returns:
+    - dict: `price`, `users`, `assignments` (see build_segments) and the build `manifest`.
+    """
+    params = resolve_params(params)
+    version = dataset_version(events)
+    key = store_key(version, params, SEGMENT_FORMAT_VERSION)
+    directory = store_root("segments", root) / key
+
+    if rebuild or not (directory / "manifest.json").exists():
+        start = time.perf_counter()
+        segments = build_segments(events, params)
+        manifest = build_manifest(key, version, params, SEGMENT_FORMAT_VERSION, time.perf_counter() - start)
+        save_segments(segments, directory, manifest, replace=rebuild)
+
+    return load_segments(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit and store the price-sensitivity segments of purchasing users.")
+    parser.add_argument("--data-path", help="Local dataset file (default: ECOM_DATA_PATH or Google Drive).")
+    parser.add_argument("--root", help="Segment root directory (default: <cache dir>/segments).")
+    parser.add_argument("--segments", type=int, default=DEFAULT_PARAMS["n_segments"])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_PARAMS["batch_size"], help="Users per mini-batch.")
+    parser.add_argument("--epochs", type=int, default=DEFAULT_PARAMS["epochs"], help="Passes over the users.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_PARAMS["seed"])
+    parser.add_argument("--rebuild", action="store_true", help="Fit even if the segments exist.")
+    args = parser.parse_args()
+    # Shows the dataset cache's memory report when the dataset is converted
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    start = time.time()
+    source = LocalSource(args.data_path) if args.data_path else default_source()
+    params = {"n_segments": args.segments, "batch_size": args.batch_size, "epochs": args.epochs, "seed": args.seed}
+    segments = load_or_build_segments(load_dataset(source, read_only=True), params, args.root, args.rebuild)
+    print(f"Price segment centers: {np.round(segments['price']['centers'], 2).tolist()}")
+    print(f"Price segment sizes: {segments['price']['sizes'].astype(int).tolist()}")
+    print("User segment centers:")
+    print(segments["users"].centers().round(3).to_string())
+    print(f"Time taken: {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
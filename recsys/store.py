@@ -0,0 +1,79 @@
+"""
+Versioned directories for built artifacts, shared by the modules that persist them.
+
+A build (recommender models, user segments) is written to
+`<cache dir>/<name>/<key>/`, where the key hashes the dataset version, the
+build parameters and the store's format version, so every process loading the
+same data with the same settings reuses it and a layout change never reads a
+stale directory. Directories are filled under a temporary sibling and renamed
+into place, so readers only ever see complete builds.
+
+Usage:
+    from recsys.store import store_key, store_root, write_directory
+    directory = store_root("segments") / store_key(version, params, format_version)
+    write_directory(directory, lambda tmp_dir: save(tmp_dir))
+"""
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+from recsys.data_store import cache_dir
+
+
+def store_key(version, params, format_version):
+    """
+    Version key for a dataset fingerprint, a set of resolved build parameters and a format version.
+    """
+    payload = json.dumps({"dataset": version, "params": params, "format": format_version}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def store_root(name, root=None):
+    """
+    Root directory of a store (default: <cache dir>/<name>), created if missing.
+    """
+    path = Path(root) if root else cache_dir() / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def build_manifest(key, version, params, format_version, build_seconds):
+    """
+    Manifest fields common to every store; callers add their own entries.
+    """
+    return {
+        "key": key,
+        "dataset_version": version,
+        "params": params,
+        "format": format_version,
+        "built": datetime.now(timezone.utc).isoformat(),
+        "build_seconds": round(build_seconds, 3),
+    }
+
+
+def write_directory(directory, write, replace=False):
+    """
+    Fills a store directory atomically: `write(tmp_dir)` writes into a temporary sibling,
+    which is then renamed to `directory`.
+
+    Parameters:
+    - directory (Path): Final directory.
+    - write (callable): Writes the directory's files into the path it is given.
+    - replace (bool): Remove an existing `directory` first (a forced rebuild).
+    """
+    directory = Path(directory)
+    tmp_dir = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    write(tmp_dir)
+
+    if replace:
+        shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        # Another process finished the same build first; its copy is equivalent
+        shutil.rmtree(tmp_dir, ignore_errors=True)
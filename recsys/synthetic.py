@@ -0,0 +1,368 @@
+"""
+Synthetic event logs with the enhanced dataset's schema, at any scale.
+
+Events are generated session by session. A session belongs to a user drawn
+from a heavy-tailed (log-normal) activity distribution and views products
+drawn from a Zipf popularity curve. Every view may turn into a cart, and a cart
+into a purchase or a remove_from_cart, with the funnel rates in FUNNEL_RATES.
+Product prices are log-normal around a per-category level, and session start
+times follow a daily traffic profile.
+
+Rows are produced in fixed-size chunks, each from its own child seed, so
+memory stays bounded by the chunk size (plus one counter per user) whatever
+the total. `total_events` is a per-user total over the whole log, so the
+generator makes two passes over the same seeds: the first only counts events
+per user, the second writes the rows.
+
+Usage:
+    python -m recsys.synthetic --rows 10000000 --output synthetic_events.parquet
+    python -m recsys.synthetic --rows 100000 --output sampled_df.csv
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from recsys.schema import EVENT_TIME_FORMAT
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+EVENT_TYPES = np.array(["view", "cart", "remove_from_cart", "purchase"], dtype=object)
+COLUMNS = [
+    "event_time",
+    "event_type",
+    "product_id",
+    "category_id",
+    "brand",
+    "price",
+    "user_id",
+    "user_session",
+    "event_hour",
+    "total_events",
+    "log_price",
+]
+
+# Conversion probabilities along the view -> cart -> purchase / remove_from_cart funnel
+FUNNEL_RATES = {
+    "view_to_cart": 0.35,
+    "cart_to_purchase": 0.30,
+    "cart_to_remove": 0.40,
+}
+# Relative session traffic by hour of day (UTC)
+HOURLY_TRAFFIC = np.array(
+    [2, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 9, 9, 9, 9, 9, 10, 11, 12, 12, 10, 7, 5, 3],
+    dtype=np.float64,
+)
+# Mean seconds between a session's views, and from a view to its cart / a cart to its outcome
+VIEW_GAP_SECONDS = 45
+FUNNEL_GAP_SECONDS = 90
+
+USER_ID_BASE = 100_000_000
+PRODUCT_ID_BASE = 1_000_000
+CATEGORY_ID_BASE = 1_487_580_000_000_000_000
+
+
+class Catalog:
+    """
+    Users, products, brands and categories shared by every chunk of one synthetic log.
+
+    Parameters:
+    - n_users (int): Distinct users.
+    - n_products (int): Distinct products.
+    - n_brands (int): Distinct brands.
+    - n_categories (int): Distinct categories.
+    - zipf_exponent (float): Exponent of the product popularity curve.
+    - activity_sigma (float): Log-normal sigma of the user activity weights (larger is more skewed).
+    - missing_brand_share (float): Share of products without a brand.
+    - seed (int): Random seed.
+    """
+
+    def __init__(
+        self,
+        n_users,
+        n_products,
+        n_brands=250,
+        n_categories=300,
+        zipf_exponent=1.1,
+        activity_sigma=1.5,
+        missing_brand_share=0.4,
+        seed=0,
+    ):
+        rng = np.random.default_rng([seed, 0])
+        self.n_users = n_users
+        self.n_products = n_products
+
+        # Heavy-tailed user activity: cumulative weights, sampled with searchsorted
+        activity = rng.lognormal(0.0, activity_sigma, n_users)
+        self.user_cumulative = np.cumsum(activity / activity.sum())
+        self.user_ids = USER_ID_BASE + rng.choice(20 * n_users, n_users, replace=False).astype(np.int64)
+
+        # Zipfian product popularity over a random assignment of ranks to products
+        popularity = 1.0 / np.arange(1, n_products + 1, dtype=np.float64) ** zipf_exponent
+        popularity = popularity[rng.permutation(n_products)]
+        self.product_cumulative = np.cumsum(popularity / popularity.sum())
+        self.product_ids = PRODUCT_ID_BASE + rng.choice(20 * n_products, n_products, replace=False).astype(np.int64)
+
+        # Categories are themselves skewed; prices are log-normal around a per-category level
+        category_weights = 1.0 / np.arange(1, n_categories + 1, dtype=np.float64)
+        self.product_categories = rng.choice(n_categories, n_products, p=category_weights / category_weights.sum())
+        self.category_ids = CATEGORY_ID_BASE + np.sort(rng.choice(10**15, n_categories, replace=False)).astype(np.int64)
+        category_level = rng.normal(1.6, 0.8, n_categories)
+        log_price = category_level[self.product_categories] + rng.normal(0.0, 0.5, n_products)
+        self.product_prices = np.maximum(np.round(np.exp(log_price), 2), 0.05)
+
+        brand_names = np.array([f"brand{code:04d}" for code in range(n_brands)] + [None], dtype=object)
+        brand_codes = rng.integers(0, n_brands, n_products)
+        brand_codes[rng.random(n_products) < missing_brand_share] = n_brands
+        self.product_brands = brand_names[brand_codes]
+
+    @classmethod
+    def for_rows(cls, n_rows, seed=0, **kwargs):
+        """
+        Catalog sized for a log of `n_rows` events (about 15 events per user and 40 per product).
+        """
+        n_users = kwargs.pop("n_users", None) or max(100, n_rows // 15)
+        n_products = kwargs.pop("n_products", None) or int(np.clip(n_rows // 40, 100, 500_000))
+        return cls(n_users, n_products, seed=seed, **kwargs)
+
+    def sample_users(self, rng, size):
+        return np.minimum(np.searchsorted(self.user_cumulative, rng.random(size)), self.n_users - 1)
+
+    def sample_products(self, rng, size):
+        return np.minimum(np.searchsorted(self.product_cumulative, rng.random(size)), self.n_products - 1)
+
+
+def simulate_chunk(catalog, n_rows, seed, start, days, funnel=None, mean_views=3.0):
+    """
+    Simulates whole sessions until `n_rows` events exist, then cuts at exactly `n_rows`.
+
+    Parameters:
+    - catalog (Catalog): Shared users and products.
+    - n_rows (int): Events in the chunk.
+    - seed (SeedSequence): Seed of this chunk.
+    - start (Timestamp): Start of the simulated period.
+    - days (int): Length of the simulated period.
+    - funnel (dict): Conversion rates (default: FUNNEL_RATES).
+    - mean_views (float): Mean views per session.
+
+    Returns:
+    - dict: Arrays 'user', 'product', 'event_type', 'session', 'time_ns' (catalog codes, event type
+      codes into EVENT_TYPES, chunk-local session numbers and epoch nanoseconds), sorted by time.
+    """
+    rng = np.random.default_rng(seed)
+    funnel = funnel or FUNNEL_RATES
+    events_per_view = 1 + funnel["view_to_cart"] * (
+        1 + funnel["cart_to_purchase"] + (1 - funnel["cart_to_purchase"]) * funnel["cart_to_remove"]
+    )
+    n_sessions = int(n_rows / (mean_views * events_per_view) * 1.1) + 16
+
+    parts = []
+    produced = 0
+    session_offset = 0
+    start_ns = pd.Timestamp(start).value
+    hour_p = HOURLY_TRAFFIC / HOURLY_TRAFFIC.sum()
+    while produced < n_rows:
+        users = catalog.sample_users(rng, n_sessions)
+        session_start = (
+            start_ns
+            + rng.integers(0, days, n_sessions) * 86_400 * 10**9
+            + rng.choice(24, n_sessions, p=hour_p) * 3_600 * 10**9
+            + rng.integers(0, 3_600 * 10**9, n_sessions)
+        )
+
+        # Views: a geometric number per session, spaced by exponential gaps
+        n_views = rng.geometric(1.0 / mean_views, n_sessions)
+        view_session = np.repeat(np.arange(n_sessions), n_views)
+        gaps = rng.exponential(VIEW_GAP_SECONDS * 1e9, len(view_session)).astype(np.int64)
+        cumulative = np.cumsum(gaps)
+        first_view = np.repeat(np.cumsum(n_views) - n_views, n_views)
+        view_time = session_start[view_session] + cumulative - cumulative[first_view] + gaps[first_view]
+        view_product = catalog.sample_products(rng, len(view_session))
+
+        # Funnel: view -> cart -> purchase, or cart -> remove_from_cart
+        carted = np.flatnonzero(rng.random(len(view_session)) < funnel["view_to_cart"])
+        cart_time = view_time[carted] + rng.exponential(FUNNEL_GAP_SECONDS * 1e9, len(carted)).astype(np.int64)
+        outcome = rng.random(len(carted))
+        purchased = outcome < funnel["cart_to_purchase"]
+        removed = ~purchased & (rng.random(len(carted)) < funnel["cart_to_remove"])
+        outcome_time = cart_time + rng.exponential(FUNNEL_GAP_SECONDS * 1e9, len(carted)).astype(np.int64)
+
+        session = np.concatenate([view_session, view_session[carted], view_session[carted[purchased]], view_session[carted[removed]]])
+        parts.append(
+            {
+                "user": users[session],
+                "product": np.concatenate([view_product, view_product[carted], view_product[carted[purchased]], view_product[carted[removed]]]),
+                "event_type": np.concatenate(
+                    [
+                        np.zeros(len(view_session), dtype=np.int8),
+                        np.ones(len(carted), dtype=np.int8),
+                        np.full(purchased.sum(), 3, dtype=np.int8),
+                        np.full(removed.sum(), 2, dtype=np.int8),
+                    ]
+                ),
+                "session": session + session_offset,
+                "time_ns": np.concatenate([view_time, cart_time, outcome_time[purchased], outcome_time[removed]]),
+            }
+        )
+        produced += len(session)
+        session_offset += n_sessions
+
+    chunk = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    # Keep the first n_rows events in session order, then sort the chunk by time
+    order = np.lexsort((chunk["time_ns"], chunk["session"]))[:n_rows]
+    order = order[np.argsort(chunk["time_ns"][order], kind="stable")]
+    return {name: values[order] for name, values in chunk.items()}
+
+
+def _session_names(chunk_seed, sessions):
+    """
+    uuid-style session ids, unique per (chunk seed, chunk-local session number).
+    """
+    unique_sessions, inverse = np.unique(sessions, return_inverse=True)
+    entropy = chunk_seed.generate_state(2, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        words = []
+        for salt in entropy:
+            # splitmix64 finaliser, as in recsys.sampling.hash_priority
+            z = unique_sessions.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + salt
+            z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            words.append((z ^ (z >> np.uint64(31))).tolist())
+    names = np.array(
+        [
+            f"{high >> 32:08x}-{(high >> 16) & 0xFFFF:04x}-{high & 0xFFFF:04x}-{low >> 48:04x}-{low & 0xFFFFFFFFFFFF:012x}"
+            for high, low in zip(*words)
+        ],
+        dtype=object,
+    )
+    return names[inverse]
+
+
+def _chunk_seeds(n_rows, chunk_rows, seed):
+    n_chunks = max(1, -(-n_rows // chunk_rows))
+    sizes = [min(chunk_rows, n_rows - number * chunk_rows) for number in range(n_chunks)]
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(n_chunks)))
+
+
+def generate_events(
+    n_rows,
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    seed=0,
+    start="2019-10-01",
+    days=153,
+    catalog=None,
+    funnel=None,
+):
+    """
+    Yields the synthetic event log as DataFrames of at most `chunk_rows` rows.
+
+    Parameters:
+    - n_rows (int): Total events.
+    - chunk_rows (int): Events per chunk; bounds memory.
+    - seed (int): Random seed; the same seed gives the same log for any chunk size of the same value.
+    - start (str): First day of the simulated period (UTC).
+    - days (int): Length of the simulated period.
+    - catalog (Catalog): Users and products (default: Catalog.for_rows(n_rows, seed)).
+    - funnel (dict): Conversion rates overriding FUNNEL_RATES.
+
+    Yields:
+    - DataFrame: Events with the columns in COLUMNS, sorted by time within the chunk.
+    """
+    catalog = catalog or Catalog.for_rows(n_rows, seed)
+    rates = dict(FUNNEL_RATES)
+    rates.update(funnel or {})
+    start = pd.Timestamp(start, tz="UTC")
+    chunks = _chunk_seeds(n_rows, chunk_rows, seed)
+
+    # Pass 1: events per user over the whole log, for `total_events`
+    total_events = np.zeros(catalog.n_users, dtype=np.int64)
+    for size, chunk_seed in chunks:
+        users = simulate_chunk(catalog, size, chunk_seed, start, days, rates)["user"]
+        total_events += np.bincount(users, minlength=catalog.n_users)
+
+    # Pass 2: same seeds, now materialised as rows
+    for size, chunk_seed in chunks:
+        chunk = simulate_chunk(catalog, size, chunk_seed, start, days, rates)
+        # Whole seconds, like the raw dataset
+        event_time = pd.to_datetime(chunk["time_ns"] // 10**9 * 10**9, utc=True)
+        products = chunk["product"]
+        yield pd.DataFrame(
+            {
+                "event_time": event_time,
+                "event_type": EVENT_TYPES[chunk["event_type"]],
+                "product_id": catalog.product_ids[products],
+                "category_id": catalog.category_ids[catalog.product_categories[products]],
+                "brand": catalog.product_brands[products],
+                "price": catalog.product_prices[products],
+                "user_id": catalog.user_ids[chunk["user"]],
+                "user_session": _session_names(chunk_seed, chunk["session"]),
+                "event_hour": event_time.hour.to_numpy(dtype=np.int8),
+                "total_events": total_events[chunk["user"]],
+                "log_price": np.log(catalog.product_prices[products] + 1),
+            }
+        )
+
+
+def write_events(chunks, output):
+    """
+    Streams event chunks to a .parquet or .csv file.
+
+    Parquet keeps `event_time` as a UTC timestamp; CSV writes it in the raw
+    dataset's text format ('2019-10-01 00:00:00 UTC').
+
+    Returns:
+    - int: Number of rows written.
+    """
+    output = Path(output)
+    written = 0
+    if output.suffix.lower() == ".parquet":
+        writer = None
+        try:
+            for frame in chunks:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pq.ParquetWriter(str(output), schema)
+                writer.write_table(table.cast(schema))
+                written += len(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif output.suffix.lower() == ".csv":
+        header = True
+        with open(output, "w", newline="") as sink:
+            for frame in chunks:
+                frame = frame.assign(event_time=frame["event_time"].dt.strftime(EVENT_TIME_FORMAT))
+                frame.to_csv(sink, header=header, index=False)
+                header = False
+                written += len(frame)
+    else:
+        raise ValueError(f"Unsupported output format '{output.suffix}'. Use .parquet or .csv.")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic event log with the enhanced dataset schema.")
+    parser.add_argument("--rows", type=int, required=True, help="Number of events.")
+    parser.add_argument("--output", required=True, help="Output .parquet or .csv file.")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Events generated per chunk.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, help="Distinct users (default: rows / 15).")
+    parser.add_argument("--products", type=int, help="Distinct products (default: rows / 40, at most 500k).")
+    parser.add_argument("--start", default="2019-10-01", help="First day of the simulated period.")
+    parser.add_argument("--days", type=int, default=153, help="Length of the simulated period.")
+    args = parser.parse_args()
+
+    start = time.time()
+    catalog = Catalog.for_rows(args.rows, args.seed, n_users=args.users, n_products=args.products)
+    chunks = generate_events(args.rows, args.chunk_rows, args.seed, args.start, args.days, catalog)
+    written = write_events(chunks, args.output)
+    print(f"Wrote {written:,} events for {catalog.n_users:,} users and {catalog.n_products:,} products to {args.output}")
+    print(f"Time taken: {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()